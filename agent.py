@@ -5,43 +5,51 @@ This module defines the state and the nodes for the LangGraph workflow, includin
 planning, extracting ingredients, and shopping.
 """
 
+import asyncio
 import json
-import os
 import re
+import time
+from contextlib import asynccontextmanager
 from operator import add
 from typing import Annotated, List, TypedDict
 
 import streamlit as st
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-from config import EXTRACTOR_MODEL, PLANNER_MODEL, SHOPPER_MODEL
+import ingredients
+from config import (
+    BULK_ADD_ENABLED,
+    EXTRACTOR_MODE,
+    EXTRACTOR_MODEL,
+    HISTORY_TOP_K,
+    LOCAL_RANKER_CONFIDENCE,
+    PREFERRED_PRODUCTS_PER_ITEM,
+    PIPELINE_QUEUE_DEPTH,
+    PIPELINE_SELECT_WORKERS,
+    PLANNER_DAY_MODEL,
+    PLANNER_DAY_RETRIES,
+    PLANNER_MODE,
+    PLANNER_MODEL,
+    SELECTION_BATCH_SIZE,
+    SELECTION_MODE,
+    SHOPPER_MODEL,
+)
 from database import db
-from prompts import EXTRACTOR_SYSTEM_PROMPT, PLANNER_SYSTEM_PROMPT
-
-
-def get_text_content(content) -> str:
-    """
-    Extract text from LLM response content.
-    
-    Some models return a list of content blocks instead of a string.
-    This helper safely extracts the text in either case.
-    """
-    if isinstance(content, str):
-        return content
-    elif isinstance(content, list):
-        # Extract text from list of content blocks
-        text_parts = []
-        for block in content:
-            if isinstance(block, str):
-                text_parts.append(block)
-            elif hasattr(block, 'text'):
-                text_parts.append(block.text)
-            elif isinstance(block, dict) and 'text' in block:
-                text_parts.append(block['text'])
-        return ''.join(text_parts)
-    return str(content)
+from llm_cache import estimate_tokens, llm_cache, template_fingerprint
+from llm_clients import get_llm
+from prompts import (
+    EXTRACTOR_FALLBACK_PROMPT,
+    EXTRACTOR_SYSTEM_PROMPT,
+    PLANNER_DAY_PROMPT,
+    PLANNER_DAY_REQUEST,
+    PLANNER_SKELETON_PROMPT,
+    PLANNER_SYSTEM_PROMPT,
+)
+from ranker import LocalRanker
+from telemetry import telemetry
+from ui import render_schedule_tabs
+from utils import get_text_content, parse_json_reply
 
 
 class AgentState(TypedDict):
@@ -52,29 +60,112 @@ class AgentState(TypedDict):
         messages (List[BaseMessage]): Chat history.
         meal_plan_json (str): Generated meal plan in JSON format.
         shopping_list (List[str]): List of ingredients to buy.
+        shopping_items (List[dict]): The same list with parsed quantities and
+            source lines, from the extractor.
         cart_items (List[str]): Items successfully added to the cart.
         missing_items (List[str]): Items that could not be found or added.
         user_approved (bool): Whether the user approved the plan.
         total_cost (float): Total cost of items in the cart.
         budget_limit (float): User-defined budget limit.
         pantry_items (str): User's pantry items to exclude.
+        run_stats (dict): Performance counters from the last shopping run.
     """
 
     messages: Annotated[List[BaseMessage], add]
     meal_plan_json: str
     shopping_list: List[str]
+    shopping_items: List[dict]
     cart_items: List[str]
     missing_items: List[str]
     user_approved: bool
     total_cost: float
     budget_limit: float
     pantry_items: str
+    run_stats: dict
+
+
+class ScheduleStreamParser:
+    """
+    Pulls complete day objects out of a streaming meal-plan JSON response.
+
+    Text is scanned once as it arrives; each object in the "schedule" array is
+    parsed as soon as its closing brace appears, before the rest of the plan.
+
+    Attributes:
+        days (List[dict]): Days completed so far, in order.
+    """
+
+    def __init__(self):
+        """Initialize an empty parser."""
+        self.buffer = ""
+        self.days = []
+        self._pos = None  # Next index to scan; None until "schedule": [ is seen
+        self._depth = 0  # Nesting depth inside the schedule array
+        self._day_start = None
+        self._in_string = False
+        self._escaped = False
+        self._closed = False
+
+    def feed(self, text: str) -> List[dict]:
+        """
+        Add streamed text and return the days it completed.
+
+        Args:
+            text (str): The next piece of the response.
+
+        Returns:
+            List[dict]: Day objects completed by this piece, possibly empty.
+        """
+        self.buffer += text
+        if self._closed:
+            return []
+        if self._pos is None:
+            match = re.search(r'"schedule"\s*:\s*\[', self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        new_days = []
+        while self._pos < len(self.buffer) and not self._closed:
+            ch = self.buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._day_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    self._closed = True  # End of the schedule array
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and self._day_start is not None:
+                        try:
+                            new_days.append(json.loads(self.buffer[self._day_start : self._pos + 1]))
+                        except json.JSONDecodeError:
+                            pass
+                        self._day_start = None
+            self._pos += 1
+
+        self.days.extend(new_days)
+        return new_days
 
 
 async def planner_node(state: AgentState):
     """
     Generate a weekly meal plan based on user input.
 
+    With PLANNER_MODE "fanout" the week is outlined first and the days are
+    written concurrently (see plan_fanout()); if the outline fails, the
+    single-call plan is used instead.
+
     Args:
         state (AgentState): The current agent state.
 
@@ -84,92 +175,1044 @@ async def planner_node(state: AgentState):
     with st.status(
         "🧠 Planner: Designing Schedule & Analyzing Nutrition...", expanded=True
     ) as status:
-        # Gemini 2.5 Pro with higher temperature for a bit of creativity
-        llm = ChatGoogleGenerativeAI(
-            model=PLANNER_MODEL,
-            temperature=1.0,
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-        )
-        # Meal Planner Prompt
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    PLANNER_SYSTEM_PROMPT,
-                ),
-                ("human", "{input}"),
-            ]
-        )
+        # A new plan starts a new run; cache stats are reported after shopping
+        llm_cache.reset_stats()
+        request = state["messages"][-1].content
+        preview = status.empty()
 
-        chain = prompt | llm
-        response = await chain.ainvoke({"input": state["messages"][-1].content})
+        def show_days(days):
+            status.update(label=f"🧠 Planner: {len(days)} day(s) planned...")
+            with preview.container():
+                render_schedule_tabs(list(days))
 
-        try:
-            raw_content = get_text_content(response.content)
-            content = re.sub(
-                r"^```json|```$", "", raw_content.strip(), flags=re.MULTILINE
-            ).strip()
-            json.loads(content)
-            plan_json_str = content
-        except (json.JSONDecodeError, TypeError):
-            plan_json_str = json.dumps({"schedule": []})
+        plan = await plan_fanout(request, show_days, status) if PLANNER_MODE == "fanout" else None
+        if plan is not None:
+            plan_json_str = json.dumps(plan)
+        else:
+            plan_json_str = await plan_single(request, show_days)
 
         status.write("Plan created.")
     return {"meal_plan_json": plan_json_str, "total_cost": 0.0}
 
 
+async def plan_single(request: str, show_days) -> str:
+    """
+    Write the whole week in one streamed PLANNER_MODEL call.
+
+    Args:
+        request (str): The user's meal plan request.
+        show_days (callable): Called with the days completed so far.
+
+    Returns:
+        str: The plan JSON, or an empty schedule if the reply isn't JSON.
+    """
+    # Gemini 2.5 Pro with higher temperature for a bit of creativity
+    llm = get_llm(PLANNER_MODEL, temperature=1.0)
+    # Meal Planner Prompt
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                PLANNER_SYSTEM_PROMPT,
+            ),
+            ("human", "{input}"),
+        ]
+    )
+    chain = prompt | llm
+
+    # Stream so each day can be shown as soon as its JSON object closes
+    parser = ScheduleStreamParser()
+    async for text in llm_cache.astream(
+        "planner",
+        chain,
+        {"input": request},
+        PLANNER_MODEL,
+        llm.temperature,
+        template=template_fingerprint(prompt),
+        accept=lambda text: parse_json_reply(text) is not None,
+    ):
+        if parser.feed(text):
+            show_days(parser.days)
+
+    plan = parse_json_reply(parser.buffer)
+    if plan is None:
+        return json.dumps({"schedule": []})
+    return json.dumps(plan)
+
+
+def outline_days_of(outline):
+    """Return the outline's named days, or None if it has none."""
+    days = outline.get("days") if isinstance(outline, dict) else None
+    if not isinstance(days, list):
+        return None
+    days = [d for d in days if isinstance(d, dict) and d.get("day")]
+    return days or None
+
+
+def validate_day(day, name: str) -> List[str]:
+    """
+    List what is wrong with one generated day.
+
+    Args:
+        day: The parsed reply for the day.
+        name (str): The day it was asked for.
+
+    Returns:
+        List[str]: Problems, empty when the day can be used.
+    """
+    if not isinstance(day, dict):
+        return ["the reply was not a JSON object"]
+    problems = []
+    if str(day.get("day", "")).strip().lower() != name.strip().lower():
+        problems.append(f'"day" must be "{name}"')
+    for meal in ingredients.MEALS:
+        info = day.get(meal)
+        if not isinstance(info, dict) or not str(info.get("title", "")).strip():
+            problems.append(f'"{meal}" needs a title')
+        elif not str(info.get("ingredients", "")).strip():
+            problems.append(f'"{meal}" needs ingredients')
+    nutrition = day.get("nutrition")
+    if not isinstance(nutrition, dict) or not isinstance(nutrition.get("calories"), (int, float)):
+        problems.append('"nutrition" needs numeric calories')
+    return problems
+
+
+async def plan_fanout(request: str, show_days, status) -> dict:
+    """
+    Outline the week with PLANNER_MODEL, then write each day concurrently.
+
+    Days that fail validate_day() are asked for again, with the problems
+    listed, up to PLANNER_DAY_RETRIES times; a day that still fails is named
+    as outlined and its missing meals take the outline titles, so the rest
+    of the plan is not lost.
+
+    Args:
+        request (str): The user's meal plan request.
+        show_days (callable): Called with the finished days, in week order.
+        status: The Streamlit status container, for warnings.
+
+    Returns:
+        dict: {"schedule": [...]} in outline order, or None if the outline
+            could not be read or names no days.
+    """
+    outline_llm = get_llm(PLANNER_MODEL, temperature=1.0)
+    outline_prompt = ChatPromptTemplate.from_messages(
+        [("system", PLANNER_SKELETON_PROMPT), ("human", "{input}")]
+    )
+    reply = await llm_cache.ainvoke(
+        "planner_skeleton",
+        outline_prompt | outline_llm,
+        {"input": request},
+        PLANNER_MODEL,
+        outline_llm.temperature,
+        template=template_fingerprint(outline_prompt),
+        accept=lambda text: outline_days_of(parse_json_reply(text)) is not None,
+    )
+    outline_days = outline_days_of(parse_json_reply(get_text_content(reply.content)))
+    if outline_days is None:
+        return None
+    status.write(f"Outlined {len(outline_days)} day(s); writing them in parallel...")
+
+    day_llm = get_llm(PLANNER_DAY_MODEL, temperature=1.0)
+    day_prompt = ChatPromptTemplate.from_messages(
+        [("system", PLANNER_DAY_PROMPT), ("human", "{input}")]
+    )
+    outline_text = json.dumps(outline_days, indent=1)
+    finished = [None] * len(outline_days)
+
+    async def write_day(pos):
+        name = str(outline_days[pos]["day"])
+        problems = []
+        day = None
+        for _ in range(PLANNER_DAY_RETRIES + 1):
+            note = (
+                "\n\nYour previous answer for this day was rejected: " + "; ".join(problems)
+                if problems
+                else ""
+            )
+            reply = await llm_cache.ainvoke(
+                "planner_day",
+                day_prompt | day_llm,
+                {"input": PLANNER_DAY_REQUEST.format(
+                    request=request, outline=outline_text, day=name, problems=note
+                )},
+                PLANNER_DAY_MODEL,
+                day_llm.temperature,
+                template=template_fingerprint(day_prompt),
+                # A rejected day is asked again, so it must not be replayed
+                accept=lambda text: not validate_day(parse_json_reply(text), name),
+            )
+            day = parse_json_reply(get_text_content(reply.content))
+            problems = validate_day(day, name)
+            if not problems:
+                break
+        if problems:
+            status.warning(f"⚠️ {name}: {'; '.join(problems)}")
+            # The UI and PDF index day["day"] and each meal, so patch what's missing
+            day = dict(day) if isinstance(day, dict) else {}
+            day["day"] = name
+            for meal in ingredients.MEALS:
+                info = day.get(meal)
+                if not isinstance(info, dict):
+                    info = day[meal] = {"ingredients": "", "instructions": ""}
+                if not str(info.get("title", "")).strip():
+                    info["title"] = outline_days[pos].get(meal, "")
+        finished[pos] = day
+        show_days([d for d in finished if d is not None])
+
+    await asyncio.gather(*(write_day(pos) for pos in range(len(outline_days))))
+    return {"schedule": finished}
+
+
 async def extractor_node(state: AgentState):
     """
     Extract a consolidated shopping list from the meal plan.
 
+    With EXTRACTOR_MODE "local" the ingredients are parsed, summed and
+    pantry-filtered by ingredients.py, and only lines it can't read are sent
+    to the model. "llm" sends the whole plan to EXTRACTOR_MODEL.
+
     Args:
         state (AgentState): The current agent state.
 
     Returns:
-        dict: Updates to the state (shopping_list).
+        dict: Updates to the state (shopping_list, shopping_items, run_stats).
     """
     with st.status("📑 Extractor: Building Shopping List...", expanded=True) as status:
-        llm = ChatGoogleGenerativeAI(
-            model=EXTRACTOR_MODEL,
-            temperature=1.0,
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
+        llm = get_llm(EXTRACTOR_MODEL, temperature=1.0)
+        stats = {"mode": EXTRACTOR_MODE}
+
+        if EXTRACTOR_MODE == "local":
+            shopping_items = await extract_locally(
+                llm, state["meal_plan_json"], state.get("pantry_items", "")
+            )
+            items = [item["display"] for item in shopping_items]
+        else:
+            items = await extract_with_llm(
+                llm, state["meal_plan_json"], state.get("pantry_items", ""), stats=stats
+            )
+            shopping_items = [
+                {"name": item, "quantities": [], "display": item, "sources": []} for item in items
+            ]
+            status.write(
+                f"Used {stats['history_items']} of {stats['history_total']} past items "
+                f"(~{stats['prompt_tokens']:,} prompt tokens)."
+            )
+
+        status.write(f"Identified {len(items)} items.")
+    return {
+        "shopping_list": items,
+        "shopping_items": shopping_items,
+        "run_stats": {"extractor": stats},
+    }
+
+
+async def extract_with_llm(llm, plan_json: str, pantry: str, stats: dict = None) -> List[str]:
+    """
+    Ask the extractor model for a comma-separated shopping list.
+
+    Only the HISTORY_TOP_K past items most relevant to this week's ingredients
+    are included, after the products previously bought for them, so the
+    prompt doesn't grow with every saved plan.
+
+    Args:
+        llm: The extractor chat model.
+        plan_json (str): The meal plan JSON.
+        pantry (str): Comma-separated pantry items to leave out.
+        stats (dict): Optional; filled with history_items, preferred_items,
+            history_total and prompt_tokens.
+
+    Returns:
+        List[str]: Shopping list items as free text.
+    """
+    lines = list(ingredients.iter_plan_lines(plan_json))
+    preferred = [name for name, _ in preferred_products(lines)]
+    relevant = db.get_relevant_past_items(lines, HISTORY_TOP_K)
+    # Products actually bought name the brand best, so they go first
+    relevant = list(dict.fromkeys(preferred + relevant))
+    past_buys = ", ".join(relevant)
+    # Shopping List Extractor Prompt
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                EXTRACTOR_SYSTEM_PROMPT,
+            ),
+            ("human", "{input}"),
+        ]
+    )
+
+    inputs = {"input": plan_json, "pantry": pantry, "history": past_buys}
+    if stats is not None:
+        stats["history_items"] = len(relevant)
+        stats["preferred_items"] = len(preferred)
+        stats["history_total"] = len(db.history_index)
+        stats["prompt_tokens"] = estimate_tokens(
+            "".join(m.content for m in prompt.format_messages(**inputs))
         )
 
-        past_buys = db.get_all_past_items()
-        # Shopping List Extractor Prompt
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    EXTRACTOR_SYSTEM_PROMPT,
-                ),
-                ("human", "{input}"),
+    response = await llm_cache.ainvoke(
+        "extractor",
+        prompt | llm,
+        inputs,
+        EXTRACTOR_MODEL,
+        llm.temperature,
+        template=template_fingerprint(prompt),
+    )
+
+    raw_list = get_text_content(response.content).split(",")
+    items = []
+    for i in raw_list:
+        clean = re.sub(r"\s+", " ", i).strip()
+        if clean:
+            items.append(clean)
+    return items
+
+
+def preferred_products(items: List[str]) -> List[tuple]:
+    """
+    Look up the products bought before for each item.
+
+    Args:
+        items (List[str]): Shopping list items or ingredient lines.
+
+    Returns:
+        List[tuple]: Unique (product title, purchase count) tuples, in item order.
+    """
+    found = {}
+    for item in items:
+        for name, count in db.get_preferred_products(item, PREFERRED_PRODUCTS_PER_ITEM):
+            found.setdefault(name, count)
+    return list(found.items())
+
+
+async def extract_locally(llm, plan_json: str, pantry: str) -> List[dict]:
+    """
+    Build structured shopping items with the local parser.
+
+    Lines the parser rejects go to the model in a single call; if that reply
+    can't be read they are kept as plain unquantified items.
+
+    Args:
+        llm: The extractor chat model, used only for unparsed lines.
+        plan_json (str): The meal plan JSON.
+        pantry (str): Comma-separated pantry items to leave out.
+
+    Returns:
+        List[dict]: Items from ingredients.consolidate(), pantry removed.
+    """
+    parsed, unparsed = ingredients.parse_plan(plan_json)
+    if unparsed:
+        fallback = llm_cache.wrap(llm, "extractor", EXTRACTOR_MODEL, llm.temperature)
+        prompt = EXTRACTOR_FALLBACK_PROMPT.format(lines="\n".join(unparsed))
+        try:
+            reply = await fallback.ainvoke([HumanMessage(content=prompt)])
+            parsed += ingredients.parse_llm_items(get_text_content(reply.content), unparsed)
+        except Exception:
+            parsed += [
+                {"name": ingredients.normalize_name(line) or line.lower(), "amount": None,
+                 "family": "count", "raw": line}
+                for line in unparsed
             ]
+    return ingredients.subtract_pantry(ingredients.consolidate(parsed), pantry)
+
+
+class BudgetTracker:
+    """
+    Tracks spend against the budget for concurrently running shopping tasks.
+
+    Items may finish searching in any order, so turn() lets adds be charged
+    in shopping list order; which items a budget cut drops then doesn't
+    depend on timing.
+
+    Attributes:
+        total (float): Amount committed to the cart so far.
+        limit (float): Budget limit.
+        lock (asyncio.Lock): Held while an item is charged.
+    """
+
+    def __init__(self, total: float, limit: float):
+        """
+        Initialize the BudgetTracker.
+
+        Args:
+            total (float): Amount already spent.
+            limit (float): Budget limit.
+        """
+        self.total = total
+        self.limit = limit
+        self.lock = asyncio.Lock()
+        self._turn_changed = asyncio.Condition(self.lock)
+        self._released = set()
+        self._next = 0  # Every position below this has had its turn
+
+    def exhausted(self) -> bool:
+        """Return True once the committed spend has reached the limit."""
+        return self.total >= self.limit
+
+    @asynccontextmanager
+    async def turn(self, pos: int = None):
+        """
+        Hold the budget lock, after every earlier list position has had its turn.
+
+        Args:
+            pos (int): The item's position in the shopping list. None just
+                takes the lock, in arrival order.
+        """
+        async with self._turn_changed:
+            if pos is not None:
+                await self._turn_changed.wait_for(lambda: self._next >= pos)
+            try:
+                yield
+            finally:
+                if pos is not None:
+                    self._release(pos)
+
+    async def release(self, pos: int):
+        """Give up the turn of an item that won't be added (safe to repeat)."""
+        async with self._turn_changed:
+            self._release(pos)
+
+    def _release(self, pos):
+        self._released.add(pos)
+        while self._next in self._released:
+            self._next += 1
+        self._turn_changed.notify_all()
+
+
+class LLMCallCounter:
+    """
+    Wraps a chat model to count ainvoke() calls and the time spent in them.
+
+    Attributes:
+        calls (int): Number of ainvoke() calls made.
+        seconds (float): Total wall time spent waiting on the model.
+    """
+
+    def __init__(self, llm):
+        """
+        Initialize the LLMCallCounter.
+
+        Args:
+            llm: The chat model to wrap.
+        """
+        self.llm = llm
+        self.calls = 0
+        self.seconds = 0.0
+
+    async def ainvoke(self, *args, **kwargs):
+        """Forward to the wrapped model's ainvoke() and record the call."""
+        started = time.perf_counter()
+        try:
+            return await self.llm.ainvoke(*args, **kwargs)
+        finally:
+            self.calls += 1
+            self.seconds += time.perf_counter() - started
+
+
+def format_options(options: List[dict]) -> str:
+    """
+    Render search options as the numbered list shown to the shopper LLM.
+
+    Args:
+        options (List[dict]): Options returned by the browser.
+
+    Returns:
+        str: One "Index N" block per option.
+    """
+    text = ""
+    for opt in options:
+        text += (
+            f"Index {opt['index']}: {opt['title']}\n"
+            f"   - Price: ${opt['price_str']}\n"
+            f"   - Rating: {opt.get('rating', 'N/A')} ({opt.get('reviews', '0')} reviews)\n"
         )
+    return text
+
+
+async def choose_option(llm, original_item: str, search_term: str, options: List[dict]) -> int:
+    """
+    Ask the shopper LLM which search result best matches the requested item.
+
+    Args:
+        llm: The chat model used for the decision.
+        original_item (str): The item as written on the shopping list.
+        search_term (str): The query that produced the options.
+        options (List[dict]): Options returned by the browser.
+
+    Returns:
+        int: The chosen option index, or -1 if nothing matches.
+    """
+    choice_prompt = (
+        f"User wants: '{original_item}'\n"
+        f"Search Query used: '{search_term}'\n\n"
+        "Available Options:\n"
+    )
+    choice_prompt += format_options(options)
+    choice_prompt += (
+        "\nINSTRUCTIONS:\n"
+        "1. Identify the option that BEST matches the User's request.\n"
+        "2. Consider quantity: If user wants '2 lbs' and option is '1 lb', that's okay (we can buy multiple later, but for now just pick the item).\n"
+        "3. Consider value and ratings.\n"
+        "4. If NO option is a good match, return -1.\n"
+        "5. Return ONLY the Index integer (0, 1, 2...) or -1."
+    )
+
+    decision_msg = await llm.ainvoke(
+        [HumanMessage(content=choice_prompt)],
+        accept=lambda text: parse_choice(text, options) is not None,
+    )
+    try:
+        return int(re.search(r"-?\d+", get_text_content(decision_msg.content)).group())
+    except (AttributeError, ValueError):
+        return 0  # Default to first if unsure
 
-        response = await (prompt | llm).ainvoke(
-            {
-                "input": state["meal_plan_json"],
-                "pantry": state.get("pantry_items", ""),
-                "history": past_buys,
-            }
+
+def parse_batch_choices(raw: str, requests: List[tuple]) -> dict:
+    """
+    Parse the batched selection reply into {request position: option index}.
+
+    Args:
+        raw (str): The model's reply, expected to be a JSON object mapping
+            item numbers (as strings) to option indices.
+        requests (List[tuple]): The (original_item, search_term, options)
+            tuples that were sent, in prompt order.
+
+    Returns:
+        dict: Valid choices keyed by position in requests. Items whose answer
+            is missing or names an index that was not offered are left out.
+
+    Raises:
+        ValueError: If the reply is not a JSON object.
+    """
+    mapping = parse_json_reply(raw)
+    if not isinstance(mapping, dict):
+        raise ValueError("Batch selection reply is not a JSON object")
+
+    choices = {}
+    for pos, (_, _, options) in enumerate(requests):
+        value = mapping.get(str(pos + 1))
+        try:
+            idx = int(value)
+        except (TypeError, ValueError):
+            continue
+        if idx == -1 or any(opt["index"] == idx for opt in options):
+            choices[pos] = idx
+    return choices
+
+
+def parse_choice(raw: str, options: List[dict]):
+    """Return the option index (or -1) a single selection reply names, None if it names none offered."""
+    match = re.search(r"-?\d+", raw or "")
+    if match is None:
+        return None
+    idx = int(match.group())
+    if idx == -1 or any(opt["index"] == idx for opt in options):
+        return idx
+    return None
+
+
+def parse_queries(raw: str, shopping_list: List[str]):
+    """Return the query optimizer's queries, or None unless there is one per list item."""
+    reply = parse_json_reply(raw)
+    queries = reply.get("queries") if isinstance(reply, dict) else None
+    if not isinstance(queries, list) or len(queries) != len(shopping_list):
+        return None
+    return queries
+
+
+def covers(raw: str, requests: List[tuple]) -> bool:
+    """Return True if a batched selection reply answers every request validly."""
+    try:
+        return len(parse_batch_choices(raw, requests)) == len(requests)
+    except ValueError:
+        return False
+
+
+async def choose_options_batched(llm, requests: List[tuple], batch_size: int) -> List[int]:
+    """
+    Choose options for many items with one LLM call per chunk of items.
+
+    Chunks are sent concurrently. A chunk whose call fails or whose reply
+    cannot be parsed, and any item a parsed reply leaves out, falls back to
+    choose_option().
+
+    Args:
+        llm (CachedChatModel): The selection model, wrapped by llm_cache so a
+            reply that doesn't cover its chunk is not cached.
+        requests (List[tuple]): (original_item, search_term, options) per item.
+        batch_size (int): Maximum items per prompt.
+
+    Returns:
+        List[int]: The chosen option index (or -1) per request, in order.
+    """
+
+    async def choose_chunk(chunk):
+        prompt = (
+            "You are choosing Amazon Fresh products for a shopping list.\n"
+            "For each numbered item below, pick the option that BEST matches what the user wants.\n"
+            "Consider quantity loosely (a 1 lb pack is fine for '2 lbs'), value and ratings.\n"
+            "If NO option is a good match for an item, answer -1 for it.\n\n"
         )
+        for pos, (original_item, search_term, options) in enumerate(chunk, start=1):
+            prompt += (
+                f"Item {pos}: User wants '{original_item}' (Search Query used: '{search_term}')\n"
+                f"{format_options(options)}\n"
+            )
+        prompt += (
+            "Return ONLY a JSON object mapping each item number to the chosen Index, "
+            'e.g. {"1": 0, "2": 3, "3": -1}.'
+        )
+        with telemetry.span("shopper.select_batch") as span:
+            try:
+                reply = await llm.ainvoke(
+                    [HumanMessage(content=prompt)], accept=lambda text: covers(text, chunk)
+                )
+                choices = parse_batch_choices(get_text_content(reply.content), chunk)
+            except Exception:
+                # A failed batch call (bad JSON, timeout, API error) costs
+                # only the batching, never the items
+                choices = {}
 
-        raw_list = get_text_content(response.content).split(",")
-        items = []
-        for i in raw_list:
-            clean = re.sub(r"\s+", " ", i).strip()
-            if clean:
-                items.append(clean)
+            missing = [pos for pos in range(len(chunk)) if pos not in choices]
+            span["retries"] = len(missing)  # Items re-asked one at a time
+            fallback = await asyncio.gather(*(choose_option(llm, *chunk[pos]) for pos in missing))
+            choices.update(zip(missing, fallback))
+            return [choices[pos] for pos in range(len(chunk))]
 
-        status.write(f"Identified {len(items)} items.")
-    return {"shopping_list": items}
+    chunks = [requests[i : i + batch_size] for i in range(0, len(requests), batch_size)]
+    answers = await asyncio.gather(*(choose_chunk(chunk) for chunk in chunks))
+    return [idx for chunk_answers in answers for idx in chunk_answers]
+
+
+def cart_label(title: str, price_str: str, confirmation: str) -> str:
+    """
+    Format a cart_items entry, flagging adds the page never acknowledged.
+
+    Args:
+        title (str): Product or item name.
+        price_str (str): Displayed price.
+        confirmation (str): "CONFIRMED" or "UNCONFIRMED".
+
+    Returns:
+        str: The cart line shown in the review table.
+    """
+    label = f"{title} (${price_str})"
+    if confirmation == "UNCONFIRMED":
+        label += " ⚠️ unconfirmed"
+    return label
+
+
+async def find_options(browser_tool, original_item: str, search_term: str, page) -> List[dict]:
+    """
+    Search for an item, retrying with the original wording if the query finds nothing.
+
+    Args:
+        browser_tool (AmazonFreshBrowser): The shared browser.
+        original_item (str): The item as written on the shopping list.
+        search_term (str): The optimized search query.
+        page (Page): A page leased from the browser's pool.
+
+    Returns:
+        List[dict]: The options found, possibly empty.
+    """
+    options = await browser_tool.search_and_get_options(search_term, page=page)
+    # Fallback to original term if optimized failed
+    if not options and search_term != original_item:
+        options = await browser_tool.search_and_get_options(original_item, page=page)
+    return options
+
+
+async def add_choice(
+    browser_tool,
+    original_item: str,
+    search_term: str,
+    chosen: dict,
+    budget: BudgetTracker,
+    bulk: bool = False,
+    page=None,
+    pos: int = None,
+) -> dict:
+    """
+    Add (or queue) the chosen option and charge it to the budget.
+
+    Args:
+        browser_tool (AmazonFreshBrowser): The shared browser.
+        original_item (str): The item as written on the shopping list.
+        search_term (str): The query that produced the option.
+        chosen (dict): The option to buy.
+        budget (BudgetTracker): Shared budget state.
+        bulk (bool): Queue the chosen ASIN for submit_cart_queue() instead of
+            adding it now.
+        page (Page): Page to add from; one is leased when omitted.
+        pos (int): The item's list position; when given, the budget is
+            charged only after every earlier item (see BudgetTracker.turn).
+
+    Returns:
+        dict: {"cart": str, "title": str} when the item was added,
+            {"queued": option} when it was queued, otherwise {"missing": str}.
+            Items that reached an add attempt also carry "confirmation".
+    """
+    # Re-check under the lock: other tabs may have spent the budget meanwhile
+    async with budget.turn(pos):
+        if budget.exhausted():
+            return {"missing": f"{original_item} (Budget Cut)"}
+        if bulk and chosen.get("asin"):
+            # Charged now so the budget cut still applies; refunded if the add fails
+            browser_tool.queue_item(chosen["asin"])
+            budget.total += chosen["price"]
+            return {"queued": chosen, "item": original_item, "search_term": search_term}
+
+        if page is None:
+            async with browser_tool.lease_page() as leased:
+                added = await _add_to_cart(browser_tool, chosen, leased)
+        else:
+            added = await _add_to_cart(browser_tool, chosen, page)
+        if added["status"] == "FAILED":
+            return {"missing": f"{original_item} (Add failed)", "confirmation": "FAILED"}
+
+        browser_tool.remember_choice(search_term, chosen)
+        budget.total += chosen["price"]
+        return {
+            "cart": cart_label(chosen["title"], chosen["price_str"], added["status"]),
+            "title": chosen["title"],
+            "confirmation": added["status"],
+        }
+
+
+async def _add_to_cart(browser_tool, chosen: dict, page) -> dict:
+    # Target the product by ASIN so the results never need re-scanning
+    if chosen.get("asin"):
+        return await browser_tool.add_item_by_asin(chosen["asin"], page=page)
+    return await browser_tool.add_specific_item(chosen["index"], page=page)
+
+
+def pick_option(options: List[dict], choice_idx: int):
+    """Return the option with the given result index, or None."""
+    return next((opt for opt in options if opt["index"] == choice_idx), None)
+
+
+def remembered_option(options: List[dict]):
+    """Return the option a search-cache hit marked as last bought, or None."""
+    return next((opt for opt in options if opt.get("chosen")), None)
+
+
+async def shop_item(
+    browser_tool,
+    llm,
+    original_item: str,
+    search_term: str,
+    budget: BudgetTracker,
+    bulk: bool = False,
+    ranker: LocalRanker = None,
+    pos: int = None,
+) -> dict:
+    """
+    Search, select and add a single shopping list item on a pooled page.
+
+    Args:
+        browser_tool (AmazonFreshBrowser): The shared browser.
+        llm: The chat model used for option selection.
+        original_item (str): The item as written on the shopping list.
+        search_term (str): The optimized search query.
+        budget (BudgetTracker): Shared budget state.
+        bulk (bool): Queue the chosen ASIN for submit_cart_queue() instead of
+            adding it now.
+        ranker (LocalRanker): Decides obvious matches without the LLM.
+        pos (int): The item's list position, passed on to add_choice(). The
+            caller must release() it if the item never reaches the add.
+
+    Returns:
+        dict: Same shape as add_choice(), or {"missing": str} when nothing
+            suitable was found.
+    """
+    if budget.exhausted():
+        return {"missing": f"{original_item} (Budget Cut)"}
+
+    async with browser_tool.lease_page() as page:
+        options = await find_options(browser_tool, original_item, search_term, page)
+        if not options:
+            return {"missing": original_item}
+
+        # --- STEP 2: ENHANCED SELECTION ---
+        # A cache hit remembers what we bought last time; skip the LLM for it
+        chosen = remembered_option(options)
+        if chosen is None and ranker is not None:
+            chosen = ranker.select(original_item, search_term, options)
+        if chosen is None:
+            choice_idx = await choose_option(llm, original_item, search_term, options)
+            chosen = pick_option(options, choice_idx)
+        if chosen is None:
+            return {"missing": f"{original_item} (No good match)"}
+
+        return await add_choice(
+            browser_tool, original_item, search_term, chosen, budget, bulk=bulk, page=page,
+            pos=pos,
+        )
+
+
+async def shop_batched(
+    browser_tool,
+    llm,
+    items: List[tuple],
+    budget: BudgetTracker,
+    ranker: LocalRanker = None,
+    on_done=None,
+) -> List[dict]:
+    """
+    Shop a list in three phases: search everything, select in batches, then add.
+
+    Args:
+        browser_tool (AmazonFreshBrowser): The shared browser.
+        llm: The chat model used for option selection.
+        items (List[tuple]): (original_item, search_term) per item.
+        budget (BudgetTracker): Shared budget state.
+        ranker (LocalRanker): Decides obvious matches without the LLM.
+        on_done (callable): Called once per item as it finishes.
+
+    Returns:
+        List[dict]: One result per item, in order, shaped like shop_item()'s,
+            each with the item's search + add time under "latency".
+    """
+    results = [None] * len(items)
+    found = [None] * len(items)
+    latencies = [0.0] * len(items)
+
+    def finish(pos, result):
+        result["latency"] = latencies[pos]
+        results[pos] = result
+        if on_done:
+            on_done()
+
+    async def search(pos, original_item, search_term):
+        if budget.exhausted():
+            return finish(pos, {"missing": f"{original_item} (Budget Cut)"})
+        started = time.perf_counter()
+        try:
+            async with browser_tool.lease_page() as page:
+                found[pos] = await find_options(browser_tool, original_item, search_term, page)
+        except Exception:
+            found[pos] = []
+        latencies[pos] += time.perf_counter() - started
+        if not found[pos]:
+            finish(pos, {"missing": original_item})
+
+    await asyncio.gather(*(search(pos, *item) for pos, item in enumerate(items)))
+
+    chosen = {}
+    to_ask = []
+    for pos, options in enumerate(found):
+        if results[pos] is not None:
+            continue
+        pick = remembered_option(options)
+        if pick is None and ranker is not None:
+            pick = ranker.select(*items[pos], options)
+        if pick is not None:
+            chosen[pos] = pick
+        else:
+            to_ask.append(pos)
+    if to_ask:
+        answers = await choose_options_batched(
+            llm,
+            [(*items[pos], found[pos]) for pos in to_ask],
+            SELECTION_BATCH_SIZE,
+        )
+        for pos, choice_idx in zip(to_ask, answers):
+            chosen[pos] = pick_option(found[pos], choice_idx)
+
+    async def add(pos):
+        original_item, search_term = items[pos]
+        if chosen[pos] is None:
+            return finish(pos, {"missing": f"{original_item} (No good match)"})
+        started = time.perf_counter()
+        try:
+            result = await add_choice(
+                browser_tool, original_item, search_term, chosen[pos], budget,
+                bulk=BULK_ADD_ENABLED,
+            )
+        except Exception:
+            result = {"missing": original_item}
+        latencies[pos] += time.perf_counter() - started
+        finish(pos, result)
+
+    await asyncio.gather(*(add(pos) for pos in sorted(chosen)))
+    return results
+
+
+async def shop_pipelined(
+    browser_tool,
+    llm,
+    items: List[tuple],
+    budget: BudgetTracker,
+    ranker: LocalRanker = None,
+    on_done=None,
+    stage_stats: dict = None,
+) -> List[dict]:
+    """
+    Shop a list as a search -> select -> add pipeline joined by bounded queues.
+
+    Search workers (one per pooled page) keep the browser busy while select
+    workers wait on the LLM, and a single add worker commits choices to the
+    cart one at a time, so the next item's search overlaps the current item's
+    choice. Every position reaches the add worker, which buffers them and
+    adds in list order, so the budget cut falls where a sequential run's would.
+
+    Args:
+        browser_tool (AmazonFreshBrowser): The shared browser.
+        llm: The chat model used for option selection.
+        items (List[tuple]): (original_item, search_term) per item.
+        budget (BudgetTracker): Shared budget state.
+        ranker (LocalRanker): Decides obvious matches without the LLM.
+        on_done (callable): Called once per item as it finishes.
+        stage_stats (dict): Filled with {"workers", "items", "busy_seconds",
+            "utilization"} per stage and the pipeline's "wall_seconds".
+
+    Returns:
+        List[dict]: One result per item, in order, shaped like shop_item()'s,
+            each with the item's time spent in stages under "latency".
+    """
+    results = [None] * len(items)
+    latencies = [0.0] * len(items)
+    search_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+    add_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+    stages = {
+        name: {"workers": workers, "items": 0, "busy_seconds": 0.0}
+        for name, workers in (
+            ("search", browser_tool.max_pages),
+            ("select", PIPELINE_SELECT_WORKERS),
+            ("add", 1),
+        )
+    }
+    pending = iter(range(len(items)))  # Shared by the search workers, in list order
+
+    def finish(pos, result):
+        result["latency"] = latencies[pos]
+        results[pos] = result
+        if on_done:
+            on_done()
+
+    async def skip(pos, result):
+        finish(pos, result)
+        await add_q.put((pos, None))  # Lets the add worker move past this position
+
+    async def timed(stage, pos, coro):
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            elapsed = time.perf_counter() - started
+            stages[stage]["items"] += 1
+            stages[stage]["busy_seconds"] += elapsed
+            latencies[pos] += elapsed
+
+    async def search_worker():
+        for pos in pending:
+            original_item, search_term = items[pos]
+            if budget.exhausted():
+                await skip(pos, {"missing": f"{original_item} (Budget Cut)"})
+                continue
+            try:
+                async with browser_tool.lease_page() as page:
+                    options = await timed(
+                        "search", pos, find_options(browser_tool, original_item, search_term, page)
+                    )
+            except Exception:
+                options = []
+            if options:
+                await search_q.put((pos, options))
+            else:
+                await skip(pos, {"missing": original_item})
+
+    async def select_worker():
+        while True:
+            entry = await search_q.get()
+            if entry is None:
+                return
+            pos, options = entry
+            original_item, search_term = items[pos]
+            try:
+                chosen = remembered_option(options)
+                if chosen is None and ranker is not None:
+                    chosen = ranker.select(original_item, search_term, options)
+                if chosen is None:
+                    choice_idx = await timed(
+                        "select", pos, choose_option(llm, original_item, search_term, options)
+                    )
+                    chosen = pick_option(options, choice_idx)
+            except Exception:
+                # A dead worker would stop draining search_q and stall the run
+                await skip(pos, {"missing": original_item})
+                continue
+            if chosen is None:
+                await skip(pos, {"missing": f"{original_item} (No good match)"})
+            else:
+                await add_q.put((pos, chosen))
+
+    async def add_worker():
+        waiting = {}  # Reorder buffer: choice (or None if finished) by position
+        next_pos = 0
+        while next_pos < len(items):
+            pos, chosen = await add_q.get()
+            waiting[pos] = chosen
+            while next_pos in waiting:
+                pos, chosen = next_pos, waiting.pop(next_pos)
+                next_pos += 1
+                if chosen is None:
+                    continue
+                original_item, search_term = items[pos]
+                try:
+                    result = await timed(
+                        "add",
+                        pos,
+                        add_choice(
+                            browser_tool, original_item, search_term, chosen, budget,
+                            bulk=BULK_ADD_ENABLED,
+                        ),
+                    )
+                except Exception:
+                    result = {"missing": original_item}
+                finish(pos, result)
+
+    started = time.perf_counter()
+    adder = asyncio.create_task(add_worker())
+    selectors = [
+        asyncio.create_task(select_worker()) for _ in range(stages["select"]["workers"])
+    ]
+    try:
+        await asyncio.gather(*(search_worker() for _ in range(stages["search"]["workers"])))
+        for _ in selectors:
+            await search_q.put(None)
+        await asyncio.gather(*selectors)
+        await adder
+    finally:
+        for task in (adder, *selectors):
+            task.cancel()
+
+    if stage_stats is not None:
+        wall = time.perf_counter() - started
+        for stats in stages.values():
+            stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+            stats["utilization"] = (
+                round(stats["busy_seconds"] / (stats["workers"] * wall), 3) if wall else 0.0
+            )
+        stage_stats.update(stages)
+        stage_stats["wall_seconds"] = round(wall, 3)
+    return results
 
 
 async def shopper_node(state: AgentState):
     """
     Execute the shopping process using the browser tool.
 
+    Items are shopped concurrently across the browser's page pool. With
+    SELECTION_MODE "batched" every item is searched first and options are
+    chosen in a few chunked LLM calls; "pipelined" overlaps each item's LLM
+    choice with the next items' searches; "per_item" asks the LLM once per
+    item.
+    Results are merged back in shopping list order; adds are serialized
+    through the budget lock so the running total never races, and are
+    charged in list order so a budget cut always drops the last items.
+
     Args:
         state (AgentState): The current agent state.
 
@@ -177,21 +1220,17 @@ async def shopper_node(state: AgentState):
         dict: Updates to the state (cart_items, missing_items, total_cost).
     """
     shopping_list = state["shopping_list"]
-    current_total = state.get("total_cost", 0.0)
-    limit = state.get("budget_limit", 200.0)
-    cart, missing = [], []
-    
-    # Gemini Flash for shopping
-    llm = ChatGoogleGenerativeAI(
-        model=SHOPPER_MODEL,
-        temperature=1.0,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    budget = BudgetTracker(
+        state.get("total_cost", 0.0), state.get("budget_limit", 200.0)
     )
+
+    # Gemini Flash for shopping
+    llm = get_llm(SHOPPER_MODEL, temperature=1.0)
     browser_tool = st.session_state.browser_tool
 
     status_container = st.status("🛒 Shopper: Smart Search Active...", expanded=True)
-    if not browser_tool.page:
-        await browser_tool.start()
+    await browser_tool.start()  # No-op when already running on this event loop
+    browser_tool.reset_run_stats()
     
     # --- STEP 1: OPTIMIZE QUERIES ---
     status_container.write("🧠 Optimizing search queries...")
@@ -204,84 +1243,132 @@ async def shopper_node(state: AgentState):
         f"Input List: {json.dumps(shopping_list)}"
     )
     try:
-        q_response = await llm.ainvoke([HumanMessage(content=query_prompt)])
-        raw_content = get_text_content(q_response.content)
-        content = re.sub(r"^```json|```$", "", raw_content.strip(), flags=re.MULTILINE).strip()
-        optimized_queries = json.loads(content)["queries"]
+        optimizer = llm_cache.wrap(llm, "query_optimizer", SHOPPER_MODEL, llm.temperature)
+        q_response = await optimizer.ainvoke(
+            [HumanMessage(content=query_prompt)],
+            accept=lambda text: parse_queries(text, shopping_list) is not None,
+        )
+        optimized_queries = parse_queries(get_text_content(q_response.content), shopping_list)
     except Exception:
-        optimized_queries = shopping_list # Fallback
+        optimized_queries = None
+    # A reply without one query per item would drop items from the zip below
+    optimized_queries = optimized_queries or shopping_list # Fallback
 
     progress_bar = status_container.progress(0)
+    done = 0
 
-    for i, (original_item, search_term) in enumerate(zip(shopping_list, optimized_queries)):
-        status_container.write(f"Looking for: **{original_item}** (Query: *{search_term}*)")
-        if current_total >= limit:
-            missing.append(f"{original_item} (Budget Cut)")
-            continue
-
-        options = await browser_tool.search_and_get_options(search_term)
+    def item_done():
+        nonlocal done
+        done += 1
+        progress_bar.progress(done / len(shopping_list))
 
-        if not options:
-            # Fallback to original term if optimized failed
-            if search_term != original_item:
-                 options = await browser_tool.search_and_get_options(original_item)
-            
-            if not options:
-                missing.append(original_item)
-                continue
+    # Count only option-selection calls that reach the model, not cache hits
+    # or the query optimizer above
+    counter = LLMCallCounter(llm)
+    selector = llm_cache.wrap(counter, "selection", SHOPPER_MODEL, llm.temperature)
+    # Brand preferences from products bought for these items, not the whole history
+    ranker = LocalRanker.from_history(preferred_products(shopping_list), LOCAL_RANKER_CONFIDENCE)
+    items = list(zip(shopping_list, optimized_queries))
+    selection_started = time.perf_counter()
 
-        # --- STEP 2: ENHANCED SELECTION ---
-        choice_prompt = (
-            f"User wants: '{original_item}'\n"
-            f"Search Query used: '{search_term}'\n\n"
-            "Available Options:\n"
+    pipeline = {}
+    if SELECTION_MODE == "batched":
+        status_container.write(f"🔎 Searching for {len(items)} items...")
+        results = await shop_batched(
+            browser_tool, selector, items, budget, ranker=ranker, on_done=item_done
         )
-        for opt in options:
-            choice_prompt += (
-                f"Index {opt['index']}: {opt['title']}\n"
-                f"   - Price: ${opt['price_str']}\n"
-                f"   - Rating: {opt.get('rating', 'N/A')} ({opt.get('reviews', '0')} reviews)\n"
-            )
-        choice_prompt += (
-            "\nINSTRUCTIONS:\n"
-            "1. Identify the option that BEST matches the User's request.\n"
-            "2. Consider quantity: If user wants '2 lbs' and option is '1 lb', that's okay (we can buy multiple later, but for now just pick the item).\n"
-            "3. Consider value and ratings.\n"
-            "4. If NO option is a good match, return -1.\n"
-            "5. Return ONLY the Index integer (0, 1, 2...) or -1."
+    elif SELECTION_MODE == "pipelined":
+        status_container.write(f"🔎 Shopping {len(items)} items through the pipeline...")
+        results = await shop_pipelined(
+            browser_tool, selector, items, budget, ranker=ranker, on_done=item_done,
+            stage_stats=pipeline,
         )
+    else:
 
-        decision_msg = await llm.ainvoke([HumanMessage(content=choice_prompt)])
-        try:
-            choice_idx = int(re.search(r"-?\d+", get_text_content(decision_msg.content)).group())
-        except (AttributeError, ValueError):
-            choice_idx = 0 # Default to first if unsure
-
-        if choice_idx >= 0 and choice_idx < len(options):
-            chosen = options[choice_idx]
-            success = await browser_tool.add_specific_item(choice_idx)
-            if success:
-                cart.append(f"{chosen['title']} (${chosen['price_str']})")
-                current_total += chosen['price']
+        async def run_item(pos, original_item, search_term):
+            status_container.write(f"Looking for: **{original_item}** (Query: *{search_term}*)")
+            started = time.perf_counter()
+            try:
+                result = await shop_item(
+                    browser_tool, selector, original_item, search_term, budget,
+                    bulk=BULK_ADD_ENABLED, ranker=ranker, pos=pos,
+                )
+            except Exception:
+                result = {"missing": original_item}
+            finally:
+                await budget.release(pos)  # Later items may be waiting for this one
+            result["latency"] = time.perf_counter() - started
+            item_done()
+            return result
+
+        # gather() keeps results in input order regardless of completion order
+        results = await asyncio.gather(
+            *(run_item(pos, *item) for pos, item in enumerate(items))
+        )
+
+    selection = {
+        "mode": SELECTION_MODE,
+        "llm_calls": counter.calls,
+        "llm_seconds": round(counter.seconds, 3),
+        "run_seconds": round(time.perf_counter() - selection_started, 3),
+        **ranker.stats(),
+    }
+
+    if browser_tool.cart_queue:
+        status_container.write("🛒 Adding queued items to the cart...")
+        outcomes = await browser_tool.submit_cart_queue()
+        for r in results:
+            chosen = r.pop("queued", None)
+            if chosen is None:
+                continue
+            r["confirmation"] = outcomes.get(chosen["asin"], {"status": "FAILED"})["status"]
+            if r["confirmation"] == "FAILED":
+                budget.total -= chosen["price"]
+                r["missing"] = f"{r['item']} (Add failed)"
             else:
-                st.toast(f"Smart add failed for {original_item}. Retrying...")
-                bf_result = await browser_tool.search_and_add(search_term)
-                if bf_result["status"] == "ADDED":
-                    cart.append(f"{original_item} (${bf_result['price']:.2f})")
-                    current_total += bf_result["price"]
-                else:
-                    missing.append(original_item)
-        else:
-            missing.append(f"{original_item} (No good match)")
+                browser_tool.remember_choice(r["search_term"], chosen)
+                r["cart"] = cart_label(chosen["title"], chosen["price_str"], r["confirmation"])
+                r["title"] = chosen["title"]
+
+    cart = [r["cart"] for r in results if "cart" in r]
+    db.record_purchases([r["title"] for r in results if "cart" in r])
+    missing = [r["missing"] for r in results if "missing" in r]
 
-        progress_bar.progress((i + 1) / len(shopping_list))
+    latencies = [round(r["latency"], 3) for r in results]
+    confirmations = {"CONFIRMED": 0, "UNCONFIRMED": 0, "FAILED": 0}
+    for r in results:
+        if "confirmation" in r:
+            confirmations[r["confirmation"]] += 1
+    run_stats = {
+        "search_navigation": browser_tool.navigation,
+        "item_latencies": latencies,
+        "add_confirmation": confirmations,
+        "selection": selection,
+        "llm_cache": llm_cache.stats(),
+        "pipeline": pipeline,
+        "extractor": (state.get("run_stats") or {}).get("extractor", {}),
+        **browser_tool.run_stats(),
+    }
+    if latencies:
+        # Remember the average per mode so the summary can show before/after
+        telemetry.record(
+            f"shopper.item_avg.{browser_tool.navigation}", sum(latencies) / len(latencies)
+        )
+    telemetry.record(
+        f"shopper.selection.{SELECTION_MODE}", selection["run_seconds"], details=selection
+    )
 
     status_container.write("🚚 Initializing Checkout...")
     await browser_tool.trigger_checkout()
     status_container.update(
         label="Shopping Done. Handoff Initiated.", state="complete", expanded=False
     )
-    return {"cart_items": cart, "missing_items": missing, "total_cost": current_total}
+    return {
+        "cart_items": cart,
+        "missing_items": missing,
+        "total_cost": budget.total,
+        "run_stats": run_stats,
+    }
 
 
 async def human_review_node(state: AgentState):
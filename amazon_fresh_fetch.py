@@ -6,9 +6,9 @@ and the browser automation tool. It handles the UI for meal planning, shopping l
 review, and checkout handoff.
 """
 
-import asyncio
 import json
 import os
+import uuid
 from pathlib import Path
 
 import pandas as pd
@@ -52,13 +52,15 @@ GOOGLE_API_KEY = get_api_key()
 from config import (
     PAGE_ICON,
     PAGE_TITLE,
+    PLANS_PER_PAGE,
 )
 from database import db
 from pdf_generator import generate_pdf
 from prompts import DEFAULT_PROMPT
-from ui import STREAMLIT_STYLE, render_plan_ui
+from telemetry import telemetry
+from ui import STREAMLIT_STYLE, render_plan_ui, render_run_stats, render_telemetry
 from utils import get_api_key
-from workflow import init_session_state
+from workflow import init_session_state, run_async
 
 # ==========================================
 # 1. CREDENTIAL CHECK
@@ -102,14 +104,21 @@ with st.sidebar:
     if st.button("🗑️ Clear History"):
         db.delete_all_plans()
         st.session_state.pop("history_view", None)
+        st.session_state.pop("history_pages", None)
         st.rerun()
 
-    past_plans = db.get_recent_plans()
-    for p in past_plans:
+    # Page cursors: the id each visited page starts below (None = newest)
+    pages = st.session_state.setdefault("history_pages", [None])
+    # Only id/date/count are listed; a plan is loaded when it's opened
+    past_plans = db.list_plans(pages[-1], PLANS_PER_PAGE + 1)
+    has_older = len(past_plans) > PLANS_PER_PAGE
+    for p in past_plans[:PLANS_PER_PAGE]:
         col1, col2 = st.columns([4, 1])
         with col1:
-            if st.button(f"{p['date']} - {len(p['list'])} items", key=f"hist_{p['id']}"):
-                st.session_state.history_view = p
+            if st.button(f"{p['date']} - {p['item_count']} items", key=f"hist_{p['id']}"):
+                plan = db.get_plan(p['id'])
+                if plan is not None:  # Deleted from another session meanwhile
+                    st.session_state.history_view = plan
                 st.rerun()
         with col2:
             if st.button("🗑️", key=f"del_{p['id']}", help="Delete this plan"):
@@ -118,12 +127,34 @@ with st.sidebar:
                     del st.session_state.history_view
                 st.rerun()
 
+    col_newer, col_older = st.columns(2)
+    with col_newer:
+        if len(pages) > 1 and st.button("◀ Newer", use_container_width=True):
+            pages.pop()
+            st.rerun()
+    with col_older:
+        if has_older and st.button("Older ▶", use_container_width=True):
+            pages.append(past_plans[PLANS_PER_PAGE - 1]['id'])
+            st.rerun()
+
+    st.divider()
+    with st.expander("📈 Telemetry"):
+        this_run = st.toggle("Current run only", value=False)
+        # summarize() reads every stored row, so only on request, not every rerun
+        if st.button("📊 Load Summary"):
+            st.session_state.telemetry_summary = telemetry.summarize(
+                st.session_state.get("thread_id") if this_run else None
+            )
+        if "telemetry_summary" in st.session_state:
+            render_telemetry(st.session_state.telemetry_summary)
+
 st.title(f"{PAGE_ICON} {PAGE_TITLE} AI Agent")
 
 # --- WEEKLY MEAL PLAN PROMPT ---
 
 if "thread_id" not in st.session_state:
-    st.session_state.thread_id = "streamlit_run_final"
+    # One thread per browser session, so telemetry and cache stats stay apart
+    st.session_state.thread_id = f"run_{uuid.uuid4().hex[:8]}"
 
 user_prompt = st.text_area("Meal Prompt", value=DEFAULT_PROMPT, height=200)
 
@@ -141,7 +172,7 @@ if st.button("📝 Generate Plan", type="primary"):
         async for _ in app.astream(initial_state, config):
             pass
 
-    asyncio.run(run_to_planning())
+    run_async(run_to_planning())
     st.rerun()
 
 # STATE HANDLING
@@ -187,7 +218,6 @@ if "history_view" in st.session_state:
     with col_h1:
         if st.button("🔄 Reorder", type="primary", help="Load this plan to shop again"):
             # 1. Create a NEW thread ID to start fresh
-            import uuid
             new_thread_id = f"reorder_{uuid.uuid4().hex[:8]}"
             st.session_state.thread_id = new_thread_id
             
@@ -259,7 +289,7 @@ elif current_step == "shopper":
                 pass
 
         try:
-            asyncio.run(resume())
+            run_async(resume())
             # Clear the manual override so future runs follow the graph
             if "manual_step_override" in st.session_state:
                 del st.session_state.manual_step_override
@@ -306,9 +336,21 @@ elif current_step == "checkout":
         else:
             st.write("None.")
 
+    render_run_stats(
+        data.get("run_stats"),
+        baselines={
+            mode: (telemetry.last(f"shopper.item_avg.{mode}") or {}).get("seconds")
+            for mode in ("url", "searchbox")
+        },
+        selection_baselines={
+            mode: (telemetry.last(f"shopper.selection.{mode}") or {}).get("details")
+            for mode in ("batched", "pipelined", "per_item")
+        },
+    )
+
     st.divider()
     st.info(
         "👋 **Manual Handoff:** Please complete payment in the open browser window."
     )
     if st.button("Close"):
-        asyncio.run(st.session_state.browser_tool.close())
+        run_async(st.session_state.browser_tool.close())
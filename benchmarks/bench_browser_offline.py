@@ -0,0 +1,78 @@
+"""
+End-to-end timing of AmazonFreshBrowser against the offline stand-in server.
+
+Starts benchmarks/fake_fresh_server.py in-process, points a headless
+AmazonFreshBrowser at it and times search, option extraction and add-to-cart
+for a fixed item list in each navigation mode.
+
+Usage:
+    python benchmarks/bench_browser_offline.py [--latency-ms 100] [--fail-rate 0.0]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("HEADLESS_MODE", "true")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.fake_fresh_server import start_in_thread  # noqa: E402
+from browser import AmazonFreshBrowser  # noqa: E402
+
+ITEMS = [
+    "bananas", "whole milk", "large eggs", "greek yogurt", "chicken thighs",
+    "jasmine rice", "yellow onions", "baby spinach", "cheddar cheese", "salmon fillet",
+]
+
+
+async def run_mode(base_url, navigation):
+    """Shop ITEMS once in the given navigation mode and return timings in ms."""
+    browser = AmazonFreshBrowser(navigation=navigation)
+    browser.base_url = base_url
+    browser.use_search_cache = False
+    # Never overwrite the real Amazon session with the stand-in's cookies
+    browser.session_file = os.path.join(tempfile.mkdtemp(), "session.json")
+    await browser.start()
+
+    timings = {"search": [], "add": []}
+    confirmed = 0
+    for item in ITEMS:
+        start = time.perf_counter()
+        options = await browser.search_and_get_options(item)
+        timings["search"].append((time.perf_counter() - start) * 1000)
+        if not options:
+            continue
+        start = time.perf_counter()
+        result = await browser.add_specific_item(options[0]["index"])
+        timings["add"].append((time.perf_counter() - start) * 1000)
+        confirmed += result["status"] == "CONFIRMED"
+
+    await browser.close()
+    return timings, confirmed
+
+
+async def main(latency_ms, fail_rate):
+    server, base_url = start_in_thread(latency_ms=latency_ms, fail_rate=fail_rate)
+    try:
+        print(f"{len(ITEMS)} items against {base_url} (latency {latency_ms} ms, fail rate {fail_rate})")
+        print(f"{'mode':<10} {'search p50':>11} {'add p50':>9} {'confirmed':>10}")
+        for navigation in ("searchbox", "url"):
+            timings, confirmed = await run_mode(base_url, navigation)
+            search_p50 = statistics.median(timings["search"]) if timings["search"] else 0
+            add_p50 = statistics.median(timings["add"]) if timings["add"] else 0
+            print(f"{navigation:<10} {search_p50:>9.0f}ms {add_p50:>7.0f}ms {confirmed:>10}")
+        print(f"server requests: {server.state.requests}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=int, default=100)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms, args.fail_rate))
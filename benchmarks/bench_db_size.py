@@ -0,0 +1,154 @@
+"""
+Benchmark: database size before and after prompt deduplication and compression.
+
+Builds a synthetic multi-year history (several plans a week, mostly the
+default prompt with occasional edits) in the pre-migration schema, then
+upgrades copies of it with DBManager, once with DB_COMPRESS_TEXT off (prompt
+deduplication only) and once with it on. Each file is vacuumed before it is
+measured, and opening a plan is timed on both upgraded layouts.
+
+Usage:
+    python benchmarks/bench_db_size.py [--years 5] [--per-week 3] [--runs 50]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database import DBManager  # noqa: E402
+from prompts import DEFAULT_PROMPT  # noqa: E402
+
+MEALS = [
+    ("Sheet Pan Salmon", "1 lb salmon, 2 cups broccoli, 1 lemon, 2 tbsp olive oil"),
+    ("Chicken Tikka Masala", "1.5 lb chicken thighs, 1 cup yogurt, 1 can tomato sauce, rice"),
+    ("Black Bean Tacos", "2 cans black beans, 8 tortillas, 1 avocado, salsa"),
+    ("Beef Stir-fry", "1 lb flank steak, 2 bell peppers, soy sauce, ginger, rice"),
+    ("Shakshuka", "6 eggs, 1 can crushed tomatoes, 1 onion, feta, bread"),
+    ("Lamb Kofta", "1 lb ground lamb, 1 cucumber, tzatziki, pita"),
+    ("Shrimp Paella", "1 lb shrimp, 2 cups rice, saffron, peas, 1 onion"),
+    ("Greek Yogurt Bowl", "2 cups greek yogurt, 1 cup blueberries, honey, granola"),
+]
+STEPS = [
+    "Preheat the oven to 425F.", "Chop the vegetables into even pieces.",
+    "Season generously with salt and pepper.", "Cook until golden, about 8 minutes.",
+    "Simmer covered for 15 minutes, stirring occasionally.", "Rest for 5 minutes before serving.",
+    "Garnish with fresh herbs and a squeeze of lemon.", "Serve with the leftovers packed for lunch.",
+]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def synthetic_plan(rng):
+    """A five-day plan JSON shaped like the planner's output."""
+    schedule = []
+    for day in DAYS:
+        entry = {"day": day}
+        for slot in ("breakfast", "lunch", "dinner"):
+            name, ingredients = rng.choice(MEALS)
+            entry[slot] = {
+                "name": name,
+                "ingredients": ingredients,
+                "instructions": " ".join(rng.sample(STEPS, 5)),
+                "protein_g": rng.randint(20, 45),
+            }
+        schedule.append(entry)
+    return json.dumps({"schedule": schedule})
+
+
+def build_history(path, plans, seed=11):
+    """Write plans in the schema before migration 2: full prompt and plan text per row."""
+    rng = random.Random(seed)
+    with patch.object(DBManager, "MIGRATIONS", DBManager.MIGRATIONS[:1]):
+        db = DBManager(path)
+
+    def insert(c):
+        for n in range(plans):
+            # Most weeks reuse the default prompt; some tweak it
+            prompt = DEFAULT_PROMPT if rng.random() < 0.9 else f"{DEFAULT_PROMPT}\nWeek {n}: no seafood."
+            items = [f"{name} ingredients ({rng.randint(1, 3)})" for name, _ in rng.sample(MEALS, 6)]
+            c.execute(
+                "INSERT INTO meal_plans (date, prompt, plan_json, item_count) VALUES (?, ?, ?, ?)",
+                ("2024-01-01 10:00", prompt, synthetic_plan(rng), len(items)),
+            )
+            plan_id = c.lastrowid
+            c.executemany(
+                "INSERT INTO plan_items (plan_id, position, raw, name) VALUES (?, ?, ?, ?)",
+                [(plan_id, pos, item, item.lower()) for pos, item in enumerate(items)],
+            )
+
+    db._write(insert)
+    db.close()
+
+
+def vacuumed_size(path):
+    """File size in bytes after VACUUM, with the WAL checkpointed away."""
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def upgrade(source, target, compress):
+    """Copy source and run the pending migrations on it; returns milliseconds."""
+    shutil.copy(source, target)
+    with patch("database.DB_COMPRESS_TEXT", compress):
+        start = time.perf_counter()
+        db = DBManager(target)
+        elapsed = (time.perf_counter() - start) * 1000
+        db.close()
+    return elapsed
+
+
+def open_plan_ms(path, runs):
+    """Median milliseconds for get_plan() on random plans."""
+    db = DBManager(path)
+    ids = [row[0] for row in db.conn.execute("SELECT id FROM meal_plans")]
+    rng = random.Random(3)
+    timings = []
+    for _ in range(runs):
+        plan_id = rng.choice(ids)
+        start = time.perf_counter()
+        db.get_plan(plan_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    db.close()
+    return statistics.median(timings)
+
+
+def main(years, per_week, runs):
+    plans = years * 52 * per_week
+    with tempfile.TemporaryDirectory() as tmp:
+        before = os.path.join(tmp, "before.db")
+        build_history(before, plans)
+
+        rows = [("before (v1, plain text)", vacuumed_size(before), None, None)]
+        for label, compress in (("prompts deduplicated", False), ("deduplicated + zlib", True)):
+            path = os.path.join(tmp, f"{compress}.db")
+            migration_ms = upgrade(before, path, compress)
+            rows.append((label, vacuumed_size(path), migration_ms, open_plan_ms(path, runs)))
+
+    print(f"{years} years x {per_week} plans/week = {plans:,} plans")
+    print(f"{'layout':<26} {'size KB':>10} {'vs before':>10} {'migration ms':>13} {'open plan ms':>13}")
+    base = rows[0][1]
+    for label, size, migration_ms, open_ms in rows:
+        migration = f"{migration_ms:>13,.0f}" if migration_ms is not None else f"{'n/a':>13}"
+        opened = f"{open_ms:>13.3f}" if open_ms is not None else f"{'n/a':>13}"
+        print(f"{label:<26} {size / 1024:>10,.0f} {size / base:>10.0%} {migration} {opened}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-week", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    main(args.years, args.per_week, args.runs)
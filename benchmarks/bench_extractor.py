@@ -0,0 +1,124 @@
+"""
+Benchmark: local ingredient parser vs. the extractor LLM call.
+
+Runs both extraction paths over a recorded meal plan and scores them against a
+hand-checked shopping list: latency, items found (recall), extra items
+(precision) and how many matched items carry the right quantity. The LLM path
+only runs with --llm and a GOOGLE_API_KEY.
+
+Usage:
+    python benchmarks/bench_extractor.py [--runs 50] [--llm]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import ingredients  # noqa: E402
+from units import tokenize  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+PLAN = os.path.join(FIXTURES, "meal_plan.json")
+EXPECTED = os.path.join(FIXTURES, "meal_plan_expected.json")
+
+
+def local_extract(plan_json, pantry):
+    """The parser-only path (no LLM fallback), as {name, quantity, unit} dicts."""
+    parsed, _ = ingredients.parse_plan(plan_json)
+    items = ingredients.subtract_pantry(ingredients.consolidate(parsed), pantry)
+    return [
+        {"name": item["name"], **(item["quantities"][0] if item["quantities"] else {})}
+        for item in items
+    ]
+
+
+async def llm_extract(plan_json, pantry):
+    """The EXTRACTOR_MODEL path, with its free-text items parsed for scoring."""
+    from agent import extract_with_llm
+    from config import EXTRACTOR_MODEL
+    from llm_cache import llm_cache
+    from llm_clients import get_llm
+
+    llm_cache.nodes["extractor"] = False  # Measure real calls
+    llm = get_llm(EXTRACTOR_MODEL, temperature=1.0)
+    lines = await extract_with_llm(llm, plan_json, pantry)
+    parsed = [p for p in (ingredients.parse_line(line) for line in lines) if p]
+    return [
+        {"name": item["name"], **(item["quantities"][0] if item["quantities"] else {})}
+        for item in ingredients.consolidate(parsed)
+    ]
+
+
+def matches(gold_name, name):
+    """Names match when one's product words contain the other's."""
+    gold_words, words = set(tokenize(gold_name)), set(tokenize(name))
+    return gold_words <= words or words <= gold_words
+
+
+def score(found, expected):
+    """Return (recall, precision, quantity accuracy) of found against expected."""
+    matched_found = set()
+    hits = quantity_hits = 0
+    for gold in expected:
+        for i, item in enumerate(found):
+            if i not in matched_found and matches(gold["name"], item["name"]):
+                matched_found.add(i)
+                hits += 1
+                if item.get("unit") == gold["unit"] and abs(
+                    float(item.get("quantity", 0)) - gold["quantity"]
+                ) <= 0.05 * gold["quantity"]:
+                    quantity_hits += 1
+                break
+    recall = hits / len(expected) if expected else 0.0
+    precision = len(matched_found) / len(found) if found else 0.0
+    return recall, precision, quantity_hits / hits if hits else 0.0
+
+
+def report(name, timings, found, expected):
+    recall, precision, qty = score(found, expected)
+    print(
+        f"{name:<8} {statistics.median(timings):>10.2f} {len(found):>6} "
+        f"{recall:>7.0%} {precision:>10.0%} {qty:>9.0%}"
+    )
+
+
+async def main(runs, use_llm):
+    with open(PLAN, encoding="utf-8") as f:
+        plan_json = f.read()
+    with open(EXPECTED, encoding="utf-8") as f:
+        expected = json.load(f)
+    pantry = expected["pantry"]
+
+    print(f"{os.path.basename(PLAN)}: {len(expected['items'])} expected items, pantry '{pantry}'")
+    print(f"{'path':<8} {'p50 ms':>10} {'items':>6} {'recall':>7} {'precision':>10} {'quantity':>9}")
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        found = local_extract(plan_json, pantry)
+        timings.append((time.perf_counter() - start) * 1000)
+    report("local", timings, found, expected["items"])
+    _, unparsed = ingredients.parse_plan(plan_json)
+    print(f"         {len(unparsed)} line(s) would go to the LLM fallback: {unparsed}")
+
+    if use_llm:
+        if not os.getenv("GOOGLE_API_KEY"):
+            print("llm      skipped: GOOGLE_API_KEY is not set")
+            return
+        start = time.perf_counter()
+        found = await llm_extract(plan_json, pantry)
+        report("llm", [(time.perf_counter() - start) * 1000], found, expected["items"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--llm", action="store_true", help="Also time one EXTRACTOR_MODEL call")
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.llm))
@@ -0,0 +1,123 @@
+"""
+Benchmark: history queries over JSON-blob shopping lists vs. the plan_items table.
+
+Builds a throwaway database with a synthetic history (10k plans by default),
+once in the legacy layout (a JSON list per meal_plans row) and once through
+DBManager, then times the history queries both ways plus the one-time
+migration of the legacy file.
+
+Usage:
+    python benchmarks/bench_history.py [--plans 10000] [--items 30] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database import DBManager  # noqa: E402
+
+PRODUCTS = [
+    "Eggs", "Milk", "Bread", "Chicken Breast", "Ground Beef", "Salmon Fillet", "Rice",
+    "Black Beans", "Yellow Onion", "Garlic", "Tomatoes", "Spinach", "Avocado", "Lemon",
+    "Greek Yogurt", "Cheddar Cheese", "Oats", "Banana", "Blueberries", "Peanut Butter",
+    "Tortillas", "Bell Pepper", "Broccoli", "Sweet Potato", "Shrimp", "Pasta", "Basil",
+]
+BRANDS = ["", "Amazon Grocery ", "365 by Whole Foods Market ", "Organic ", "Smuckers "]
+
+
+def synthetic_lists(plans, items, seed=7):
+    """Yield one shopping list per plan, with brand and quantity variations."""
+    rng = random.Random(seed)
+    for _ in range(plans):
+        chosen = rng.sample(PRODUCTS, min(items, len(PRODUCTS)))
+        yield [f"{rng.choice(BRANDS)}{name} ({rng.randint(1, 4)})" for name in chosen]
+
+
+def build_legacy(path, lists):
+    """Write the pre-plan_items layout: shopping lists as JSON blobs."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE meal_plans (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, "
+        "prompt TEXT, plan_json TEXT, shopping_list TEXT)"
+    )
+    conn.executemany(
+        "INSERT INTO meal_plans (date, prompt, plan_json, shopping_list) VALUES (?, ?, ?, ?)",
+        (("2024-01-01 10:00", "", "{}", json.dumps(items)) for items in lists),
+    )
+    conn.commit()
+    return conn
+
+
+def legacy_all_items(conn):
+    """The old get_all_past_items(): decode every blob in Python."""
+    all_items = set()
+    for (list_str,) in conn.execute("SELECT shopping_list FROM meal_plans"):
+        all_items.update(i.strip() for i in json.loads(list_str))
+    return ", ".join(all_items)
+
+
+def legacy_frequencies(conn, limit):
+    """Per-item plan counts the only way the blob layout allows."""
+    counts = Counter()
+    for (list_str,) in conn.execute("SELECT shopping_list FROM meal_plans"):
+        counts.update(set(json.loads(list_str)))
+    return counts.most_common(limit)
+
+
+def timed(func, runs):
+    """Median milliseconds of func() over runs."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(plans, items, runs):
+    lists = list(synthetic_lists(plans, items))
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        legacy = build_legacy(legacy_path, lists)
+
+        rows = [
+            ("all past items (distinct)", timed(lambda: legacy_all_items(legacy), runs), None),
+            ("top-20 item frequencies", timed(lambda: legacy_frequencies(legacy, 20), runs), None),
+        ]
+        legacy.close()
+
+        start = time.perf_counter()
+        db = DBManager(legacy_path)  # Runs the one-time migration
+        migration_ms = (time.perf_counter() - start) * 1000
+
+        rows[0] = rows[0][:2] + (timed(db.get_all_past_items, runs),)
+        rows[1] = rows[1][:2] + (timed(lambda: db.get_item_frequencies(20), runs),)
+        rows.append(
+            ("plans listing one product", None, timed(lambda: db.get_plans_with_item("Salmon Fillet"), runs))
+        )
+        db.close()
+
+    print(f"{plans:,} plans x {items} items, median of {runs} run(s)")
+    print(f"{'query':<28} {'JSON blobs ms':>14} {'plan_items ms':>14}")
+    for name, before, after in rows:
+        before_str = f"{before:>14.1f}" if before is not None else f"{'n/a':>14}"
+        print(f"{name:<28} {before_str} {after:>14.1f}")
+    print(f"one-time migration: {migration_ms:,.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plans", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(args.plans, args.items, args.runs)
@@ -0,0 +1,142 @@
+"""
+Micro-benchmark: per-card locator extraction vs. single evaluate() extraction.
+
+Loads the saved search-results fixture into a headless Chromium page and reads
+the top-K cards both ways, reporting Playwright round trips and wall time.
+
+Usage:
+    python benchmarks/bench_search_extraction.py [--runs 20] [--limit 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+from playwright.async_api import Locator, Page, async_playwright
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from browser import EXTRACT_OPTIONS_JS, build_option, parse_price  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "search_results.html")
+
+# Awaitable calls that each cost one driver round trip
+COUNTED_CALLS = {
+    Locator: ("all", "count", "text_content"),
+    Page: ("evaluate",),
+}
+
+
+@contextmanager
+def count_round_trips():
+    """Patch the Playwright calls in COUNTED_CALLS to count invocations."""
+    counter = {"calls": 0}
+    originals = []
+    for cls, names in COUNTED_CALLS.items():
+        for name in names:
+            original = getattr(cls, name)
+
+            async def counted(self, *args, _original=original, **kwargs):
+                counter["calls"] += 1
+                return await _original(self, *args, **kwargs)
+
+            setattr(cls, name, counted)
+            originals.append((cls, name, original))
+    try:
+        yield counter
+    finally:
+        for cls, name, original in originals:
+            setattr(cls, name, original)
+
+
+async def legacy_extract(page, limit):
+    """The locator-per-field loop search_and_get_options used before."""
+    results = await page.locator('div[data-component-type="s-search-result"]').all()
+    options = []
+    for i, res in enumerate(results[:limit]):
+        try:
+            title = await res.locator("h2").first.text_content()
+            price_text = "0.00"
+            if await res.locator(".a-price .a-offscreen").count() > 0:
+                price_text = await res.locator(".a-price .a-offscreen").first.text_content()
+            rating = "N/A"
+            rating_el = res.locator("i.a-icon-star-small span.a-icon-alt")
+            if await rating_el.count() > 0:
+                rating = await rating_el.first.text_content()
+            reviews = "0"
+            review_el = res.locator("span.a-size-base.s-underline-text")
+            if await review_el.count() > 0:
+                reviews = await review_el.first.text_content()
+            options.append(
+                {
+                    "index": i,
+                    "title": title.strip(),
+                    "price_str": price_text.strip(),
+                    "price": parse_price(price_text),
+                    "rating": rating.strip(),
+                    "reviews": reviews.strip(),
+                }
+            )
+        except Exception:
+            continue
+    return options
+
+
+async def single_pass_extract(page, limit):
+    """The evaluate()-based extraction search_and_get_options uses now."""
+    raw_cards = await page.evaluate(EXTRACT_OPTIONS_JS, limit)
+    return [o for o in (build_option(i, raw) for i, raw in enumerate(raw_cards)) if o]
+
+
+async def measure(page, extract, limit, runs):
+    """Return (round trips per run, list of wall times in ms, last result)."""
+    timings = []
+    result = None
+    with count_round_trips() as counter:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = await extract(page, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+    return counter["calls"] / runs, timings, result
+
+
+async def main(runs, limit):
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(html)
+
+        rows = []
+        results = {}
+        for name, extract in (("locators", legacy_extract), ("evaluate", single_pass_extract)):
+            trips, timings, result = await measure(page, extract, limit, runs)
+            results[name] = result
+            rows.append((name, trips, statistics.median(timings), max(timings)))
+        await browser.close()
+
+    print(f"Top-{limit} cards, {runs} runs on {os.path.basename(FIXTURE)}")
+    print(f"{'method':<10} {'round trips':>12} {'p50 ms':>9} {'max ms':>9}")
+    for name, trips, p50, worst in rows:
+        print(f"{name:<10} {trips:>12.0f} {p50:>9.2f} {worst:>9.2f}")
+
+    # Both paths must agree on every field the shopper already relied on
+    new_fields = [
+        {k: v for k, v in o.items() if k not in ("asin", "available")}
+        for o in results["evaluate"]
+    ]
+    print("outputs match:", results["locators"] == new_fields)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.limit))
@@ -0,0 +1,84 @@
+"""
+Benchmark: history sidebar queries as the number of saved plans grows.
+
+Fills throwaway databases with synthetic plans (with realistic plan_json
+sizes) and times one sidebar page loaded the old way, with full plans and
+shopping lists, against the metadata-only list_plans() listing, for the
+newest page and for a page deep in the history.
+
+Usage:
+    python benchmarks/bench_sidebar.py [--sizes 100 1000 10000] [--page 10] [--runs 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database import DBManager  # noqa: E402
+
+DAY = {
+    "day": "Monday",
+    "breakfast": {"name": "Oats", "ingredients": "1 cup oats, 1 banana", "instructions": "Cook. " * 40},
+    "lunch": {"name": "Salad", "ingredients": "2 cups spinach, 1 avocado", "instructions": "Mix. " * 40},
+    "dinner": {"name": "Salmon", "ingredients": "1 salmon fillet, rice", "instructions": "Bake. " * 40},
+}
+PLAN_JSON = json.dumps({"schedule": [DAY] * 7})
+ITEMS = [f"Item {n} (1)" for n in range(30)]
+
+
+def fill(db, plans):
+    """Insert plans directly, the same rows save_plan() writes."""
+
+    def insert(c):
+        for _ in range(plans):
+            c.execute(
+                "INSERT INTO meal_plans (date, prompt, plan_json, item_count) VALUES (?, ?, ?, ?)",
+                ("2024-01-01 10:00", "", PLAN_JSON, len(ITEMS)),
+            )
+            plan_id = c.lastrowid
+            c.executemany(
+                "INSERT INTO plan_items (plan_id, position, raw, name) VALUES (?, ?, ?, ?)",
+                [(plan_id, pos, item, item.lower()) for pos, item in enumerate(ITEMS)],
+            )
+
+    db._write(insert)
+
+
+def timed(func, runs):
+    """Median milliseconds of func() over runs."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(sizes, page, runs):
+    print(f"{'plans':>8} {'full page ms':>13} {'list_plans ms':>14} {'deep page ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db = DBManager(os.path.join(tmp, f"plans_{size}.db"))
+            fill(db, size)
+            deep_cursor = db.list_plans(limit=size // 2)[-1]["id"]
+
+            full = timed(lambda: [len(p["list"]) for p in db.get_recent_plans(page)], runs)
+            listing = timed(lambda: db.list_plans(None, page + 1), runs)
+            deep = timed(lambda: db.list_plans(deep_cursor, page + 1), runs)
+            print(f"{size:>8,} {full:>13.2f} {listing:>14.2f} {deep:>13.2f}")
+            db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--page", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.page, args.runs)
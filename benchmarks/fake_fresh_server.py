@@ -0,0 +1,296 @@
+"""
+Offline Amazon Fresh stand-in for benchmarking and regression-testing browser.py.
+
+Serves synthesized storefront, search-results, product, cart and checkout pages
+that use the same selectors AmazonFreshBrowser relies on. Product data is
+derived deterministically from the query, so runs are repeatable. Latency and
+failures can be injected to exercise timeouts and fallbacks.
+
+Usage:
+    python benchmarks/fake_fresh_server.py --port 8765 --latency-ms 150 --fail-rate 0.05
+    AMAZON_BASE_URL=http://127.0.0.1:8765 streamlit run amazon_fresh_fetch.py
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BRANDS = ["Amazon Fresh", "365 by Whole Foods Market", "Happy Belly", "Organic Valley", "Store Brand"]
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+  <div id="nav-belt">
+    <form action="/s" method="get">
+      <input type="text" id="twotabsearchtextbox" name="k" value="{query}">
+      <input type="hidden" name="i" value="amazonfresh">
+    </form>
+    <a id="nav-link-accountList"><span id="nav-link-accountList-nav-line-1">Hello, Tester</span></a>
+    <a id="nav-cart" href="/gp/cart/view.html"><span id="nav-cart-count">{cart_count}</span></a>
+  </div>
+  {body}
+  <script>
+    async function addToCart(button, asin) {{
+      const response = await fetch("/cart/add-to-cart?asin=" + asin + "&qty=1", {{method: "POST"}});
+      if (!response.ok) return;
+      const badge = document.getElementById("nav-cart-count");
+      badge.textContent = String(parseInt(badge.textContent, 10) + 1);
+      const stepper = document.createElement("span");
+      stepper.className = "a-stepper-inner-container";
+      stepper.textContent = "1 in cart";
+      button.replaceWith(stepper);
+    }}
+  </script>
+</body>
+</html>
+"""
+
+
+def product_for(query, position):
+    """
+    Synthesize a deterministic product for a query and result position.
+
+    Args:
+        query (str): The search text.
+        position (int): Zero-based result position.
+
+    Returns:
+        dict: asin, title, price, rating and reviews for the card.
+    """
+    digest = hashlib.sha1(f"{query.lower()}:{position}".encode()).hexdigest()
+    seed = int(digest[:8], 16)
+    return {
+        "asin": "B0" + digest[:8].upper(),
+        "title": f"{BRANDS[seed % len(BRANDS)]}, {query.title()}, {8 + seed % 24} Oz",
+        "price": round(0.99 + (seed % 1500) / 100, 2),
+        "rating": f"{3.5 + (seed % 15) / 10:.1f} out of 5 stars",
+        "reviews": f"{seed % 40000:,}",
+    }
+
+
+class FakeFreshState:
+    """
+    Mutable server state shared by all request handlers.
+
+    Attributes:
+        latency_ms (int): Base delay added to every response.
+        jitter_ms (int): Extra random delay of up to this many ms.
+        fail_rate (float): Fraction of requests answered with HTTP 503.
+        empty_rate (float): Fraction of searches that return no results.
+        results_per_page (int): Result cards per search page.
+        cart (dict): Quantity in the cart keyed by ASIN.
+        titles (dict): Product titles keyed by ASIN, for the cart page.
+        requests (int): Requests served so far.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, fail_rate=0.0, empty_rate=0.0,
+                 results_per_page=8, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.empty_rate = empty_rate
+        self.results_per_page = results_per_page
+        self.cart = {}
+        self.titles = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def add(self, asin, qty):
+        """Add qty of asin to the cart."""
+        with self.lock:
+            self.cart[asin] = self.cart.get(asin, 0) + qty
+
+    def cart_count(self):
+        """Total quantity in the cart."""
+        with self.lock:
+            return sum(self.cart.values())
+
+
+class FakeFreshHandler(BaseHTTPRequestHandler):
+    """Routes requests to the synthesized pages."""
+
+    state = None  # Set per server by make_server
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from base class
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        state = self.state
+        with state.lock:
+            state.requests += 1
+            delay = state.latency_ms + state.rng.uniform(0, state.jitter_ms)
+            fail = state.rng.random() < state.fail_rate
+            empty = state.rng.random() < state.empty_rate
+        if delay:
+            time.sleep(delay / 1000)
+        if fail:
+            self._send(503, "<html><body>Service Unavailable</body></html>")
+            return
+
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/s":
+            self._search(params.get("k", [""])[0], empty)
+        elif url.path.startswith("/dp/"):
+            self._detail(url.path[len("/dp/"):])
+        elif url.path == "/cart/add-to-cart":
+            state.add(params.get("asin", [""])[0], int(params.get("qty", ["1"])[0]))
+            self._send(200, json.dumps({"ok": True, "count": state.cart_count()}),
+                       "application/json")
+        elif url.path == "/gp/aws/cart/add.html":
+            self._cart_add_url(url.query, params)
+        elif url.path == "/gp/cart/view.html":
+            self._cart()
+        elif url.path == "/checkout":
+            self._page("Checkout", "", '<h1 id="checkout-title">Checkout</h1>')
+        else:
+            self._page("Amazon Fresh", "", '<div id="storefront">Amazon Fresh</div>')
+
+    def _search(self, query, empty):
+        cards = []
+        count = 0 if empty else self.state.results_per_page
+        for position in range(count):
+            product = product_for(query, position)
+            self.state.titles[product["asin"]] = product["title"]
+            cards.append(
+                f'<div data-component-type="s-search-result" data-asin="{product["asin"]}">'
+                f'<h2><span>{html.escape(product["title"])}</span></h2>'
+                f'<i class="a-icon a-icon-star-small"><span class="a-icon-alt">{product["rating"]}</span></i>'
+                f'<span class="a-size-base s-underline-text">{product["reviews"]}</span>'
+                f'<span class="a-price"><span class="a-offscreen">${product["price"]:.2f}</span></span>'
+                f'<button name="submit.addToCart" type="button" aria-label="Add to cart" '
+                f'onclick="addToCart(this, \'{product["asin"]}\')">Add to cart</button>'
+                f"</div>"
+            )
+        body = f'<div class="s-main-slot s-result-list">{"".join(cards)}</div>'
+        self._page(f"Amazon.com : {query}", query, body)
+
+    def _detail(self, asin):
+        title = self.state.titles.get(asin, f"Product {asin}")
+        body = (
+            f'<div id="dp" data-asin="{asin}"><span id="productTitle">{html.escape(title)}</span>'
+            f'<input id="add-to-cart-button" type="button" value="Add to Cart" '
+            f'onclick="addToCart(this, \'{asin}\')"></div>'
+        )
+        self._page(title, "", body)
+
+    def _cart_add_url(self, query, params):
+        # Like Amazon: GET asks for confirmation, the confirming POST adds and shows the cart
+        if self.command == "GET":
+            body = (
+                f'<form method="post" action="/gp/aws/cart/add.html?{html.escape(query)}">'
+                '<input type="submit" name="add" value="Continue"></form>'
+            )
+            self._page("Add to Cart", "", body)
+            return
+        n = 1
+        while f"ASIN.{n}" in params:
+            self.state.add(params[f"ASIN.{n}"][0], int(params.get(f"Quantity.{n}", ["1"])[0]))
+            n += 1
+        self.send_response(303)
+        self.send_header("Location", "/gp/cart/view.html")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _cart(self):
+        with self.state.lock:
+            lines = list(self.state.cart.items())
+        rows = "".join(
+            f'<div class="sc-list-item" data-asin="{asin}" data-quantity="{qty}">'
+            f'<span class="sc-product-title">{html.escape(self.state.titles.get(asin, asin))}</span>'
+            f"</div>"
+            for asin, qty in lines
+        )
+        body = (
+            f'<div id="sc-active-cart">{rows}</div>'
+            '<form action="/checkout" method="post">'
+            '<input type="submit" name="proceedToALMCheckout-QW1hem9uIEZyZXNo" '
+            'value="Check out Fresh Cart"></form>'
+        )
+        self._page("Shopping Cart", "", body)
+
+    def _page(self, title, query, body):
+        page = PAGE_TEMPLATE.format(
+            title=html.escape(title),
+            query=html.escape(query, quote=True),
+            cart_count=self.state.cart_count(),
+            body=body,
+        )
+        self._send(200, page)
+
+    def _send(self, status, payload, content_type="text/html; charset=utf-8"):
+        data = payload.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(port=0, **state_kwargs):
+    """
+    Create (but don't start) a stand-in server.
+
+    Args:
+        port (int): Port to bind on 127.0.0.1; 0 picks a free one.
+        **state_kwargs: Passed to FakeFreshState (latency_ms, fail_rate, ...).
+
+    Returns:
+        ThreadingHTTPServer: The server; its ``state`` attribute holds FakeFreshState.
+    """
+    state = FakeFreshState(**state_kwargs)
+    handler = type("BoundFakeFreshHandler", (FakeFreshHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.state = state
+    return server
+
+
+def start_in_thread(**kwargs):
+    """
+    Start a stand-in server on a background thread.
+
+    Returns:
+        tuple: (server, base_url). Call server.shutdown() when done.
+    """
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline Amazon Fresh stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--jitter-ms", type=int, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--empty-rate", type=float, default=0.0)
+    parser.add_argument("--results", type=int, default=8)
+    args = parser.parse_args()
+
+    httpd = make_server(
+        args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        fail_rate=args.fail_rate,
+        empty_rate=args.empty_rate,
+        results_per_page=args.results,
+    )
+    print(f"Fake Amazon Fresh on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -7,12 +7,284 @@ including searching for items, adding them to the cart, and initiating checkout.
 
 import asyncio
 import os
+import re
+from contextlib import asynccontextmanager
 from typing import Dict, List
+from urllib.parse import quote_plus
 
 import streamlit as st
 from playwright.async_api import async_playwright
 
-from config import SESSION_FILE
+from config import (
+    ADD_CONFIRM_TIMEOUT_MS,
+    AMAZON_BASE_URL,
+    BULK_ADD_CHUNK_SIZE,
+    BLOCKED_BYTES_DEFAULT,
+    BLOCKED_BYTES_ESTIMATE,
+    BROWSER_SERVICE_URL,
+    HEADLESS_MODE,
+    MAX_CONCURRENT_PAGES,
+    NETWORK_ALLOWLIST,
+    NETWORK_BLOCK_PROFILE,
+    NETWORK_BLOCK_PROFILES,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_TTL_HOURS,
+    SEARCH_NAVIGATION,
+    SEARCH_RESULTS_LIMIT,
+    SESSION_FILE,
+    SLOW_MO_MS,
+)
+from database import db
+from telemetry import telemetry
+
+FRESH_STOREFRONT_PATH = "/alm/storefront?almBrandId=QW1hem9uIEZyZXNo"
+SEARCH_RESULT_SELECTOR = 'div[data-component-type="s-search-result"]'
+
+CART_COUNT_SELECTOR = "#nav-cart-count"
+# Quantity stepper that replaces a card's Add button once the item is in the cart
+CARD_STEPPER_SELECTOR = (
+    "[data-action='a-stepper-increment'], .a-stepper-inner-container, "
+    "select[name='quantity']"
+)
+# Responses that acknowledge an add-to-cart request
+CART_ADD_RESPONSE_PATTERN = re.compile(r"add-?to-?cart|cart/add|/cart/ajax", re.IGNORECASE)
+CHECKOUT_BUTTON_SELECTOR = (
+    "input[name='proceedToALMCheckout-QW1hem9uIEZyZXNo'], "
+    "input[name='proceedToRetailCheckout'], #sc-buy-box-ptc-button"
+)
+
+# Continue button on the cart-add page Amazon shows for URL-driven adds
+CART_ADD_CONFIRM_SELECTOR = "input[name='add'], input[name='submit.add-to-cart']"
+# Banners Amazon shows after a successful URL-driven add
+CART_ADD_SUCCESS_SELECTOR = (
+    "#NATC_SMART_WAGON_CONF_MSG_SUCCESS, #sw-atc-confirmation, #huc-v2-order-row-confirm-text"
+)
+# Reads {asin: quantity} from the active cart, or null when no cart list is shown
+CART_ASINS_JS = """
+() => {
+    const cart = document.querySelector("#sc-active-cart");
+    if (!cart) return null;
+    const items = {};
+    for (const row of cart.querySelectorAll("[data-asin]")) {
+        const asin = row.getAttribute("data-asin");
+        if (asin) items[asin] = parseInt(row.getAttribute("data-quantity") || "1", 10);
+    }
+    return items;
+}
+"""
+
+# Reads the top result cards in a single evaluate() call. Selectors mirror the
+# ones the locator-based code used, one querySelector per field.
+EXTRACT_OPTIONS_JS = """
+(limit) => {
+    const text = (card, selector) => {
+        const el = card.querySelector(selector);
+        return el ? el.textContent : null;
+    };
+    const cards = Array.from(
+        document.querySelectorAll('div[data-component-type="s-search-result"]')
+    ).slice(0, limit);
+    return cards.map((card) => ({
+        asin: card.getAttribute("data-asin") || "",
+        title: text(card, "h2"),
+        price: text(card, ".a-price .a-offscreen"),
+        rating: text(card, "i.a-icon-star-small span.a-icon-alt"),
+        reviews: text(card, "span.a-size-base.s-underline-text"),
+        can_add:
+            !!card.querySelector("button[name='submit.addToCart'], input[name='submit.addToCart']") ||
+            Array.from(card.querySelectorAll("button")).some((b) =>
+                /add to cart/i.test(b.getAttribute("aria-label") || b.textContent || "")
+            ),
+    }));
+}
+"""
+
+
+class BlockRules:
+    """
+    Compiled request-blocking rules for one network profile.
+
+    Attributes:
+        resource_types (set): Playwright resource types to abort.
+        url_patterns (List[Pattern]): URL regexes to abort.
+        allowlist (List[Pattern]): URL regexes that are never aborted.
+    """
+
+    def __init__(self, profile: dict, allowlist: List[str]):
+        """
+        Initialize the BlockRules.
+
+        Args:
+            profile (dict): An entry of NETWORK_BLOCK_PROFILES.
+            allowlist (List[str]): URL regexes that must always load.
+        """
+        self.resource_types = set(profile.get("resource_types", []))
+        self.url_patterns = [re.compile(p) for p in profile.get("url_patterns", [])]
+        self.allowlist = [re.compile(p) for p in allowlist]
+
+    def __bool__(self):
+        return bool(self.resource_types or self.url_patterns)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """
+        Decide whether a request should be aborted.
+
+        Args:
+            resource_type (str): Playwright resource type, e.g. "image".
+            url (str): The request URL.
+
+        Returns:
+            bool: True if the request matches the profile and not the allowlist.
+        """
+        if any(p.search(url) for p in self.allowlist):
+            return False
+        return resource_type in self.resource_types or any(
+            p.search(url) for p in self.url_patterns
+        )
+
+
+def search_url(query: str, base_url: str = AMAZON_BASE_URL) -> str:
+    """
+    Build the Amazon Fresh search-results URL for a query.
+
+    Args:
+        query (str): The search text.
+        base_url (str): Site root. Defaults to AMAZON_BASE_URL.
+
+    Returns:
+        str: URL that opens the Fresh results for the query directly.
+    """
+    return f"{base_url}/s?k={quote_plus(query)}&i=amazonfresh"
+
+
+def cart_add_url(items, base_url: str = AMAZON_BASE_URL) -> str:
+    """
+    Build Amazon's cart-add URL for one or more products.
+
+    Args:
+        items (List[tuple]): (asin, quantity) pairs.
+        base_url (str): Site root. Defaults to AMAZON_BASE_URL.
+
+    Returns:
+        str: URL that adds every listed product to the cart.
+    """
+    params = []
+    for n, (asin, quantity) in enumerate(items, start=1):
+        params.append(f"ASIN.{n}={asin}&Quantity.{n}={quantity}")
+    return f"{base_url}/gp/aws/cart/add.html?" + "&".join(params)
+
+
+def reconcile_cart(items, before, after) -> Dict[str, dict]:
+    """
+    Compare requested cart adds with how the cart page changed.
+
+    Args:
+        items (List[tuple]): (asin, quantity) pairs that were submitted.
+        before (dict): Quantity per ASIN read from the cart before submitting,
+            or None if the cart could not be read.
+        after (dict): Quantity per ASIN read from the cart afterwards, or None
+            if the cart could not be read.
+
+    Returns:
+        Dict[str, dict]: Add result per ASIN. An ASIN counts as confirmed when
+            its quantity grew by at least the requested amount, so a product
+            already in the cart doesn't hide a failed add. Without the first
+            read, a product found in the cart is only unconfirmed.
+    """
+    results = {}
+    for asin, quantity in items:
+        if after is None:
+            results[asin] = {"status": "UNCONFIRMED", "signal": None}
+        elif after.get(asin, 0) == 0:
+            results[asin] = {"status": "FAILED", "signal": None}
+        elif before is None:
+            results[asin] = {"status": "UNCONFIRMED", "signal": None}
+        elif after[asin] - before.get(asin, 0) >= quantity:
+            results[asin] = {"status": "CONFIRMED", "signal": "cart_page"}
+        else:
+            results[asin] = {"status": "FAILED", "signal": None}
+    return results
+
+
+def parse_price(price_text: str) -> float:
+    """
+    Convert a displayed price such as "$1,234.56" to a float.
+
+    Args:
+        price_text (str): The price text from the page.
+
+    Returns:
+        float: The parsed price, or 0.0 if the text is not a dollar amount.
+    """
+    if not price_text or "$" not in price_text:
+        return 0.0
+    try:
+        return float(price_text.replace("$", "").replace(",", "").strip())
+    except ValueError:
+        return 0.0
+
+
+def build_option(index: int, raw: dict):
+    """
+    Turn one card payload from EXTRACT_OPTIONS_JS into a shopper option dict.
+
+    Args:
+        index (int): Position of the card in the search results.
+        raw (dict): Raw card fields as returned by the page.
+
+    Returns:
+        dict: The option, or None if the card has no title.
+    """
+    title = raw.get("title")
+    if not title or not title.strip():
+        return None
+    price_text = (raw.get("price") or "0.00").strip()
+    return {
+        "index": index,
+        "title": title.strip(),
+        "price_str": price_text,
+        "price": parse_price(price_text),
+        "rating": (raw.get("rating") or "N/A").strip(),
+        "reviews": (raw.get("reviews") or "0").strip(),
+        "asin": raw.get("asin", ""),
+        "available": bool(raw.get("can_add")),
+    }
+
+
+async def first_signal(waiters: Dict[str, asyncio.Future], timeout: float):
+    """
+    Wait for the first waiter that completes successfully.
+
+    Waiters that fail (e.g. a Playwright timeout) are ignored; the rest are
+    cancelled as soon as one succeeds or the timeout elapses.
+
+    Args:
+        waiters (Dict[str, Future]): Pending waiters keyed by signal name.
+        timeout (float): Overall time limit in seconds.
+
+    Returns:
+        str: The name of the first successful waiter, or None.
+    """
+    names = {task: name for name, task in waiters.items()}
+    pending = set(names)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    return names[task]
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
 
 
 class AmazonFreshBrowser:
@@ -23,34 +295,113 @@ class AmazonFreshBrowser:
         browser (Browser): The Playwright browser instance.
         context (BrowserContext): The browser context.
         page (Page): The current browser page.
+        pages (List[Page]): All pages opened in the context, including ``page``.
+        max_pages (int): Upper bound on concurrently driven pages.
+        navigation (str): "url" to load result pages directly, "searchbox" to type queries.
+        use_search_cache (bool): Whether to serve repeat searches from the database cache.
+        cache_stats (dict): Search cache hit/miss counters for the current run.
+        block_rules (BlockRules): Request interception rules for the context.
+        network_stats (dict): Blocked request and estimated byte counters for the current run.
+        service_url (str): CDP endpoint of browser_service.py, or "" to launch locally.
+        base_url (str): Site root every navigation is relative to.
+        cart_queue (Dict[str, int]): Quantity per ASIN waiting for submit_cart_queue().
+        bulk_stats (dict): Bulk-add counters for the current run.
         playwright (Playwright): The Playwright instance.
         session_file (str): Path to the session storage file.
     """
 
-    def __init__(self):
-        """Initialize the AmazonFreshBrowser."""
+    def __init__(
+        self,
+        max_pages: int = MAX_CONCURRENT_PAGES,
+        navigation: str = SEARCH_NAVIGATION,
+        block_profile: str = NETWORK_BLOCK_PROFILE,
+    ):
+        """
+        Initialize the AmazonFreshBrowser.
+
+        Args:
+            max_pages (int): Maximum number of pages (tabs) to drive at once.
+                Defaults to MAX_CONCURRENT_PAGES.
+            navigation (str): Search navigation mode. Defaults to SEARCH_NAVIGATION.
+            block_profile (str): Key into NETWORK_BLOCK_PROFILES. Defaults to
+                NETWORK_BLOCK_PROFILE.
+        """
         self.browser = None
         self.context = None
         self.page = None
+        self.pages = []
+        self.max_pages = max(1, max_pages)
+        self.navigation = navigation
+        self.use_search_cache = SEARCH_CACHE_ENABLED
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self.block_rules = BlockRules(
+            NETWORK_BLOCK_PROFILES.get(block_profile, {}), NETWORK_ALLOWLIST
+        )
+        self.network_stats = {"blocked_requests": 0, "bytes_saved_estimate": 0}
+        self.service_url = BROWSER_SERVICE_URL
+        self.base_url = AMAZON_BASE_URL
+        self.cart_queue = {}
+        self.bulk_stats = {"queued": 0, "requests": 0, "confirmed": 0}
         self.playwright = None
         self.session_file = SESSION_FILE
+        self._idle_pages = None
+        self._opening_pages = 0
+        self._loop = None
+        self._result_asins = {}
 
     async def start(self):
         """
-        Launch the browser and navigate to Amazon Fresh.
+        Launch (or attach to) the browser and navigate to Amazon Fresh.
 
-        Loads the session if available, otherwise starts a new session.
+        With BROWSER_SERVICE_URL set, attaches over CDP to the long-running
+        browser_service.py process and reuses its logged-in context. Otherwise
+        launches a local Chromium and loads the session if available.
+
+        Playwright objects belong to the event loop that created them. The app
+        runs every step on one session loop (workflow.run_async), so a started
+        browser is reused; if a caller switches loops anyway, the old objects
+        can't be awaited any more and are dropped before starting again.
         """
-        if self.page:
+        loop = asyncio.get_running_loop()
+        if self.page and self._loop is loop:
             return
-        st.toast("🚀 Launching Browser...")
-        self.playwright = await async_playwright().start()
-        st.toast("🚀 Launching Browser...")
+        self._forget()
+        self._loop = loop
         self.playwright = await async_playwright().start()
-        
+
+        if self.service_url:
+            await self._connect_to_service()
+        else:
+            st.toast("🚀 Launching Browser...")
+            await self._launch_local()
+        if self.block_rules:
+            await self.context.route("**/*", self._route_request)
+
+        self._idle_pages = asyncio.Queue()
+        for page in self.pages:
+            self._idle_pages.put_nowait(page)
+        if self.page.url in ("", "about:blank"):
+            await self.page.goto(self.base_url + FRESH_STOREFRONT_PATH)
+
+        try:
+            if (
+                await self.page.locator("#nav-link-accountList-nav-line-1")
+                .filter(has_text="Sign in")
+                .count()
+                > 0
+            ):
+                st.warning("⚠️ Please Log In manually in the browser window!")
+                await asyncio.sleep(60)
+                await self.context.storage_state(path=self.session_file)
+        except Exception:
+            pass
+        st.success("✅ Browser Ready")
+
+    async def _launch_local(self):
+        """Launch a private Chromium and open a page in a new context."""
         try:
             self.browser = await self.playwright.chromium.launch(
-                headless=False, slow_mo=1000
+                headless=HEADLESS_MODE, slow_mo=SLOW_MO_MS
             )
         except Exception as e:
             if "Executable doesn't exist" in str(e):
@@ -66,7 +417,7 @@ class AmazonFreshBrowser:
                     
                     # Retry launch
                     self.browser = await self.playwright.chromium.launch(
-                        headless=False, slow_mo=1000
+                        headless=HEADLESS_MODE, slow_mo=SLOW_MO_MS
                     )
                 except Exception as install_error:
                     st.error(f"❌ Failed to install browser: {install_error}")
@@ -83,56 +434,210 @@ class AmazonFreshBrowser:
             self.context = await self.browser.new_context(
                 viewport={"width": 1280, "height": 720}
             )
-
         self.page = await self.context.new_page()
-        await self.page.goto(
-            "https://www.amazon.com/alm/storefront?almBrandId=QW1hem9uIEZyZXNo"
-        )
+        self.pages = [self.page]
+
+    async def _connect_to_service(self):
+        """
+        Attach to the browser service and adopt its logged-in context.
+
+        Tabs left open by earlier runs are reused as pool pages rather than
+        piling up in the long-lived browser.
+        """
+        self.browser = await self.playwright.chromium.connect_over_cdp(self.service_url)
+        self.context = self.browser.contexts[0]
+        self.pages = list(self.context.pages[: self.max_pages])
+        if not self.pages:
+            self.pages = [await self.context.new_page()]
+        self.page = self.pages[0]
+        st.toast("🔌 Connected to browser service")
+
+    def _forget(self):
+        """Drop references to Playwright objects without awaiting anything."""
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.pages = []
+        self.playwright = None
+        self._idle_pages = None
+        self._loop = None
+        self._result_asins = {}
+
+    @asynccontextmanager
+    async def lease_page(self):
+        """
+        Borrow a page from the pool for the duration of a ``with`` block.
 
+        Extra pages are opened lazily in the shared (logged-in) context until
+        ``max_pages`` exist, and load the storefront first so a search box is
+        there in "searchbox" navigation; after that callers wait for a page to
+        be released.
+
+        Yields:
+            Page: A page that no other caller is using.
+        """
+        opened = len(self.pages) + self._opening_pages
+        if self._idle_pages.empty() and opened < self.max_pages:
+            # Count the page as opened before awaiting so concurrent callers can't overshoot
+            self._opening_pages += 1
+            try:
+                page = await self.context.new_page()
+                try:
+                    await page.goto(self.base_url + FRESH_STOREFRONT_PATH)
+                except Exception:
+                    pass  # The search reports the failure if the page stays blank
+            finally:
+                self._opening_pages -= 1
+            self.pages.append(page)
+        else:
+            page = await self._idle_pages.get()
         try:
-            if (
-                await self.page.locator("#nav-link-accountList-nav-line-1")
-                .filter(has_text="Sign in")
-                .count()
-                > 0
-            ):
-                st.warning("⚠️ Please Log In manually in the browser window!")
-                await asyncio.sleep(60)
-                await self.context.storage_state(path=self.session_file)
+            yield page
+        finally:
+            self._idle_pages.put_nowait(page)
+
+    async def _route_request(self, route):
+        """Abort requests the block profile rejects, let everything else through."""
+        request = route.request
+        if self.block_rules.should_block(request.resource_type, request.url):
+            self.network_stats["blocked_requests"] += 1
+            self.network_stats["bytes_saved_estimate"] += BLOCKED_BYTES_ESTIMATE.get(
+                request.resource_type, BLOCKED_BYTES_DEFAULT
+            )
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def reset_run_stats(self):
+        """Zero the per-run counters before a new shopping run."""
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self.network_stats = {"blocked_requests": 0, "bytes_saved_estimate": 0}
+        self.bulk_stats = {"queued": 0, "requests": 0, "confirmed": 0}
+
+    def run_stats(self) -> dict:
+        """
+        Snapshot the per-run counters.
+
+        Returns:
+            dict: Counters collected since the last reset_run_stats().
+        """
+        return {
+            "search_cache": dict(self.cache_stats),
+            "network": dict(self.network_stats),
+            "bulk_add": dict(self.bulk_stats),
+        }
+
+    async def _run_search(self, page, item_name: str) -> bool:
+        """
+        Load the search results for a query on the given page.
+
+        Args:
+            page (Page): Page to drive.
+            item_name (str): The search text.
+
+        Returns:
+            bool: True once result cards are attached, False if none appeared.
+        """
+        if self.navigation == "url":
+            await page.goto(
+                search_url(item_name, self.base_url), wait_until="domcontentloaded"
+            )
+        else:
+            search_box = page.locator('input[id="twotabsearchtextbox"]')
+            await search_box.clear()
+            await search_box.fill(item_name)
+            await search_box.press("Enter")
+
+        try:
+            # Smart wait for results
+            await page.wait_for_selector(
+                SEARCH_RESULT_SELECTOR, state="attached", timeout=5000
+            )
         except Exception:
-            pass
-        st.success("✅ Browser Ready")
+            return False
+        return True
+
+    async def _click_and_confirm(self, page, button, card=None) -> dict:
+        """
+        Click an add-to-cart control and wait for evidence the add landed.
+
+        Races three signals: the cart-count badge changing, an add-to-cart
+        network response, and (for result cards) the quantity stepper showing.
+        A stepper already on the card before the click proves nothing, so it
+        is only raced when the click is what makes it appear.
+
+        Args:
+            page (Page): The page the button is on.
+            button (Locator): The add-to-cart control.
+            card (Locator, optional): The result card holding the button.
+
+        Returns:
+            dict: {"status": "CONFIRMED" | "UNCONFIRMED" | "FAILED", "signal": str or None}.
+        """
+        timeout_ms = ADD_CONFIRM_TIMEOUT_MS
+        badge = page.locator(CART_COUNT_SELECTOR).first
+        before = None
+        if await badge.count() > 0:
+            before = (await badge.text_content() or "").strip()
+        stepper = card.locator(CARD_STEPPER_SELECTOR).first if card is not None else None
+        if stepper is not None and await stepper.is_visible():
+            stepper = None  # Item was in the cart already
+
+        # Listen for the response before clicking so a fast reply isn't missed
+        waiters = {
+            "network": asyncio.ensure_future(
+                page.wait_for_event(
+                    "response",
+                    predicate=lambda r: r.ok and CART_ADD_RESPONSE_PATTERN.search(r.url),
+                    timeout=timeout_ms,
+                )
+            )
+        }
+        try:
+            await button.click()
+        except Exception:
+            waiters["network"].cancel()
+            return {"status": "FAILED", "signal": None}
+
+        if before is not None:
+            waiters["cart_count"] = asyncio.ensure_future(
+                page.wait_for_function(
+                    """([selector, before]) => {
+                        const el = document.querySelector(selector);
+                        return !!el && el.textContent.trim() !== before;
+                    }""",
+                    arg=[CART_COUNT_SELECTOR, before],
+                    timeout=timeout_ms,
+                )
+            )
+        if stepper is not None:
+            waiters["stepper"] = asyncio.ensure_future(
+                stepper.wait_for(state="visible", timeout=timeout_ms)
+            )
+
+        signal = await first_signal(waiters, timeout_ms / 1000)
+        return {"status": "CONFIRMED" if signal else "UNCONFIRMED", "signal": signal}
 
     # --- BRUTE FORCE ADD ---
-    async def search_and_add(self, item_name: str) -> dict:
+    @telemetry.traced("browser.search_and_add", failed=lambda r: r["status"] != "ADDED")
+    async def search_and_add(self, item_name: str, page=None) -> dict:
         """
         Search for an item and add the first result to the cart.
 
         Args:
             item_name (str): The name of the item to search for.
+            page (Page, optional): Page to drive. Defaults to the main page.
 
         Returns:
-            dict: A dictionary containing the status ("ADDED", "NOT_FOUND", "ERROR") and price.
+            dict: A dictionary containing the status ("ADDED", "NOT_FOUND", "ERROR"),
+                price and, once added, the confirmation status.
         """
+        page = page or self.page
         try:
-            search_box = self.page.locator('input[id="twotabsearchtextbox"]')
-            await search_box.clear()
-            await search_box.fill(item_name)
-            await search_box.press("Enter")
-            
-            try:
-                # Smart wait for results
-                await self.page.wait_for_selector(
-                    'div[data-component-type="s-search-result"]', 
-                    state="attached", 
-                    timeout=5000
-                )
-            except Exception:
+            if not await self._run_search(page, item_name):
                 return {"status": "NOT_FOUND", "price": 0.0}
 
-            results = await self.page.locator(
-                'div[data-component-type="s-search-result"]'
-            ).all()
+            results = await page.locator(SEARCH_RESULT_SELECTOR).all()
             
             if not results:
                 return {"status": "NOT_FOUND", "price": 0.0}
@@ -143,136 +648,284 @@ class AmazonFreshBrowser:
                 try:
                     price_el = target_card.locator(".a-price .a-offscreen").first
                     if await price_el.count() > 0:
-                        txt = await price_el.text_content()
-                        price = float(txt.replace("$", "").replace(",", "").strip())
+                        price = parse_price(await price_el.text_content())
                 except Exception:
                     pass
 
-                # Try multiple button selectors
-                btn = target_card.get_by_role("button", name="Add to cart")
-                if await btn.count() == 0:
-                    btn = target_card.locator("button[name='submit.addToCart']")
-                if await btn.count() == 0:
-                    btn = target_card.locator("input[name='submit.addToCart']")
-
-                if await btn.count() > 0 and await btn.first.is_visible():
-                    await btn.first.click()
-                    # Wait for cart count to update or a success message? 
-                    # For now, just a small buffer is safer than nothing, but we rely on the UI not erroring.
-                    await asyncio.sleep(1) 
-                    return {"status": "ADDED", "price": price}
+                result = await self._add_from_card(page, target_card)
+                if result["status"] != "FAILED":
+                    return {
+                        "status": "ADDED",
+                        "price": price,
+                        "confirmation": result["status"],
+                    }
 
             return {"status": "NOT_FOUND", "price": 0.0}
         except Exception:
             return {"status": "ERROR", "price": 0.0}
 
     # --- SMART SHOPPER LOGIC ---
-    async def search_and_get_options(self, item_name: str) -> List[Dict]:
+    async def search_and_get_options(
+        self, item_name: str, page=None, limit: int = SEARCH_RESULTS_LIMIT
+    ) -> List[Dict]:
         """
-        Search for an item and return the top 5 results with details.
+        Search for an item and return the top results with details.
+
+        Fresh cache hits are returned without touching the page. Their options
+        carry ``cached=True`` and must be added with add_item_by_asin; the one
+        bought last time for this query also carries ``chosen=True``.
 
         Args:
             item_name (str): The name of the item to search for.
+            page (Page, optional): Page to drive. Defaults to the main page.
+            limit (int): How many result cards to read. Defaults to
+                SEARCH_RESULTS_LIMIT.
 
         Returns:
             List[Dict]: A list of dictionaries containing item details.
         """
+        with telemetry.span("browser.search") as span:
+            if self.use_search_cache:
+                cached = db.get_cached_search(item_name, SEARCH_CACHE_TTL_HOURS * 3600)
+                if cached:
+                    self.cache_stats["hits"] += 1
+                    span["cache_hit"] = True
+                    chosen_asin = cached["chosen_asin"]
+                    return [
+                        dict(
+                            opt,
+                            cached=True,
+                            chosen=bool(chosen_asin) and opt.get("asin") == chosen_asin,
+                        )
+                        for opt in cached["options"][:limit]
+                    ]
+                self.cache_stats["misses"] += 1
+
+            options = await self._search_options(item_name, page or self.page, limit)
+            if options and self.use_search_cache:
+                db.save_cached_search(item_name, options, SEARCH_CACHE_MAX_ENTRIES)
+            return options
+
+    async def _search_options(self, item_name: str, page, limit: int) -> List[Dict]:
+        """Run a live search and extract the top ``limit`` result cards."""
         try:
-            search_box = self.page.locator('input[id="twotabsearchtextbox"]')
-            await search_box.clear()
-            await search_box.fill(item_name)
-            await search_box.press("Enter")
-            
-            try:
-                await self.page.wait_for_selector(
-                    'div[data-component-type="s-search-result"]', 
-                    state="attached",
-                    timeout=5000
-                )
-            except Exception:
+            if not await self._run_search(page, item_name):
                 return []
 
-            results = await self.page.locator(
-                'div[data-component-type="s-search-result"]'
-            ).all()
-            
+            # One in-page pass instead of several locator round trips per card
+            raw_cards = await page.evaluate(EXTRACT_OPTIONS_JS, limit)
+            self._result_asins[page] = [raw.get("asin", "") for raw in raw_cards]
             options = []
-            # Check top 5 results
-            for i, res in enumerate(results[:5]):
-                try:
-                    title = await res.locator("h2").first.text_content()
-                    
-                    # Price
-                    price_text = "0.00"
-                    if await res.locator(".a-price .a-offscreen").count() > 0:
-                        price_text = await res.locator(".a-price .a-offscreen").first.text_content()
-                    
-                    # Rating (e.g. "4.5 out of 5 stars")
-                    rating = "N/A"
-                    rating_el = res.locator("i.a-icon-star-small span.a-icon-alt")
-                    if await rating_el.count() > 0:
-                        rating = await rating_el.first.text_content()
-                    
-                    # Review Count
-                    reviews = "0"
-                    review_el = res.locator("span.a-size-base.s-underline-text")
-                    if await review_el.count() > 0:
-                        reviews = await review_el.first.text_content()
-
-                    options.append(
-                        {
-                            "index": i,
-                            "title": title.strip(),
-                            "price_str": price_text.strip(),
-                            "price": (
-                                float(price_text.replace("$", "").replace(",", "").strip())
-                                if "$" in price_text
-                                else 0.0
-                            ),
-                            "rating": rating.strip(),
-                            "reviews": reviews.strip()
-                        }
-                    )
-                except Exception:
-                    continue
+            for i, raw in enumerate(raw_cards):
+                option = build_option(i, raw)
+                if option:
+                    options.append(option)
             return options
         except Exception:
             return []
 
-    async def add_specific_item(self, index: int) -> bool:
+    async def _add_from_card(self, page, card) -> dict:
         """
-        Add a specific item from the search results to the cart.
+        Click the add-to-cart control inside a result card.
 
         Args:
-            index (int): The index of the item in the search results.
+            page (Page): The page holding the card.
+            card (Locator): The result card.
+
+        Returns:
+            dict: {"status": "CONFIRMED" | "UNCONFIRMED" | "FAILED", "signal": str or None}.
+        """
+        btn = card.get_by_role("button", name="Add to cart")
+        if await btn.count() == 0:
+            btn = card.locator("button[name='submit.addToCart']")
+        if await btn.count() == 0:
+            btn = card.locator("input[name='submit.addToCart']")
+
+        if await btn.count() > 0:
+            await btn.first.scroll_into_view_if_needed()
+            if await btn.first.is_visible():
+                return await self._click_and_confirm(page, btn.first, card)
+        return {"status": "FAILED", "signal": None}
+
+    async def _submit_cart_url(self, page, items):
+        """
+        Send products to the cart through Amazon's cart-add URL.
+
+        Args:
+            page (Page): Page to drive.
+            items (List[tuple]): (asin, quantity) pairs.
+        """
+        await page.goto(cart_add_url(items, self.base_url), wait_until="domcontentloaded")
+        # Amazon asks the shopper to confirm adds that arrive by URL
+        confirm = page.locator(CART_ADD_CONFIRM_SELECTOR)
+        if await confirm.count() > 0:
+            async with page.expect_navigation(timeout=ADD_CONFIRM_TIMEOUT_MS):
+                await confirm.first.click()
+
+    async def _add_via_cart_url(self, page, items) -> Dict[str, dict]:
+        """
+        Add products through the cart-add URL and check the page it lands on.
+
+        The cart is read first, so a landing cart page can be compared against
+        it the same way submit_cart_queue() does.
+
+        Args:
+            page (Page): Page to drive.
+            items (List[tuple]): (asin, quantity) pairs.
+
+        Returns:
+            Dict[str, dict]: Add result per ASIN.
+        """
+        before = await self._read_cart(page)
+        await self._submit_cart_url(page, items)
+        in_cart = await page.evaluate(CART_ASINS_JS)
+        if in_cart is None:
+            succeeded = await page.locator(CART_ADD_SUCCESS_SELECTOR).count() > 0
+            status = (
+                {"status": "CONFIRMED", "signal": "confirmation_page"}
+                if succeeded
+                else {"status": "UNCONFIRMED", "signal": None}
+            )
+            return {asin: dict(status) for asin, _ in items}
+        return reconcile_cart(items, before, in_cart)
+
+    def queue_item(self, asin: str, quantity: int = 1):
+        """
+        Queue a product for the next submit_cart_queue() call.
+
+        Args:
+            asin (str): The product ASIN.
+            quantity (int): How many to add. Repeated ASINs accumulate.
+        """
+        self.cart_queue[asin] = self.cart_queue.get(asin, 0) + quantity
+
+    @telemetry.traced("browser.bulk_add")
+    async def submit_cart_queue(self, page=None) -> Dict[str, dict]:
+        """
+        Add every queued product in as few requests as possible.
+
+        Queued products go out in chunks of BULK_ADD_CHUNK_SIZE through the
+        cart-add URL. The cart page is read before and after, and each
+        product's quantity change shows whether its add landed.
+
+        Args:
+            page (Page, optional): Page to drive. Defaults to the main page.
+
+        Returns:
+            Dict[str, dict]: Add result per queued ASIN.
+        """
+        queued = list(self.cart_queue.items())
+        self.cart_queue = {}
+        if not queued:
+            return {}
+        page = page or self.page
+        before = await self._read_cart(page)
+        for start in range(0, len(queued), BULK_ADD_CHUNK_SIZE):
+            self.bulk_stats["requests"] += 1
+            try:
+                await self._submit_cart_url(page, queued[start:start + BULK_ADD_CHUNK_SIZE])
+            except Exception:
+                pass  # Whatever didn't land shows up in the reconciliation below
+
+        results = reconcile_cart(queued, before, await self._read_cart(page))
+        self.bulk_stats["queued"] += len(queued)
+        self.bulk_stats["confirmed"] += sum(
+            r["status"] == "CONFIRMED" for r in results.values()
+        )
+        return results
+
+    async def _read_cart(self, page):
+        """
+        Load the cart page and read the quantity of each product.
+
+        Args:
+            page (Page): Page to drive.
 
         Returns:
-            bool: True if added successfully, False otherwise.
+            dict: Quantity per ASIN, or None if the cart could not be read.
         """
         try:
-            results = await self.page.locator(
-                'div[data-component-type="s-search-result"]'
-            ).all()
-            if index >= len(results):
-                return False
-            target = results[index]
-
-            btn = target.get_by_role("button", name="Add to cart")
-            if await btn.count() == 0:
-                btn = target.locator("button[name='submit.addToCart']")
-            if await btn.count() == 0:
-                btn = target.locator("input[name='submit.addToCart']")
-
-            if await btn.count() > 0:
-                await btn.first.scroll_into_view_if_needed()
-                if await btn.first.is_visible():
-                    await btn.first.click()
-                    await asyncio.sleep(1)
-                    return True
-            return False
+            await page.goto(f"{self.base_url}/gp/cart/view.html", wait_until="domcontentloaded")
+            return await page.evaluate(CART_ASINS_JS)
         except Exception:
-            return False
+            return None
+
+    async def add_specific_item(self, index: int, page=None) -> dict:
+        """
+        Add a specific item from the search results to the cart.
+
+        Uses the ASIN recorded for that position by the last search on the
+        page, so the results are not scanned again.
+
+        Args:
+            index (int): The index of the item in the search results.
+            page (Page, optional): Page holding the search results. Defaults
+                to the main page.
+
+        Returns:
+            dict: {"status": "CONFIRMED" | "UNCONFIRMED" | "FAILED", "signal": str or None}.
+        """
+        page = page or self.page
+        asins = self._result_asins.get(page, [])
+        if index < len(asins) and asins[index]:
+            return await self.add_item_by_asin(asins[index], page)
+        with telemetry.span("browser.add") as span:
+            try:
+                card = page.locator(SEARCH_RESULT_SELECTOR).nth(index)
+                result = (
+                    await self._add_from_card(page, card)
+                    if await card.count() > 0
+                    else {"status": "FAILED", "signal": None}
+                )
+            except Exception:
+                result = {"status": "FAILED", "signal": None}
+            span["ok"] = result["status"] != "FAILED"
+            return result
+
+    async def add_item_by_asin(self, asin: str, page=None) -> dict:
+        """
+        Add a product to the cart by ASIN.
+
+        Clicks the product's card when the page is showing it; otherwise (for
+        example for cached options) adds it through the cart-add URL.
+
+        Args:
+            asin (str): The product ASIN.
+            page (Page, optional): Page to drive. Defaults to the main page.
+
+        Returns:
+            dict: {"status": "CONFIRMED" | "UNCONFIRMED" | "FAILED", "signal": str or None}.
+        """
+        failed = {"status": "FAILED", "signal": None}
+        if not asin:
+            return failed
+        page = page or self.page
+        with telemetry.span("browser.add") as span:
+            try:
+                card = page.locator(f'{SEARCH_RESULT_SELECTOR}[data-asin="{asin}"]').first
+                if await card.count() > 0:
+                    result = await self._add_from_card(page, card)
+                    if result["status"] != "FAILED":
+                        return result
+                    span["retries"] = 1  # Card click failed; retried through the URL
+                result = (await self._add_via_cart_url(page, [(asin, 1)]))[asin]
+            except Exception:
+                result = failed
+            span["ok"] = result["status"] != "FAILED"
+            return result
+
+    def remember_choice(self, item_name: str, option: dict):
+        """
+        Record the product bought for a query so the next cache hit can skip selection.
+
+        Args:
+            item_name (str): The search query that produced the option.
+            option (dict): The option that was added to the cart.
+        """
+        if self.use_search_cache and option.get("asin"):
+            db.save_search_choice(item_name, option["asin"])
 
+    @telemetry.traced("browser.checkout", failed=lambda started: not started)
     async def trigger_checkout(self):
         """
         Navigate to the cart and initiate the checkout process.
@@ -281,8 +934,16 @@ class AmazonFreshBrowser:
             bool: True if checkout initiated successfully, False otherwise.
         """
         st.toast("🛒 Going to Cart...")
-        await self.page.goto("https://www.amazon.com/gp/cart/view.html")
-        await asyncio.sleep(3)
+        await self.page.goto(f"{self.base_url}/gp/cart/view.html")
+        try:
+            # Proceed once a checkout control renders rather than after a fixed pause
+            await self.page.wait_for_selector(
+                f"{CHECKOUT_BUTTON_SELECTOR}, button:has-text('Check out Fresh Cart')",
+                state="visible",
+                timeout=ADD_CONFIRM_TIMEOUT_MS,
+            )
+        except Exception:
+            pass
         st.toast("➡️ Clicking 'Check out Fresh Cart'...")
         try:
             fresh_btn = self.page.get_by_role("button", name="Check out Fresh Cart")
@@ -304,10 +965,24 @@ class AmazonFreshBrowser:
         return False
 
     async def close(self):
-        """Close the browser and save the session."""
-        if self.context:
-            await self.context.storage_state(path=self.session_file)
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        """
+        Close the browser and save the session.
+
+        When attached to the browser service, only the connection is closed;
+        the service keeps Chromium and the login alive for the next run.
+        """
+        if self._loop is not asyncio.get_running_loop():
+            # Objects from a finished event loop can't be awaited any more
+            self._forget()
+            return
+        if self.service_url:
+            if self.playwright:
+                await self.playwright.stop()
+        else:
+            if self.context:
+                await self.context.storage_state(path=self.session_file)
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
+        self._forget()
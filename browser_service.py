@@ -0,0 +1,77 @@
+"""
+Long-running browser service for Amazon Fresh Agent.
+
+Owns a persistent Chromium profile (so the Amazon login survives restarts) and
+exposes it over the Chrome DevTools Protocol. The Streamlit app attaches to it
+with BROWSER_SERVICE_URL instead of launching a cold browser on every run.
+
+Usage:
+    python browser_service.py
+    BROWSER_SERVICE_URL=http://127.0.0.1:9222 streamlit run amazon_fresh_fetch.py
+"""
+
+import asyncio
+import json
+import os
+import signal
+
+from playwright.async_api import async_playwright
+
+from browser import FRESH_STOREFRONT_PATH
+from config import (
+    AMAZON_BASE_URL,
+    BROWSER_SERVICE_PORT,
+    HEADLESS_MODE,
+    SESSION_FILE,
+    SLOW_MO_MS,
+    USER_DATA_DIR,
+)
+
+
+async def serve(port: int = BROWSER_SERVICE_PORT):
+    """
+    Launch the persistent browser and keep it running until interrupted.
+
+    Args:
+        port (int): Local port for the CDP endpoint. Defaults to BROWSER_SERVICE_PORT.
+    """
+    fresh_profile = not os.path.exists(USER_DATA_DIR)
+    async with async_playwright() as p:
+        context = await p.chromium.launch_persistent_context(
+            USER_DATA_DIR,
+            headless=HEADLESS_MODE,
+            slow_mo=SLOW_MO_MS,
+            viewport={"width": 1280, "height": 720},
+            args=[f"--remote-debugging-port={port}"],
+        )
+
+        # Seed a brand-new profile with the cookies saved by the in-app browser
+        if fresh_profile and os.path.exists(SESSION_FILE):
+            with open(SESSION_FILE, encoding="utf-8") as f:
+                await context.add_cookies(json.load(f).get("cookies", []))
+
+        page = context.pages[0] if context.pages else await context.new_page()
+        await page.goto(AMAZON_BASE_URL + FRESH_STOREFRONT_PATH)
+        print(f"✅ Browser service ready on http://127.0.0.1:{port}")
+        print("   Log in to Amazon in this window once; the profile keeps the session.")
+        print(f"   Start the app with BROWSER_SERVICE_URL=http://127.0.0.1:{port}")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        await stop.wait()
+
+        await context.storage_state(path=SESSION_FILE)
+        await context.close()
+        print("👋 Browser service stopped.")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -6,16 +6,110 @@ import os
 
 # --- DATABASE ---
 DB_NAME = "agent_data.db"
+DB_BUSY_TIMEOUT_SECONDS = 10  # How long a connection waits on a locked database
+DB_WRITE_BATCH_SIZE = 100  # Most queued writes the writer thread commits together
+DB_COMPRESS_TEXT = False  # zlib-compress large plan and prompt texts; older builds can't read them
+DB_COMPRESS_MIN_BYTES = 1024  # Smaller texts are stored as-is
 
 # --- BROWSER ---
 SESSION_FILE = "amazon_session.json"
-HEADLESS_MODE = False  # Set to True if you want headless in the future
+# Point at benchmarks/fake_fresh_server.py (e.g. http://127.0.0.1:8765) to run offline
+AMAZON_BASE_URL = os.getenv("AMAZON_BASE_URL", "https://www.amazon.com").rstrip("/")
+HEADLESS_MODE = os.getenv("HEADLESS_MODE", "false").lower() in ("1", "true", "yes")
+SLOW_MO_MS = int(os.getenv("SLOW_MO_MS", "0"))  # Per-action delay; 1000 is handy for watching runs
+SEARCH_NAVIGATION = "url"  # "url" loads the results page directly, "searchbox" types the query
+ADD_CONFIRM_TIMEOUT_MS = 5000  # How long to wait for proof an add-to-cart landed
+BULK_ADD_ENABLED = False  # Queue chosen ASINs and add them together at the end of the run
+BULK_ADD_CHUNK_SIZE = 20  # ASINs per cart-add request
+MAX_CONCURRENT_PAGES = 3  # Tabs the shopper may drive at once
+SEARCH_RESULTS_LIMIT = 5  # Result cards read per search
+
+# --- BROWSER SERVICE ---
+# Run `python browser_service.py` once and point the app at it to reuse a warm,
+# logged-in Chromium across reruns and restarts, e.g. http://127.0.0.1:9222
+BROWSER_SERVICE_URL = os.getenv("BROWSER_SERVICE_URL", "")
+BROWSER_SERVICE_PORT = int(os.getenv("BROWSER_SERVICE_PORT", "9222"))
+USER_DATA_DIR = "user_session"  # Chromium profile owned by the browser service
+
+# --- NETWORK BLOCKING ---
+# We only read text from result cards, so heavy assets can be dropped.
+NETWORK_BLOCK_PROFILE = "text_only"  # "off" loads everything
+NETWORK_BLOCK_PROFILES = {
+    "off": {"resource_types": [], "url_patterns": []},
+    "text_only": {
+        "resource_types": ["image", "media", "font"],
+        "url_patterns": [
+            r"amazon-adsystem\.com",
+            r"doubleclick\.net",
+            r"fls-na\.amazon\.com",
+            r"unagi[.-]",
+            r"/uedata",
+            r"/ads/",
+        ],
+    },
+}
+# Never blocked, whatever the profile says, so add-to-cart and checkout keep working
+NETWORK_ALLOWLIST = [
+    r"/cart",
+    r"[Aa]dd[-_]?[Tt]o[-_]?[Cc]art",
+    r"/checkout",
+    r"/gp/buy",
+    r"/ap/",
+]
+# Rough transfer sizes used to estimate bytes saved per blocked request
+BLOCKED_BYTES_ESTIMATE = {"image": 25_000, "media": 400_000, "font": 40_000}
+BLOCKED_BYTES_DEFAULT = 15_000
+
+# --- SEARCH CACHE ---
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_TTL_HOURS = 192  # A little over a week so weekly staples still hit
+SEARCH_CACHE_MAX_ENTRIES = 500
+
+# --- LLM RESPONSE CACHE ---
+# Per-node opt-in. Planning runs at temperature 1.0 for variety, so it is off by default.
+LLM_CACHE_NODES = {
+    "planner": False,
+    "planner_skeleton": False,
+    "planner_day": False,
+    "extractor": True,
+    "query_optimizer": True,
+    "selection": True,
+}
+LLM_CACHE_TTL_HOURS = 168
+LLM_CACHE_MAX_ENTRIES = 2000
 
 # --- AI MODELS ---
 PLANNER_MODEL = "gemini-2.5-pro"
 SHOPPER_MODEL = "gemini-2.5-flash"
 EXTRACTOR_MODEL = "gemini-2.5-pro"
+# "single" writes the whole week in one PLANNER_MODEL call; "fanout" outlines the
+# week with PLANNER_MODEL, then writes every day concurrently with PLANNER_DAY_MODEL
+PLANNER_MODE = "single"
+PLANNER_DAY_MODEL = "gemini-2.5-flash"
+PLANNER_DAY_RETRIES = 1  # Re-requests for a day that fails validation
+EXTRACTOR_MODE = "local"  # "local" parses ingredients in ingredients.py, "llm" sends the whole plan
+HISTORY_TOP_K = 30  # Past items shown to the "llm" extractor, picked by relevance to the week
+PREFERRED_PRODUCTS_PER_ITEM = 3  # Previously bought products looked up per item for brand preference
+# "batched" picks options in chunked prompts, "pipelined" overlaps per-item
+# picks with the next searches, "per_item" makes one call per item
+SELECTION_MODE = "batched"
+SELECTION_BATCH_SIZE = 15  # Items per batched selection prompt
+PIPELINE_QUEUE_DEPTH = 4  # Items allowed to wait between pipeline stages
+PIPELINE_SELECT_WORKERS = 2  # Concurrent LLM choices in the pipeline
+# ranker.py picks the product itself at or above this confidence (0-1); 1.01 always asks the LLM
+LOCAL_RANKER_CONFIDENCE = 0.85
+# USD per million (input, output) tokens, used for telemetry cost estimates
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+
+# --- TELEMETRY ---
+# Record time, tokens and cache hits per node, LLM call and browser action
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() in ("1", "true", "yes")
+TELEMETRY_MAX_ROWS = 50000  # Oldest rows are dropped beyond this
 
 # --- UI & PROMPTS MOVED TO ui.py AND prompts.py ---
 PAGE_TITLE = "Amazon Fresh Fetch"
 PAGE_ICON = "🥕"
+PLANS_PER_PAGE = 10  # History entries per sidebar page
@@ -3,21 +3,192 @@ Database management module for Amazon Fresh Agent.
 
 This module handles all SQLite database interactions, including storing user settings
 and saving/retrieving meal plans.
+
+The schema is versioned with PRAGMA user_version: DBManager.MIGRATIONS lists
+one step per version and only the steps a database hasn't run yet are applied.
+
+The database runs in WAL mode so readers never wait for the writer. Each
+thread reads through its own connection, and all writes go through a single
+writer thread that commits whatever has queued up in one transaction, so
+concurrent sessions share commits instead of contending for the write lock.
 """
 
+import atexit
+import hashlib
+import queue
 import sqlite3
 import json
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import Future
 from datetime import datetime
 
-from config import DB_NAME
+from config import (
+    DB_BUSY_TIMEOUT_SECONDS,
+    DB_COMPRESS_MIN_BYTES,
+    DB_COMPRESS_TEXT,
+    DB_NAME,
+    DB_WRITE_BATCH_SIZE,
+)
+from history_index import HistoryIndex
+from ingredients import normalize_item
+from units import tokenize
+
+
+def normalize_query(text):
+    """
+    Normalize a search query so trivially different spellings share a cache key.
+
+    Args:
+        text (str): The raw query.
+
+    Returns:
+        str: Lowercased text with punctuation removed and whitespace collapsed.
+    """
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text.lower())).strip()
+
+
+def pack_text(text):
+    """
+    Prepare a large text value for storage.
+
+    With DB_COMPRESS_TEXT on, text of at least DB_COMPRESS_MIN_BYTES is stored
+    as a zlib BLOB when that is smaller; anything else stays TEXT, so both
+    forms can sit in the same column.
+
+    Args:
+        text (str): The value to store.
+
+    Returns:
+        str | bytes: The text itself or its compressed bytes.
+    """
+    if text is None or not DB_COMPRESS_TEXT:
+        return text
+    encoded = text.encode("utf-8")
+    if len(encoded) < DB_COMPRESS_MIN_BYTES:
+        return text
+    compressed = zlib.compress(encoded, 6)
+    return compressed if len(compressed) < len(encoded) else text
+
+
+def unpack_text(value):
+    """Return the text of a value written by pack_text()."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+class WriteQueue:
+    """
+    Runs write operations on one thread and commits them in batches.
+
+    Each operation runs inside its own savepoint, so a failing one is rolled
+    back without losing the rest of its batch.
+
+    Attributes:
+        stats (dict): {"writes", "commits"} since the queue started.
+    """
+
+    def __init__(self, connect, batch_size):
+        """
+        Initialize the WriteQueue and start its thread.
+
+        Args:
+            connect (callable): Opens the writer's connection.
+            batch_size (int): Maximum operations per commit.
+        """
+        self._connect = connect
+        self._batch_size = batch_size
+        self._queue = queue.Queue()
+        self.stats = {"writes": 0, "commits": 0}
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, wait=True):
+        """
+        Queue func(cursor) for the writer thread.
+
+        Args:
+            func (callable): Receives a cursor; must not commit.
+            wait (bool): Block until the batch holding func is committed.
+
+        Returns:
+            func's return value when waiting, otherwise a Future.
+
+        Raises:
+            Exception: Whatever func raised, when waiting.
+        """
+        future = Future()
+        self._queue.put((func, future))
+        return future.result() if wait else future
+
+    def close(self):
+        """Commit everything queued so far and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = self._connect()
+        conn.isolation_level = None  # Transactions are managed explicitly below
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Group commit: take whatever queued up while the last batch ran
+            while len(batch) < self._batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(conn, batch)
+        conn.close()
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            for func, future in batch:
+                c.execute("SAVEPOINT op")
+                try:
+                    outcomes.append((future, func(c), None))
+                    c.execute("RELEASE op")
+                except Exception as e:
+                    c.execute("ROLLBACK TO op")
+                    c.execute("RELEASE op")
+                    outcomes.append((future, None, e))
+            c.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(future, None, e) for _, future in batch]
+        self.stats["writes"] += len(batch)
+        self.stats["commits"] += 1
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
 
 
 class DBManager:
     """
     Manages the SQLite database for the agent.
 
+    Safe to share between threads: reads use a connection per thread and
+    writes are serialized through a WriteQueue. Use a file path, not
+    ":memory:", since every connection must see the same database.
+
     Attributes:
-        conn (sqlite3.Connection): The database connection object.
+        db_name (str): Path of the database file.
     """
 
     def __init__(self, db_name=DB_NAME):
@@ -27,12 +198,101 @@ class DBManager:
         Args:
             db_name (str): The name of the database file. Defaults to DB_NAME.
         """
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.db_name = db_name
+        self._local = threading.local()
+        self._connections = []  # (thread, connection) for every reader opened
+        self._lock = threading.Lock()
+        self._history_index = None  # Built from plan_items on first lookup
+        self._index_lock = threading.Lock()
+        # Before the writer thread opens the file and switches it to WAL
+        self._backup_before_migrating()
+        self._writes = WriteQueue(self._connect, DB_WRITE_BATCH_SIZE)
         self.create_tables()
 
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_name, timeout=DB_BUSY_TIMEOUT_SECONDS, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; safe with WAL
+        return conn
+
+    @property
+    def conn(self):
+        """The calling thread's read connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                # Streamlit reruns on fresh threads; close readers of finished ones
+                alive = []
+                for thread, other in self._connections:
+                    if thread.is_alive():
+                        alive.append((thread, other))
+                    else:
+                        other.close()
+                self._connections = alive + [(threading.current_thread(), conn)]
+        return conn
+
+    def _write(self, func, wait=True):
+        """Run func(cursor) on the writer thread (see WriteQueue.submit)."""
+        return self._writes.submit(func, wait)
+
+    @property
+    def write_stats(self):
+        """{"writes", "commits"} from the write queue."""
+        return dict(self._writes.stats)
+
+    def flush(self):
+        """Block until every write queued so far is committed."""
+        self._write(lambda c: None)
+
+    def close(self):
+        """Commit pending writes and close every connection."""
+        self._writes.close()
+        with self._lock:
+            for _, conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
     def create_tables(self):
-        """Create the necessary tables if they do not exist."""
-        c = self.conn.cursor()
+        """Create the tables or bring an existing database up to the latest schema."""
+        self._write(self._migrate)
+
+    def _migrate(self, c):
+        # All pending steps and their version bumps commit together or not at all
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        for number, step in enumerate(self.MIGRATIONS, start=1):
+            if number > version:
+                step(self, c)
+                c.execute(f"PRAGMA user_version = {number}")
+
+    def _backup_before_migrating(self):
+        """Copy an existing file to <db_name>.v<version>.bak before migrations rewrite it."""
+        # A plain connection: _connect() would change the journal mode first
+        source = sqlite3.connect(self.db_name, timeout=DB_BUSY_TIMEOUT_SECONDS)
+        try:
+            version = source.execute("PRAGMA user_version").fetchone()[0]
+            has_tables = source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+            if version >= len(self.MIGRATIONS) or not has_tables:
+                return
+            target = sqlite3.connect(f"{self.db_name}.v{version}.bak")
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+    @property
+    def schema_version(self):
+        """The migration number the database is at."""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _schema_v1(self, c):
+        """Tables as they were before versioning; idempotent, so older files are adopted."""
         c.execute(
             """CREATE TABLE IF NOT EXISTS settings 
                      (key TEXT PRIMARY KEY, value TEXT)"""
@@ -43,9 +303,194 @@ class DBManager:
                       date TEXT, 
                       prompt TEXT, 
                       plan_json TEXT, 
-                      shopping_list TEXT)"""
+                      shopping_list TEXT,
+                      item_count INTEGER)"""
+        )
+        columns = {row[1] for row in c.execute("PRAGMA table_info(meal_plans)")}
+        if "item_count" not in columns:
+            c.execute("ALTER TABLE meal_plans ADD COLUMN item_count INTEGER")
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS search_cache
+                     (query_key TEXT PRIMARY KEY,
+                      options_json TEXT,
+                      chosen_asin TEXT,
+                      created_at REAL,
+                      last_used_at REAL)"""
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_search_cache_last_used ON search_cache (last_used_at)"
+        )
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache
+                     (cache_key TEXT PRIMARY KEY,
+                      node TEXT,
+                      model TEXT,
+                      response TEXT,
+                      tokens INTEGER,
+                      created_at REAL,
+                      last_used_at REAL)"""
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used_at)"
+        )
+        # Products actually bought, from shopper runs and scripts/import_receipt.py
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS purchase_history
+                     (item_name TEXT PRIMARY KEY, count INTEGER DEFAULT 1, last_purchased REAL)"""
+        )
+        columns = {row[1] for row in c.execute("PRAGMA table_info(purchase_history)")}
+        if "last_purchased" not in columns:
+            c.execute("ALTER TABLE purchase_history ADD COLUMN last_purchased REAL")
+        # Word -> product lookup for get_preferred_products()
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS purchase_terms
+                     (term TEXT, item_name TEXT, PRIMARY KEY (term, item_name)) WITHOUT ROWID"""
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_purchase_history_count ON purchase_history (count DESC)"
         )
-        self.conn.commit()
+        self._index_purchases(c)
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS telemetry
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      thread_id TEXT,
+                      operation TEXT,
+                      model TEXT,
+                      seconds REAL,
+                      input_tokens INTEGER,
+                      output_tokens INTEGER,
+                      retries INTEGER,
+                      cache_hit INTEGER,
+                      ok INTEGER,
+                      created_at REAL)"""
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_telemetry_operation ON telemetry (operation, created_at)"
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_thread ON telemetry (thread_id)")
+        # One row per shopping list entry; meal_plans.shopping_list is kept for older builds
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS plan_items
+                     (plan_id INTEGER,
+                      position INTEGER,
+                      raw TEXT,
+                      name TEXT,
+                      PRIMARY KEY (plan_id, position))"""
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_plan_items_name ON plan_items (name, plan_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_plan_items_raw ON plan_items (raw, plan_id)")
+        c.execute("DROP TABLE IF EXISTS past_items")  # Superseded by plan_items
+        self._migrate_shopping_lists(c)
+        # Plans saved before item_count existed; listing them must not count rows
+        c.execute(
+            """UPDATE meal_plans SET item_count =
+                     (SELECT COUNT(*) FROM plan_items WHERE plan_id = meal_plans.id)
+                     WHERE item_count IS NULL"""
+        )
+
+    def _schema_v2(self, c):
+        """Store each distinct prompt once and compress large plan texts."""
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS prompts
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      hash TEXT UNIQUE,
+                      body BLOB)"""
+        )
+        c.execute("ALTER TABLE meal_plans ADD COLUMN prompt_id INTEGER")
+        c.execute("SELECT id, prompt, plan_json FROM meal_plans")
+        for plan_id, prompt, plan_json in c.fetchall():
+            c.execute(
+                "UPDATE meal_plans SET prompt=NULL, prompt_id=?, plan_json=? WHERE id=?",
+                (self._prompt_id(c, prompt), pack_text(unpack_text(plan_json)), plan_id),
+            )
+
+    def _schema_v3(self, c):
+        """Move the per-mode item latency baselines from settings into telemetry."""
+        c.execute("SELECT key, value FROM settings WHERE key GLOB 'item_latency_*'")
+        for key, value in c.fetchall():
+            c.execute(
+                "INSERT INTO telemetry (thread_id, operation, model, seconds, input_tokens, "
+                "output_tokens, retries, cache_hit, ok, created_at) "
+                "VALUES ('', ?, '', ?, 0, 0, 0, 0, 1, ?)",
+                (f"shopper.item_avg.{key[len('item_latency_'):]}", float(value), time.time()),
+            )
+        c.execute("DELETE FROM settings WHERE key GLOB 'item_latency_*'")
+
+    def _schema_v4(self, c):
+        """Give telemetry a JSON details column and move the selection baselines into it."""
+        c.execute("ALTER TABLE telemetry ADD COLUMN details TEXT")
+        c.execute("SELECT key, value FROM settings WHERE key GLOB 'selection_stats_*'")
+        for key, value in c.fetchall():
+            details = json.loads(value)
+            c.execute(
+                "INSERT INTO telemetry (thread_id, operation, model, seconds, input_tokens, "
+                "output_tokens, retries, cache_hit, ok, created_at, details) "
+                "VALUES ('', ?, '', ?, 0, 0, 0, 0, 1, ?, ?)",
+                (f"shopper.selection.{key[len('selection_stats_'):]}",
+                 details.get("run_seconds", 0.0), time.time(), value),
+            )
+        c.execute("DELETE FROM settings WHERE key GLOB 'selection_stats_*'")
+
+    def _schema_v5(self, c):
+        """Re-index purchase terms with the tokenizer shared by the parser and ranker."""
+        c.execute("DELETE FROM purchase_terms")
+        self._index_purchases(c)
+
+    MIGRATIONS = (_schema_v1, _schema_v2, _schema_v3, _schema_v4, _schema_v5)
+
+    def _prompt_id(self, c, prompt):
+        if prompt is None:
+            return None
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        c.execute(
+            "INSERT OR IGNORE INTO prompts (hash, body) VALUES (?, ?)", (digest, pack_text(prompt))
+        )
+        return c.execute("SELECT id FROM prompts WHERE hash=?", (digest,)).fetchone()[0]
+
+    def _migrate_shopping_lists(self, c):
+        """
+        Copy JSON shopping lists of plans saved before plan_items existed.
+
+        Runs with migration 1, so user_version marks the file as done. The
+        column itself is left intact for builds that still read it.
+        """
+        c.execute(
+            "SELECT id, shopping_list FROM meal_plans WHERE shopping_list IS NOT NULL"
+        )
+        for plan_id, list_str in c.fetchall():
+            try:
+                items = json.loads(list_str)
+            except (json.JSONDecodeError, TypeError):
+                items = []
+            # INSERT OR REPLACE by position, so a re-run rewrites the same rows
+            self._insert_plan_items(c, plan_id, items if isinstance(items, list) else [])
+
+    def _index_purchases(self, c):
+        """Add search terms for purchases written without them, e.g. by older imports."""
+        c.execute(
+            """SELECT item_name FROM purchase_history
+                     WHERE item_name NOT IN (SELECT item_name FROM purchase_terms)"""
+        )
+        for (item_name,) in c.fetchall():
+            self._insert_purchase_terms(c, item_name)
+
+    def _insert_purchase_terms(self, c, item_name):
+        c.executemany(
+            "INSERT OR IGNORE INTO purchase_terms (term, item_name) VALUES (?, ?)",
+            [(term, item_name) for term in set(tokenize(item_name))],
+        )
+
+    def _insert_plan_items(self, c, plan_id, items):
+        rows = [
+            (plan_id, pos, item.strip(), normalize_item(item))
+            for pos, item in enumerate(items)
+            if isinstance(item, str) and item.strip()
+        ]
+        c.executemany(
+            "INSERT OR REPLACE INTO plan_items (plan_id, position, raw, name) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        return {row[2] for row in rows}, len(rows)
 
     def save_setting(self, key, value):
         """
@@ -55,9 +500,9 @@ class DBManager:
             key (str): The setting key.
             value (str): The setting value.
         """
-        c = self.conn.cursor()
-        c.execute("REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-        self.conn.commit()
+        self._write(
+            lambda c: c.execute("REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+        )
 
     def get_setting(self, key, default=""):
         """
@@ -84,14 +529,26 @@ class DBManager:
             plan_json (str): The JSON string of the meal plan.
             shopping_list (list): The list of shopping items.
         """
-        c = self.conn.cursor()
         date_str = datetime.now().strftime("%Y-%m-%d %H:%M")
-        list_str = json.dumps(shopping_list)
-        c.execute(
-            "INSERT INTO meal_plans (date, prompt, plan_json, shopping_list) VALUES (?, ?, ?, ?)",
-            (date_str, prompt, plan_json, list_str),
-        )
-        self.conn.commit()
+
+        def insert(c):
+            # shopping_list is written too, so an older build can still open the plan
+            c.execute(
+                "INSERT INTO meal_plans (date, prompt_id, plan_json, shopping_list) "
+                "VALUES (?, ?, ?, ?)",
+                (date_str, self._prompt_id(c, prompt), pack_text(plan_json),
+                 json.dumps(shopping_list)),
+            )
+            plan_id = c.lastrowid
+            added, count = self._insert_plan_items(c, plan_id, shopping_list)
+            c.execute("UPDATE meal_plans SET item_count=? WHERE id=?", (count, plan_id))
+            return added
+
+        added = self._write(insert)
+        with self._index_lock:
+            if self._history_index is not None:
+                for raw in added:
+                    self._history_index.add(raw)
 
     def get_recent_plans(self, limit=5):
         """
@@ -105,25 +562,88 @@ class DBManager:
         """
         c = self.conn.cursor()
         c.execute(
-            "SELECT id, date, prompt, plan_json, shopping_list FROM meal_plans ORDER BY id DESC LIMIT ?",
+            f"{self._PLAN_QUERY} ORDER BY m.id DESC LIMIT ?",
             (limit,),
         )
-        return [
-            {
-                "id": r[0],
-                "date": r[1],
-                "prompt": r[2],
-                "json": r[3],
-                "list": json.loads(r[4]),
-            }
-            for r in c.fetchall()
-        ]
+        plans = [self._plan_row(r) for r in c.fetchall()]
+        if plans:
+            by_id = {p["id"]: p for p in plans}
+            c.execute(
+                f"SELECT plan_id, raw FROM plan_items WHERE plan_id IN ({','.join('?' * len(by_id))}) "
+                "ORDER BY plan_id, position",
+                list(by_id),
+            )
+            for plan_id, raw in c.fetchall():
+                by_id[plan_id]["list"].append(raw)
+        return plans
+
+    def list_plans(self, before_id=None, limit=10):
+        """
+        List saved plans newest first without loading their contents.
+
+        Pages are keyed on the plan id, so each page costs the same however
+        far back it is.
+
+        Args:
+            before_id (int): Only plans older than this id. Defaults to the newest.
+            limit (int): Maximum number of plans.
+
+        Returns:
+            list: Dictionaries with id, date and item_count.
+        """
+        c = self.conn.cursor()
+        c.execute(
+            "SELECT id, date, item_count FROM meal_plans WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (before_id if before_id is not None else 2**63 - 1, limit),
+        )
+        return [{"id": r[0], "date": r[1], "item_count": r[2] or 0} for r in c.fetchall()]
+
+    def get_plan(self, plan_id):
+        """
+        Load one saved plan with its shopping list.
+
+        Args:
+            plan_id (int): The ID of the plan.
+
+        Returns:
+            dict: id, date, prompt, json and list, or None if it doesn't exist.
+        """
+        c = self.conn.cursor()
+        c.execute(f"{self._PLAN_QUERY} WHERE m.id=?", (plan_id,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        plan = self._plan_row(row)
+        c.execute("SELECT raw FROM plan_items WHERE plan_id=? ORDER BY position", (plan_id,))
+        plan["list"] = [r[0] for r in c.fetchall()]
+        return plan
+
+    _PLAN_QUERY = (
+        "SELECT m.id, m.date, COALESCE(p.body, m.prompt), m.plan_json "
+        "FROM meal_plans m LEFT JOIN prompts p ON p.id = m.prompt_id"
+    )
+
+    @staticmethod
+    def _plan_row(row):
+        return {
+            "id": row[0],
+            "date": row[1],
+            "prompt": unpack_text(row[2]),
+            "json": unpack_text(row[3]),
+            "list": [],
+        }
 
     def delete_all_plans(self):
         """Delete all saved meal plans from the database."""
-        c = self.conn.cursor()
-        c.execute("DELETE FROM meal_plans")
-        self.conn.commit()
+
+        def delete(c):
+            c.execute("DELETE FROM meal_plans")
+            c.execute("DELETE FROM plan_items")
+            c.execute("DELETE FROM prompts")
+
+        self._write(delete)
+        with self._index_lock:
+            self._history_index = None
 
     def delete_plan(self, plan_id):
         """
@@ -132,9 +652,22 @@ class DBManager:
         Args:
             plan_id (int): The ID of the plan to delete.
         """
-        c = self.conn.cursor()
-        c.execute("DELETE FROM meal_plans WHERE id=?", (plan_id,))
-        self.conn.commit()
+
+        def delete(c):
+            row = c.execute("SELECT prompt_id FROM meal_plans WHERE id=?", (plan_id,)).fetchone()
+            c.execute("DELETE FROM meal_plans WHERE id=?", (plan_id,))
+            c.execute("DELETE FROM plan_items WHERE plan_id=?", (plan_id,))
+            if row and row[0] is not None:
+                # The prompt goes with its last plan
+                c.execute(
+                    "DELETE FROM prompts WHERE id=? AND NOT EXISTS "
+                    "(SELECT 1 FROM meal_plans WHERE prompt_id=?)",
+                    (row[0], row[0]),
+                )
+
+        self._write(delete)
+        with self._index_lock:
+            self._history_index = None
 
     # --- PREFERENCE LEARNING ---
     def get_all_past_items(self):
@@ -142,20 +675,370 @@ class DBManager:
         Retrieve all unique items from past shopping lists.
 
         Returns:
-            str: A comma-separated string of all unique items.
+            str: A comma-separated string of all unique items, most often listed first.
         """
         c = self.conn.cursor()
-        c.execute("SELECT shopping_list FROM meal_plans")
-        rows = c.fetchall()
-        all_items = set()
-        for r in rows:
-            try:
-                items = json.loads(r[0])
-                for i in items:
-                    all_items.add(i.strip())
-            except (json.JSONDecodeError, TypeError):
-                pass
-        return ", ".join(list(all_items))
+        c.execute(
+            "SELECT raw FROM plan_items GROUP BY raw ORDER BY COUNT(DISTINCT plan_id) DESC, raw"
+        )
+        return ", ".join(r[0] for r in c.fetchall())
+
+    def get_item_frequencies(self, limit=20):
+        """
+        Count how many saved plans listed each product.
+
+        Items are grouped by normalized name, so "Eggs (12)" and "Egg (6)"
+        count as one product.
+
+        Args:
+            limit (int): Maximum number of products to return.
+
+        Returns:
+            list: (name, plan_count) tuples, most often listed first.
+        """
+        c = self.conn.cursor()
+        c.execute(
+            """SELECT name, COUNT(DISTINCT plan_id) AS plans FROM plan_items
+               GROUP BY name ORDER BY plans DESC, name LIMIT ?""",
+            (limit,),
+        )
+        return c.fetchall()
+
+    def get_plans_with_item(self, name):
+        """
+        Find the saved plans that listed a product.
+
+        Args:
+            name (str): Item text; normalized the same way as stored items.
+
+        Returns:
+            list: Plan ids, newest first.
+        """
+        c = self.conn.cursor()
+        c.execute(
+            "SELECT DISTINCT plan_id FROM plan_items WHERE name=? ORDER BY plan_id DESC",
+            (normalize_item(name),),
+        )
+        return [r[0] for r in c.fetchall()]
+
+    @property
+    def history_index(self):
+        """HistoryIndex over past items, loaded once and then updated by save_plan."""
+        with self._index_lock:
+            if self._history_index is None:
+                c = self.conn.cursor()
+                c.execute("SELECT raw, COUNT(DISTINCT plan_id) FROM plan_items GROUP BY raw")
+                self._history_index = HistoryIndex(c.fetchall())
+            return self._history_index
+
+    def get_relevant_past_items(self, lines, k):
+        """
+        Retrieve the past items most relevant to a week's ingredients.
+
+        Args:
+            lines (list): Ingredient lines of the current plan.
+            k (int): Maximum number of items to return.
+
+        Returns:
+            list: Up to k past items, most relevant first.
+        """
+        index = self.history_index
+        with self._index_lock:
+            return index.search(lines, k)
+
+    def get_purchase_history(self):
+        """
+        Retrieve previously purchased products with how often they were bought.
+
+        Returns:
+            list: (item_name, count) tuples, most bought first.
+        """
+        c = self.conn.cursor()
+        c.execute("SELECT item_name, count FROM purchase_history ORDER BY count DESC")
+        return c.fetchall()
+
+    def record_purchases(self, items, when=None):
+        """
+        Count products as bought once more and index any new ones.
+
+        Args:
+            items (list): Product titles as shown on Amazon.
+            when (float): Unix time of the purchase. Defaults to now.
+        """
+        when = time.time() if when is None else when
+        names = [item.strip() for item in items if isinstance(item, str) and item.strip()]
+
+        def record(c):
+            for name in names:
+                c.execute(
+                    """INSERT INTO purchase_history (item_name, count, last_purchased)
+                             VALUES (?, 1, ?)
+                             ON CONFLICT(item_name) DO UPDATE SET
+                             count = count + 1, last_purchased = excluded.last_purchased""",
+                    (name, when),
+                )
+                self._insert_purchase_terms(c, name)
+
+        if names:
+            self._write(record)
+
+    def get_preferred_products(self, query, n=3):
+        """
+        Find the products bought before that best match a query.
+
+        Products sharing more words with the query rank first, then the more
+        often and more recently bought ones. Only the purchase_terms rows of
+        the query's words are read, so the cost doesn't grow with history.
+
+        Args:
+            query (str): An item or ingredient, e.g. "2 tbsp peanut butter".
+            n (int): Maximum number of products.
+
+        Returns:
+            list: (item_name, count) tuples, best match first.
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        c = self.conn.cursor()
+        c.execute(
+            f"""SELECT p.item_name, p.count FROM purchase_terms t
+                      JOIN purchase_history p ON p.item_name = t.item_name
+                      WHERE t.term IN ({", ".join("?" * len(terms))})
+                      GROUP BY p.item_name
+                      ORDER BY COUNT(*) DESC, p.count DESC, p.last_purchased DESC, p.item_name
+                      LIMIT ?""",
+            (*terms, n),
+        )
+        return c.fetchall()
+
+    # --- SEARCH CACHE ---
+    def get_cached_search(self, query, ttl_seconds):
+        """
+        Retrieve cached search options for a query if they are still fresh.
+
+        Args:
+            query (str): The search query (normalized internally).
+            ttl_seconds (float): Maximum age of a usable entry.
+
+        Returns:
+            dict: {"options": list, "chosen_asin": str or None}, or None on a miss.
+        """
+        key = normalize_query(query)
+        c = self.conn.cursor()
+        c.execute(
+            "SELECT options_json, chosen_asin, created_at FROM search_cache WHERE query_key=?",
+            (key,),
+        )
+        row = c.fetchone()
+        now = time.time()
+        if not row or now - row[2] > ttl_seconds:
+            return None
+        # Recency only matters for eviction, so don't wait for the commit
+        self._write(
+            lambda c: c.execute("UPDATE search_cache SET last_used_at=? WHERE query_key=?", (now, key)),
+            wait=False,
+        )
+        return {"options": json.loads(row[0]), "chosen_asin": row[1]}
+
+    def save_cached_search(self, query, options, max_entries):
+        """
+        Store search options for a query, evicting least recently used entries.
+
+        Returns without waiting for the commit, so the browser's event loop
+        isn't blocked on the writer thread.
+
+        Args:
+            query (str): The search query (normalized internally).
+            options (list): Option dicts returned by the browser.
+            max_entries (int): Maximum number of cached queries to keep.
+        """
+        now = time.time()
+
+        def save(c):
+            c.execute(
+                "REPLACE INTO search_cache (query_key, options_json, chosen_asin, created_at, last_used_at) "
+                "VALUES (?, ?, NULL, ?, ?)",
+                (normalize_query(query), json.dumps(options), now, now),
+            )
+            c.execute(
+                """DELETE FROM search_cache WHERE query_key NOT IN
+                         (SELECT query_key FROM search_cache ORDER BY last_used_at DESC LIMIT ?)""",
+                (max_entries,),
+            )
+
+        self._write(save, wait=False)
+
+    def save_search_choice(self, query, asin):
+        """
+        Remember which product was bought for a cached query.
+
+        Queued behind the query's save_cached_search() and, like it, not
+        waited for.
+
+        Args:
+            query (str): The search query (normalized internally).
+            asin (str): ASIN of the chosen product.
+        """
+        self._write(
+            lambda c: c.execute(
+                "UPDATE search_cache SET chosen_asin=? WHERE query_key=?",
+                (asin, normalize_query(query)),
+            ),
+            wait=False,
+        )
+
+    def clear_search_cache(self):
+        """Delete all cached search results."""
+        self._write(lambda c: c.execute("DELETE FROM search_cache"))
+
+    # --- LLM RESPONSE CACHE ---
+    def get_cached_llm_response(self, cache_key, ttl_seconds):
+        """
+        Retrieve a cached model response if it is still fresh.
+
+        Args:
+            cache_key (str): Hash of the model, settings, template and inputs.
+            ttl_seconds (float): Maximum age of a usable entry.
+
+        Returns:
+            dict: {"response": str, "tokens": int}, or None on a miss.
+        """
+        c = self.conn.cursor()
+        c.execute(
+            "SELECT response, tokens, created_at FROM llm_cache WHERE cache_key=?",
+            (cache_key,),
+        )
+        row = c.fetchone()
+        now = time.time()
+        if not row or now - row[2] > ttl_seconds:
+            return None
+        self._write(
+            lambda c: c.execute("UPDATE llm_cache SET last_used_at=? WHERE cache_key=?", (now, cache_key)),
+            wait=False,
+        )
+        return {"response": row[0], "tokens": row[1]}
+
+    def save_cached_llm_response(self, cache_key, node, model, response, tokens, max_entries):
+        """
+        Store a model response, evicting least recently used entries.
+
+        Args:
+            cache_key (str): Hash of the model, settings, template and inputs.
+            node (str): Agent node that made the call.
+            model (str): Model name.
+            response (str): Response text.
+            tokens (int): Tokens the call consumed, credited on later hits.
+            max_entries (int): Maximum number of cached responses to keep.
+        """
+        now = time.time()
+
+        def save(c):
+            c.execute(
+                "REPLACE INTO llm_cache (cache_key, node, model, response, tokens, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, node, model, response, tokens, now, now),
+            )
+            c.execute(
+                """DELETE FROM llm_cache WHERE cache_key NOT IN
+                         (SELECT cache_key FROM llm_cache ORDER BY last_used_at DESC LIMIT ?)""",
+                (max_entries,),
+            )
+
+        self._write(save)
+
+    def clear_llm_cache(self):
+        """Delete all cached model responses."""
+        self._write(lambda c: c.execute("DELETE FROM llm_cache"))
+
+    # --- TELEMETRY ---
+    def save_telemetry(self, record, max_rows):
+        """
+        Store one timed operation without waiting for the commit.
+
+        Args:
+            record (dict): thread_id, operation, model, seconds, input_tokens,
+                output_tokens, retries, cache_hit, ok and optionally details.
+            max_rows (int): Maximum number of rows to keep.
+        """
+        row = (
+            record["thread_id"], record["operation"], record["model"], record["seconds"],
+            record["input_tokens"], record["output_tokens"], record["retries"],
+            int(record["cache_hit"]), int(record["ok"]), time.time(),
+            json.dumps(record["details"]) if record.get("details") is not None else None,
+        )
+
+        def insert(c):
+            c.execute(
+                "INSERT INTO telemetry (thread_id, operation, model, seconds, input_tokens, "
+                "output_tokens, retries, cache_hit, ok, created_at, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            if c.lastrowid % 1000 == 0:
+                # Trim occasionally rather than on every insert
+                c.execute("DELETE FROM telemetry WHERE id <= ?", (c.lastrowid - max_rows,))
+
+        self._write(insert, wait=False)
+
+    def get_telemetry(self, thread_id=None, since=None):
+        """
+        Retrieve recorded operations.
+
+        Args:
+            thread_id (str): Only this graph thread's rows. Defaults to all.
+            since (float): Only rows recorded after this Unix time.
+
+        Returns:
+            list: One dict per row, oldest first.
+        """
+        self.flush()  # Include rows still waiting in the write queue
+        query = (
+            "SELECT thread_id, operation, model, seconds, input_tokens, output_tokens, "
+            "retries, cache_hit, ok, created_at FROM telemetry WHERE 1=1"
+        )
+        params = []
+        if thread_id is not None:
+            query += " AND thread_id=?"
+            params.append(thread_id)
+        if since is not None:
+            query += " AND created_at>?"
+            params.append(since)
+        c = self.conn.cursor()
+        c.execute(query + " ORDER BY id", params)
+        columns = [d[0] for d in c.description]
+        return [dict(zip(columns, r)) for r in c.fetchall()]
+
+    def get_last_telemetry(self, operation):
+        """
+        Retrieve the most recent row of one operation.
+
+        Args:
+            operation (str): Dotted operation name.
+
+        Returns:
+            dict: Same fields as get_telemetry() rows plus the decoded details,
+                or None if never recorded.
+        """
+        self.flush()
+        c = self.conn.cursor()
+        c.execute(
+            "SELECT thread_id, operation, model, seconds, input_tokens, output_tokens, "
+            "retries, cache_hit, ok, created_at, details FROM telemetry WHERE operation=? "
+            "ORDER BY id DESC LIMIT 1",
+            (operation,),
+        )
+        row = c.fetchone()
+        if row is None:
+            return None
+        record = dict(zip([d[0] for d in c.description], row))
+        record["details"] = json.loads(record["details"]) if record["details"] else None
+        return record
+
+    def clear_telemetry(self):
+        """Delete all telemetry rows."""
+        self._write(lambda c: c.execute("DELETE FROM telemetry"))
 
 
 db = DBManager()
+atexit.register(db.flush)  # Commit telemetry and cache touches queued without waiting
@@ -0,0 +1,99 @@
+"""
+Local retrieval index over past shopping list items for Amazon Fresh Agent.
+
+The extractor prompt used to receive every item ever bought, so it grew with
+each saved plan. HistoryIndex scores past items against this week's
+ingredients with TF-IDF over product words, so only the few relevant entries
+("Smuckers Peanut Butter" for "2 tbsp peanut butter") reach the model.
+"""
+
+import math
+from collections import defaultdict
+
+from units import tokenize
+
+
+class HistoryIndex:
+    """
+    TF-IDF index of past items, updated as plans are saved.
+
+    Attributes:
+        counts (dict): How many saved lists contained each item.
+        postings (dict): Item names keyed by the words they contain.
+    """
+
+    def __init__(self, items=None):
+        """
+        Initialize the HistoryIndex.
+
+        Args:
+            items (list): Optional (item, count) pairs to start from.
+        """
+        self.counts = {}
+        self.postings = defaultdict(set)
+        for item, count in items or []:
+            self.add(item, count)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item, count=1):
+        """
+        Add an item, or bump its count if it is already indexed.
+
+        Args:
+            item (str): The item as it appeared on a shopping list.
+            count (int): How many lists it appeared on.
+        """
+        item = item.strip()
+        if not item:
+            return
+        if item not in self.counts:
+            for word in set(tokenize(item)):
+                self.postings[word].add(item)
+            self.counts[item] = 0
+        self.counts[item] += count
+
+    def idf(self, word):
+        """Smoothed inverse document frequency of a word."""
+        return math.log((1 + len(self.counts)) / (1 + len(self.postings.get(word, ())))) + 1
+
+    def vector(self, text):
+        """Return the unit-length TF-IDF vector of text as a {word: weight} dict."""
+        weights = defaultdict(float)
+        for word in tokenize(text):
+            weights[word] += self.idf(word)
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {word: w / norm for word, w in weights.items()} if norm else {}
+
+    def search(self, lines, k):
+        """
+        Find the past items most relevant to a week's ingredients.
+
+        Each item is scored by its best cosine similarity to any single line,
+        so one matching ingredient is enough; ties go to the more often
+        bought item.
+
+        Args:
+            lines (list): Ingredient lines (or item names) to match.
+            k (int): Maximum number of items to return.
+
+        Returns:
+            list: Up to k item names, most relevant first.
+        """
+        best = {}
+        item_vectors = {}
+        for line in lines:
+            query = self.vector(line)
+            candidates = set()
+            for word in query:
+                candidates |= self.postings.get(word, set())
+            for item in candidates:
+                if item not in item_vectors:
+                    item_vectors[item] = self.vector(item)
+                vector = item_vectors[item]
+                score = sum(weight * vector.get(word, 0.0) for word, weight in query.items())
+                if score > best.get(item, 0.0):
+                    best[item] = score
+        ranked = sorted(best, key=lambda item: (-best[item], -self.counts[item], item))
+        return ranked[:k]
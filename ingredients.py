@@ -0,0 +1,350 @@
+"""
+Local ingredient parser and consolidator for Amazon Fresh Agent.
+
+Turns the free-text "ingredients" strings of a meal plan into a structured,
+week-level shopping list without an LLM: each line is split into quantity,
+unit and name, units are normalized (weights to oz, volumes to cups, counts),
+repeated ingredients are summed and pantry items are removed. Lines the parser
+cannot make sense of are returned separately so only they go to the model.
+"""
+
+import functools
+import json
+import math
+import re
+
+from units import UNIT_ALTERNATION, singularize, unit_factor
+from utils import parse_json_reply
+
+MEALS = ("breakfast", "lunch", "dinner")
+
+WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "half": 0.5, "dozen": 12,
+}
+FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+
+NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?(?:\s*[½¼¾⅓⅔⅛])?|[½¼¾⅓⅔⅛]"
+LINE_PATTERN = re.compile(
+    rf"^(?P<qty>(?:{NUMBER})(?:\s*(?:-|to)\s*(?:{NUMBER}))?|(?:{'|'.join(WORD_NUMBERS)})\b)?\s*"
+    rf"(?:(?<=\s)an?\s+)?"  # "half an avocado"
+    rf"(?:(?P<unit>{UNIT_ALTERNATION})\.?(?=\s|$))?\s*(?:of\s+)?(?P<name>.*)$",
+    re.IGNORECASE,
+)
+
+# Notes that don't change what is bought
+NOTE_PATTERN = re.compile(
+    r"\b(to taste|for serving|for garnish|optional|as needed|divided|or more|plus more)\b",
+    re.IGNORECASE,
+)
+PREP_WORDS = {
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed", "cubed",
+    "peeled", "drained", "rinsed", "fresh", "freshly", "finely", "roughly", "thinly",
+    "large", "medium", "small", "ripe", "cooked", "uncooked", "softened", "melted",
+    "beaten", "halved", "quartered", "trimmed", "packed", "heaping", "about", "approx",
+}
+# Grade words that don't make a pantry staple a different product
+PANTRY_QUALIFIERS = {
+    "extra", "virgin", "kosher", "sea", "black", "white", "table", "fine", "coarse",
+    "iodized", "pure", "light", "unsalted", "salted", "all-purpose", "granulated",
+}
+# Meals made from earlier dinners add nothing to the list
+LEFTOVER_PATTERN = re.compile(r"^\s*left\s*overs?\b", re.IGNORECASE)
+
+
+def parse_number(text):
+    """
+    Convert "1 1/2", "3/4", "2½" or "2-3" (upper bound) to a float.
+
+    Args:
+        text (str): The quantity text.
+
+    Returns:
+        float: The value, or None if text is empty.
+    """
+    if not text:
+        return None
+    text = text.strip().lower()
+    if text in WORD_NUMBERS:
+        return float(WORD_NUMBERS[text])
+    # For ranges buy enough for the upper bound
+    text = re.split(r"\s*(?:-|to)\s*", text)[-1]
+    total = 0.0
+    for part in re.findall(r"\d+/\d+|\d+(?:\.\d+)?|[½¼¾⅓⅔⅛]", text):
+        if "/" in part:
+            num, den = part.split("/")
+            total += int(num) / int(den) if int(den) else 0
+        elif part in FRACTIONS:
+            total += FRACTIONS[part]
+        else:
+            total += float(part)
+    return total
+
+
+def normalize_name(text):
+    """
+    Reduce an ingredient name to the product to buy.
+
+    Drops parenthesized notes, preparation words and serving notes, and
+    singularizes the last word, so "2 Tomatoes, diced" and "1 tomato" match.
+
+    Args:
+        text (str): The name part of an ingredient line.
+
+    Returns:
+        str: The lowercase product name, possibly empty.
+    """
+    text = re.sub(r"\([^)]*\)", " ", text.lower())
+    text = NOTE_PATTERN.sub(" ", text.split(" - ")[0])
+    words = [w for w in re.findall(r"[a-z0-9%'&-]+", text) if w not in PREP_WORDS]
+    while words and words[-1] in ("and", "or", "of", "for", "to", "with"):
+        words.pop()
+    if words:
+        words[-1] = singularize(words[-1])
+    return " ".join(words)
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_item(text):
+    """
+    Reduce a shopping list entry ("Chicken Breast (1.5 lb)", "2 lbs chicken breasts")
+    to the product name used to group it with other entries.
+
+    Args:
+        text (str): The entry as saved.
+
+    Returns:
+        str: The lowercase product name.
+    """
+    parsed = parse_line(text)
+    if parsed:
+        return parsed["name"]
+    return normalize_name(text) or text.strip().lower()
+
+
+def split_ingredients(text):
+    """
+    Split an ingredients string at commas, semicolons and newlines outside parentheses.
+
+    Args:
+        text (str): e.g. "2 Eggs, 1 lb chicken (boneless, skinless); salt".
+
+    Returns:
+        list: The non-empty, stripped lines.
+    """
+    lines, current, depth = [], "", 0
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        if ch in ",;\n" and depth == 0:
+            lines.append(current)
+            current = ""
+        else:
+            current += ch
+    lines.append(current)
+    return [line.strip(" .•-*\t") for line in lines if line.strip(" .•-*\t")]
+
+
+def parse_line(line):
+    """
+    Parse one ingredient line into amount, unit family and name.
+
+    Args:
+        line (str): e.g. "1 1/2 cups rolled oats".
+
+    Returns:
+        dict: {"name", "amount", "family", "raw"} with amount in the family's
+            base unit (None when no quantity was given), or None when the line
+            can't be understood and should go to the LLM.
+    """
+    # Package sizes like "1 (15 oz) can" would otherwise hide the unit
+    text = re.sub(r"\s+", " ", re.sub(r"\([^)]*\)", " ", line)).strip()
+    match = LINE_PATTERN.match(text)
+    if not match:
+        return None
+    name = normalize_name(match.group("name"))
+    words = name.split()
+    # Alternatives, leftover numbers or whole sentences need judgement
+    if not words or len(words) > 6 or " or " in f" {name} " or re.search(r"\d", name):
+        return None
+
+    amount = parse_number(match.group("qty"))
+    unit = match.group("unit")
+    family, factor = unit_factor(unit) or ("count", 1.0)
+    if amount is None and unit:
+        amount = 1.0  # "cup of rice"
+    return {
+        "name": name,
+        "amount": amount * factor if amount is not None else None,
+        "family": family,
+        "raw": line,
+    }
+
+
+def iter_plan_lines(plan_json):
+    """
+    Yield every ingredient line of a meal plan.
+
+    Args:
+        plan_json (str): The planner's JSON with a "schedule" array.
+
+    Yields:
+        str: One ingredient line.
+    """
+    try:
+        schedule = json.loads(plan_json).get("schedule", [])
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        return
+    for day in schedule:
+        for meal in MEALS:
+            info = day.get(meal)
+            if not isinstance(info, dict):
+                continue
+            ingredients = info.get("ingredients", "")
+            if isinstance(ingredients, list):
+                ingredients = ", ".join(str(i) for i in ingredients)
+            yield from split_ingredients(str(ingredients))
+
+
+def format_amount(amount, family):
+    """
+    Render a base-unit amount in a shopper-friendly unit.
+
+    Returns:
+        tuple: (rounded quantity, unit label).
+    """
+    if family == "weight":
+        return (round(amount / 16, 2), "lb") if amount >= 16 else (round(amount, 1), "oz")
+    if family == "volume":
+        if amount >= 0.25:
+            return round(amount, 2), "cup"
+        if amount * 16 >= 1:
+            return round(amount * 16, 1), "tbsp"
+        return round(amount * 48, 1), "tsp"
+    # Count and package units: you can't buy part of an egg
+    return math.ceil(amount - 1e-9), family
+
+
+def consolidate(parsed):
+    """
+    Sum parsed lines across the week by product and unit family.
+
+    Args:
+        parsed (list): Dicts from parse_line().
+
+    Returns:
+        list: Shopping items in first-seen order, each
+            {"name", "quantities": [{"quantity", "unit"}], "display", "sources"}.
+    """
+    merged = {}
+    for line in parsed:
+        item = merged.setdefault(line["name"], {"amounts": {}, "sources": []})
+        item["sources"].append(line["raw"])
+        if line["amount"] is not None:
+            item["amounts"][line["family"]] = item["amounts"].get(line["family"], 0.0) + line["amount"]
+
+    items = []
+    for name, item in merged.items():
+        quantities = []
+        for family, amount in item["amounts"].items():
+            quantity, unit = format_amount(amount, family)
+            quantities.append({"quantity": quantity, "unit": unit})
+        label = name.title()
+        if quantities:
+            shown = " + ".join(
+                f"{q['quantity']:g}" if q["unit"] == "count" else f"{q['quantity']:g} {q['unit']}"
+                for q in quantities
+            )
+            label = f"{label} ({shown})"
+        items.append(
+            {"name": name, "quantities": quantities, "display": label, "sources": item["sources"]}
+        )
+    return items
+
+
+def subtract_pantry(items, pantry):
+    """
+    Drop items the user already has.
+
+    An item is dropped when, ignoring grade words like "kosher" or "extra
+    virgin", it names a pantry entry, or is an "and" of pantry entries. So
+    pantry "Salt, Pepper, Olive oil" removes "kosher salt", "salt and pepper"
+    and "extra virgin olive oil" but keeps "red bell pepper".
+
+    Args:
+        items (list): Shopping items from consolidate().
+        pantry (str): Comma-separated pantry items.
+
+    Returns:
+        list: The items still to buy.
+    """
+    pantry_names = [frozenset(normalize_name(p).split()) for p in split_ingredients(pantry or "")]
+    pantry_names = {p for p in pantry_names if p}
+
+    def in_pantry(name):
+        parts = [set(part.split()) - PANTRY_QUALIFIERS for part in name.split(" and ")]
+        return all(part and frozenset(part) in pantry_names for part in parts)
+
+    return [item for item in items if not in_pantry(item["name"])]
+
+
+def parse_llm_items(raw, lines):
+    """
+    Read the fallback model's JSON answer for lines the parser couldn't handle.
+
+    Args:
+        raw (str): Model reply, a JSON array of {"name", "quantity", "unit"}.
+        lines (list): The lines that were sent, used as "raw" sources.
+
+    Returns:
+        list: Dicts shaped like parse_line() output.
+
+    Raises:
+        ValueError: If the reply is not a JSON array.
+    """
+    answer = parse_json_reply(raw)
+    if not isinstance(answer, list):
+        raise ValueError("Extractor fallback reply is not a JSON array")
+    parsed = []
+    for pos, obj in enumerate(answer):
+        if not isinstance(obj, dict) or not obj.get("name"):
+            continue
+        name = normalize_name(str(obj["name"]))
+        if not name:
+            continue
+        family, factor = unit_factor(str(obj.get("unit") or "")) or ("count", 1.0)
+        try:
+            amount = float(obj["quantity"]) * factor if obj.get("quantity") is not None else None
+        except (TypeError, ValueError):
+            amount = None
+        parsed.append(
+            {"name": name, "amount": amount, "family": family,
+             "raw": lines[pos] if pos < len(lines) else obj["name"]}
+        )
+    return parsed
+
+
+def parse_plan(plan_json):
+    """
+    Parse every ingredient line in a meal plan.
+
+    Args:
+        plan_json (str): The planner's JSON.
+
+    Returns:
+        tuple: (parsed lines, unparsed lines). Pass the parsed lines plus any
+            LLM-parsed ones to consolidate() and subtract_pantry().
+    """
+    parsed, unparsed = [], []
+    for line in iter_plan_lines(plan_json):
+        # "1 onion, diced" splits into a line that is only a preparation note
+        if LEFTOVER_PATTERN.match(line) or not normalize_name(line):
+            continue
+        result = parse_line(line)
+        if result is None:
+            unparsed.append(line)
+        else:
+            parsed.append(result)
+    return parsed, unparsed
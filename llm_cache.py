@@ -0,0 +1,281 @@
+"""
+Persistent LLM response cache for Amazon Fresh Agent.
+
+Responses are stored in SQLite under a hash of the model name, temperature,
+prompt template and rendered inputs, so reorders, repeated items and re-runs
+after a crash reuse earlier answers instead of calling Gemini again. Each
+agent node opts in separately through LLM_CACHE_NODES, and callers can
+refuse to store (or be served) a reply they would reject anyway.
+"""
+
+import hashlib
+import json
+
+from langchain_core.messages import AIMessage
+
+from config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_NODES, LLM_CACHE_TTL_HOURS
+from database import db
+from telemetry import current_thread_id, telemetry, usage_tokens
+from utils import get_text_content
+
+
+def fingerprint(value) -> str:
+    """
+    Hash any JSON-serializable value into a stable hex digest.
+
+    Args:
+        value: The value to hash; dict keys are sorted first.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    payload = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def template_fingerprint(prompt) -> str:
+    """
+    Hash the message templates of a ChatPromptTemplate.
+
+    Editing a system prompt changes the hash, so stale answers are never served
+    for a new prompt.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt the chain renders.
+
+    Returns:
+        str: SHA-256 hex digest of the message types and template strings.
+    """
+    parts = []
+    for message in getattr(prompt, "messages", []):
+        template = getattr(getattr(message, "prompt", None), "template", None)
+        parts.append([type(message).__name__, template if template is not None else str(message)])
+    return fingerprint(parts)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for text when the model reports no usage."""
+    return max(1, len(text) // 4)
+
+
+class LLMCache:
+    """
+    Caches model responses per agent node and counts hits and tokens saved.
+
+    Counters are kept per LangGraph thread_id, so each session's run reports
+    (and resets) only its own figures.
+
+    Attributes:
+        nodes (dict): Whether caching is enabled, keyed by node name.
+        ttl_seconds (float): Maximum age of a usable entry.
+        max_entries (int): Maximum number of responses kept.
+        run_stats (dict): Per thread_id, {"hits", "misses", "tokens_saved"} keyed by node.
+    """
+
+    def __init__(self, database=None, nodes=None, ttl_seconds=None, max_entries=None):
+        """
+        Initialize the LLMCache.
+
+        Args:
+            database (DBManager): Where responses are stored. Defaults to the shared db.
+            nodes (dict): Per-node opt-in. Defaults to LLM_CACHE_NODES.
+            ttl_seconds (float): Entry lifetime. Defaults to LLM_CACHE_TTL_HOURS.
+            max_entries (int): Size limit. Defaults to LLM_CACHE_MAX_ENTRIES.
+        """
+        self.db = database or db
+        self.nodes = dict(LLM_CACHE_NODES if nodes is None else nodes)
+        self.ttl_seconds = LLM_CACHE_TTL_HOURS * 3600 if ttl_seconds is None else ttl_seconds
+        self.max_entries = LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.run_stats = {}
+
+    @property
+    def node_stats(self) -> dict:
+        """Per-node counters of the current thread_id's run."""
+        return self.run_stats.setdefault(current_thread_id.get(), {})
+
+    def reset_stats(self):
+        """Zero the per-node hit counters of the current thread_id's run."""
+        self.run_stats[current_thread_id.get()] = {}
+
+    def enabled(self, node: str) -> bool:
+        """Return True if responses for node may be cached."""
+        return bool(self.nodes.get(node, False))
+
+    async def ainvoke(
+        self, node, runnable, inputs, model, temperature, template="", key_inputs=None, accept=None
+    ):
+        """
+        Invoke runnable, or return its cached response for identical inputs.
+
+        Args:
+            node (str): Agent node making the call, for opt-in and stats.
+            runnable: A chat model or chain with an async ainvoke().
+            inputs: Passed to runnable.ainvoke().
+            model (str): Model name, part of the cache key.
+            temperature (float): Sampling temperature, part of the cache key.
+            template (str): Prompt template fingerprint, part of the cache key.
+            key_inputs: JSON-serializable form of inputs for the key. Defaults
+                to inputs itself.
+            accept (callable): Called with the response text; a reply it
+                rejects is neither stored nor served from the cache.
+
+        Returns:
+            The runnable's response, or an AIMessage holding the cached text.
+        """
+        with telemetry.span(f"llm.{node}", model) as span:
+            if not self.enabled(node):
+                response = await runnable.ainvoke(inputs)
+                span["input_tokens"], span["output_tokens"] = usage_tokens(response)
+                return response
+
+            key = self._key(node, model, temperature, template, inputs, key_inputs)
+            cached = self._lookup(node, key, accept)
+            if cached is not None:
+                span["cache_hit"] = True
+                return AIMessage(content=cached)
+
+            response = await runnable.ainvoke(inputs)
+            span["input_tokens"], span["output_tokens"] = usage_tokens(response)
+            text = get_text_content(response.content)
+            usage = getattr(response, "usage_metadata", None)
+            tokens = usage.get("total_tokens", 0) if isinstance(usage, dict) else 0
+            self._store(node, key, model, key_inputs or inputs, text, tokens, accept)
+            return response
+
+    async def astream(
+        self, node, runnable, inputs, model, temperature, template="", key_inputs=None, accept=None
+    ):
+        """
+        Stream runnable's response text, or replay the cached text in one piece.
+
+        Takes the same arguments as ainvoke(). The concatenated pieces equal
+        the text ainvoke() would return, and are cached once the stream ends
+        if accept (when given) approves them.
+
+        Yields:
+            str: Response text as it arrives.
+        """
+        with telemetry.span(f"llm.{node}", model) as span:
+            span["input_tokens"] = span["output_tokens"] = 0
+            if not self.enabled(node):
+                async for chunk in runnable.astream(inputs):
+                    self._count_usage(span, chunk)
+                    yield get_text_content(chunk.content)
+                return
+
+            key = self._key(node, model, temperature, template, inputs, key_inputs)
+            cached = self._lookup(node, key, accept)
+            if cached is not None:
+                span["cache_hit"] = True
+                yield cached
+                return
+
+            parts = []
+            tokens = 0
+            async for chunk in runnable.astream(inputs):
+                text = get_text_content(chunk.content)
+                parts.append(text)
+                self._count_usage(span, chunk)
+                usage = getattr(chunk, "usage_metadata", None)
+                if isinstance(usage, dict):
+                    tokens += usage.get("total_tokens", 0)
+                yield text
+            self._store(node, key, model, key_inputs or inputs, "".join(parts), tokens, accept)
+
+    @staticmethod
+    def _count_usage(span, chunk):
+        input_tokens, output_tokens = usage_tokens(chunk)
+        span["input_tokens"] += input_tokens
+        span["output_tokens"] += output_tokens
+
+    def _key(self, node, model, temperature, template, inputs, key_inputs):
+        return fingerprint(
+            [node, model, temperature, template, inputs if key_inputs is None else key_inputs]
+        )
+
+    def _lookup(self, node, key, accept=None):
+        counters = self.node_stats.setdefault(node, {"hits": 0, "misses": 0, "tokens_saved": 0})
+        cached = self.db.get_cached_llm_response(key, self.ttl_seconds)
+        if cached is None or (accept is not None and not accept(cached["response"])):
+            counters["misses"] += 1
+            return None
+        counters["hits"] += 1
+        counters["tokens_saved"] += cached["tokens"]
+        return cached["response"]
+
+    def _store(self, node, key, model, inputs, text, tokens, accept=None):
+        if accept is not None and not accept(text):
+            return  # Asking again must reach the model, not replay this reply
+        if not tokens:
+            tokens = estimate_tokens(json.dumps(inputs, default=str) + text)
+        self.db.save_cached_llm_response(key, node, model, text, tokens, self.max_entries)
+
+    def wrap(self, llm, node, model, temperature):
+        """
+        Wrap a chat model so its ainvoke(messages) calls go through the cache.
+
+        Args:
+            llm: The chat model (or another wrapper exposing ainvoke).
+            node (str): Agent node name.
+            model (str): Model name.
+            temperature (float): Sampling temperature.
+
+        Returns:
+            CachedChatModel: The wrapper.
+        """
+        return CachedChatModel(self, llm, node, model, temperature)
+
+    def stats(self) -> dict:
+        """
+        Summarize hits since the last reset.
+
+        Returns:
+            dict: Per-node counters plus overall hits, misses, hit_rate and tokens_saved.
+        """
+        hits = sum(s["hits"] for s in self.node_stats.values())
+        misses = sum(s["misses"] for s in self.node_stats.values())
+        return {
+            "nodes": {node: dict(s) for node, s in self.node_stats.items()},
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "tokens_saved": sum(s["tokens_saved"] for s in self.node_stats.values()),
+        }
+
+
+class CachedChatModel:
+    """Chat model stand-in whose ainvoke(messages) is served from an LLMCache."""
+
+    def __init__(self, cache, llm, node, model, temperature):
+        """
+        Initialize the CachedChatModel.
+
+        Args:
+            cache (LLMCache): The cache to use.
+            llm: The wrapped chat model.
+            node (str): Agent node name.
+            model (str): Model name.
+            temperature (float): Sampling temperature.
+        """
+        self.cache = cache
+        self.llm = llm
+        self.node = node
+        self.model = model
+        self.temperature = temperature
+
+    async def ainvoke(self, messages, accept=None):
+        """
+        Invoke the wrapped model unless the same messages were answered before.
+
+        Args:
+            messages (list): The chat messages.
+            accept (callable): Optional check on the reply text; see LLMCache.ainvoke().
+        """
+        rendered = [[type(m).__name__, get_text_content(m.content)] for m in messages]
+        return await self.cache.ainvoke(
+            self.node, self.llm, messages, self.model, self.temperature,
+            key_inputs=rendered, accept=accept,
+        )
+
+
+llm_cache = LLMCache()
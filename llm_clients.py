@@ -0,0 +1,147 @@
+"""
+Shared chat model clients for Amazon Fresh Agent.
+
+Building a ChatGoogleGenerativeAI sets up auth and a fresh HTTP connection
+pool, so every node and every Streamlit rerun used to pay for that again.
+get_llm() hands out one client per model, temperature, API key and event
+loop for the whole process, and set_client_factory() swaps in fakes for tests
+and benchmarks.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+
+def gemini_factory(model: str, temperature: float, api_key: str):
+    """
+    Build a Gemini chat model.
+
+    Args:
+        model (str): Gemini model name.
+        temperature (float): Sampling temperature.
+        api_key (str): Google API key.
+
+    Returns:
+        ChatGoogleGenerativeAI: The new client.
+    """
+    return ChatGoogleGenerativeAI(model=model, temperature=temperature, google_api_key=api_key)
+
+
+def close_client(llm):
+    """
+    Release a client whose event loop has gone.
+
+    Only the sync HTTP client can be closed here; the async pool belonged to
+    the finished loop and is left to the garbage collector.
+
+    Args:
+        llm: A client built by the factory; fakes without a client are ignored.
+    """
+    close = getattr(getattr(llm, "client", None), "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception:
+        pass  # Nothing else holds the client, so a failed close only leaks it
+
+
+class LLMClientPool:
+    """
+    Process-wide registry of chat model clients.
+
+    Async connection pools belong to the event loop that first used them, so
+    clients are kept per loop as well as per model, temperature and API key.
+    Loops are held by weak reference, since Streamlit sessions leave theirs
+    open; clients of loops that have closed or been collected are evicted
+    and closed on the next get().
+
+    Attributes:
+        factory (callable): Builds a client from (model, temperature, api_key).
+        stats (dict): {"created", "reused", "evicted"} since the last clear.
+    """
+
+    def __init__(self, factory=None):
+        """
+        Initialize the LLMClientPool.
+
+        Args:
+            factory (callable): Client builder. Defaults to gemini_factory.
+        """
+        self.factory = factory or gemini_factory
+        self._lock = threading.Lock()  # Streamlit runs sessions in threads
+        self.clear()
+
+    def clear(self):
+        """Drop every client and zero the counters."""
+        self._clients = {}
+        self.stats = {"created": 0, "reused": 0, "evicted": 0}
+
+    def get(self, model: str, temperature: float = 1.0, api_key: str = None):
+        """
+        Return the shared client for these settings, building it on first use.
+
+        Args:
+            model (str): Model name.
+            temperature (float): Sampling temperature.
+            api_key (str): API key. Defaults to GOOGLE_API_KEY, read on every
+                call so a key entered in the sidebar takes effect.
+
+        Returns:
+            The chat model.
+        """
+        if api_key is None:
+            api_key = os.getenv("GOOGLE_API_KEY")
+        try:
+            loop_ref = weakref.ref(asyncio.get_running_loop())
+        except RuntimeError:
+            loop_ref = None
+        key = (model, temperature, api_key, loop_ref)
+
+        with self._lock:
+            dead = [k for k in self._clients if k[3] is not None and self._is_dead(k[3])]
+            for stale in dead:
+                close_client(self._clients.pop(stale))
+            self.stats["evicted"] += len(dead)
+
+            llm = self._clients.get(key)
+            if llm is None:
+                llm = self.factory(model, temperature, api_key)
+                self._clients[key] = llm
+                self.stats["created"] += 1
+            else:
+                self.stats["reused"] += 1
+        return llm
+
+    def _is_dead(self, loop_ref):
+        """Return True if the referenced loop was collected or has closed."""
+        loop = loop_ref()
+        return loop is None or loop.is_closed()
+
+    def set_factory(self, factory):
+        """
+        Replace the client builder and drop clients built by the old one.
+
+        Args:
+            factory (callable): New builder, or None for gemini_factory.
+        """
+        with self._lock:
+            self.factory = factory or gemini_factory
+            self.clear()
+
+
+llm_clients = LLMClientPool()
+
+
+def get_llm(model: str, temperature: float = 1.0, api_key: str = None):
+    """Return the shared client for model and temperature (see LLMClientPool.get)."""
+    return llm_clients.get(model, temperature, api_key)
+
+
+def set_client_factory(factory):
+    """Build future clients with factory, e.g. a fake in tests (None restores Gemini)."""
+    llm_clients.set_factory(factory)
@@ -41,6 +41,38 @@ The "schedule" is an array of objects. Each object represents a DAY and must hav
 CRITICAL: You must list specific quantities (lbs, oz, cups, count) for every ingredient so the shopping list is accurate.
 """
 
+# Fan-out planning (PLANNER_MODE "fanout"): a short outline first, then one
+# detailed prompt per day, run concurrently
+PLANNER_SKELETON_PROMPT = """You are a professional chef outlining a weekly meal plan.
+Follow the user's request and return ONLY a JSON object with ONE key: "days".
+"days" is an array with one object per day, in order, each with:
+- "day": "Monday", "Tuesday", etc.
+- "breakfast", "lunch", "dinner": a short dish title for each meal
+- "leftovers_from": the earlier meal a leftover lunch or dinner reuses (e.g. "Monday dinner"), or null
+Keep it brief: titles only, no ingredients or instructions.
+"""
+
+PLANNER_DAY_PROMPT = """You are a professional chef. Write the detailed meals for ONE day of a weekly plan.
+Return ONLY a JSON object for that day with:
+- "day": the day name you were given
+- "breakfast": {{ "title": "Name", "ingredients": "Specific list with quantities (e.g. '2 Eggs', '1 cup Oats')", "instructions": "Steps" }}
+- "lunch": {{ "title": "Name", "ingredients": "Specific list with quantities (e.g. '4oz Chicken', '1 Avocado')", "instructions": "Steps" }}
+- "dinner": {{ "title": "Name", "ingredients": "Specific list with quantities (e.g. '1lb Beef', '1 cup Rice')", "instructions": "Steps" }}
+- "nutrition": {{ "calories": 2000, "protein_g": 150, "carbs_g": 200, "fat_g": 70 }}
+
+Keep the dish titles from the outline. A meal made from leftovers lists "Leftover ..." as its
+ingredients so nothing is bought twice; the meal that makes them must cook enough for both.
+CRITICAL: You must list specific quantities (lbs, oz, cups, count) for every ingredient so the shopping list is accurate.
+"""
+
+PLANNER_DAY_REQUEST = """USER REQUEST:
+{request}
+
+WEEK OUTLINE:
+{outline}
+
+Write {day} in full.{problems}"""
+
 # --- EXTRACTOR PROMPTS ---
 
 EXTRACTOR_SYSTEM_PROMPT = """You are a rigorous shopping list compiler.
@@ -53,3 +85,15 @@ EXTRACTOR_SYSTEM_PROMPT = """You are a rigorous shopping list compiler.
 
 HISTORY: {history}
 """
+
+# Used only for ingredient lines the local parser in ingredients.py can't read
+EXTRACTOR_FALLBACK_PROMPT = """Convert each ingredient line below into ONE grocery item to buy.
+Return ONLY a JSON array with one object per line, in the same order, each with:
+- "name": the generic product name (e.g. "chicken thighs", not "chicken or tofu, cubed")
+- "quantity": a number, or null if none is given
+- "unit": one of oz, lb, g, kg, cup, tbsp, tsp, ml, l, count, can, clove, bunch, jar, package, or null
+If a line offers alternatives, pick the first.
+
+LINES:
+{lines}
+"""
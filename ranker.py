@@ -0,0 +1,234 @@
+"""
+Local product ranker for Amazon Fresh Agent.
+
+Scores search options against the requested item without calling an LLM, so
+obvious matches ("Bananas" vs. "Banana Bunch (4-5 Count)") are decided locally
+and only ambiguous ones are escalated to the shopper model.
+"""
+
+import math
+import re
+
+from database import normalize_query
+from units import SIZE_PATTERN, tokenize, unit_factor
+
+# Share of relevance kept per title word the request doesn't mention, so
+# "Chicken" doesn't fully match "Chicken Broth"
+EXTRA_WORD_FACTOR = 0.75
+
+# Words of a title's comma prefix taken as the brand; longer prefixes such as
+# "Swanson Chicken Broth" are mostly product words
+BRAND_MAX_WORDS = 2
+
+# Relative weight of each signal in an option's score
+WEIGHTS = {"relevance": 0.55, "brand": 0.15, "quality": 0.15, "value": 0.15}
+
+
+def parse_rating(text):
+    """
+    Parse a rating like "4.5 out of 5 stars".
+
+    Returns:
+        float: The rating, or 0.0 if none is present.
+    """
+    match = re.search(r"\d+(?:\.\d+)?", text or "")
+    return float(match.group()) if match else 0.0
+
+
+def parse_reviews(text):
+    """
+    Parse a review count like "12,345".
+
+    Returns:
+        int: The review count, or 0 if none is present.
+    """
+    digits = re.sub(r"[^\d]", "", text or "")
+    return int(digits) if digits else 0
+
+
+def parse_unit_price(title, price):
+    """
+    Estimate the price per base unit from the size written in a product title.
+
+    Args:
+        title (str): Product title, e.g. "Milk 2% Organic, 64 Fl Oz".
+        price (float): Product price.
+
+    Returns:
+        tuple: (unit family, price per base unit), or None if no size was found.
+    """
+    match = SIZE_PATTERN.search(title)
+    if not match or not price:
+        return None
+    family, factor = unit_factor(match.group(2))
+    amount = float(match.group(1)) * factor
+    if amount <= 0:
+        return None
+    return family, price / amount
+
+
+def brand_of(title):
+    """
+    Guess the brand of a product from its title.
+
+    Amazon Fresh titles usually lead with the brand, e.g. "Perdue, Chicken
+    Thighs", but just as often with the product itself, as in "Swanson
+    Chicken Broth, 32 oz". Only the first BRAND_MAX_WORDS words before the
+    comma are kept, so product words past them still count as extra.
+
+    Returns:
+        str: The normalized brand, or "" when the title has no brand prefix.
+    """
+    if "," not in title:
+        return ""
+    return " ".join(normalize_query(title.split(",", 1)[0]).split()[:BRAND_MAX_WORDS])
+
+
+def score_options(original_item, search_term, options, preferred_brands=None):
+    """
+    Score every option on relevance, brand history, ratings and unit price.
+
+    Relevance is the share of requested words found in the title, discounted
+    for each title word (outside the brand) that the request doesn't contain.
+
+    Args:
+        original_item (str): The item as written on the shopping list.
+        search_term (str): The optimized search query.
+        options (list): Options returned by the browser.
+        preferred_brands (dict): Purchase counts keyed by normalized brand.
+
+    Returns:
+        list: One dict per option with "index", "score" and each signal in [0, 1].
+    """
+    preferred_brands = preferred_brands or {}
+    item_tokens = set(tokenize(original_item))
+    query_tokens = set(tokenize(search_term))
+    unit_prices = [parse_unit_price(opt["title"], opt.get("price", 0.0)) for opt in options]
+
+    scored = []
+    for opt, unit_price in zip(options, unit_prices):
+        title_tokens = set(tokenize(opt["title"]))
+        recalls = [
+            len(tokens & title_tokens) / len(tokens)
+            for tokens in (item_tokens, query_tokens)
+            if tokens
+        ]
+        brand = brand_of(opt["title"])
+        extra = title_tokens - item_tokens - query_tokens - set(tokenize(brand))
+        relevance = (max(recalls) if recalls else 0.0) * EXTRA_WORD_FACTOR ** len(extra)
+
+        brand_score = 1.0 if brand and brand in preferred_brands else 0.0
+
+        # Ratings only count once there are enough reviews to trust them
+        reviews = parse_reviews(opt.get("reviews"))
+        quality = parse_rating(opt.get("rating")) / 5 * min(1.0, math.log10(reviews + 1) / 3)
+
+        value = 0.5
+        if unit_price:
+            peers = [up[1] for up in unit_prices if up and up[0] == unit_price[0]]
+            if len(peers) > 1 and max(peers) > min(peers):
+                value = (max(peers) - unit_price[1]) / (max(peers) - min(peers))
+
+        signals = {
+            "relevance": relevance,
+            "brand": brand_score,
+            "quality": quality,
+            "value": value,
+        }
+        score = sum(WEIGHTS[name] * signals[name] for name in WEIGHTS)
+        scored.append({"index": opt["index"], "score": score, **signals})
+    return scored
+
+
+def rank_options(original_item, search_term, options, preferred_brands=None):
+    """
+    Pick the best option locally and say how sure we are.
+
+    Confidence is high when the top option contains every word of the request
+    and little else, and clearly outscores the runner-up.
+
+    Args:
+        original_item (str): The item as written on the shopping list.
+        search_term (str): The optimized search query.
+        options (list): Options returned by the browser.
+        preferred_brands (dict): Purchase counts keyed by normalized brand.
+
+    Returns:
+        dict: {"index": int, "confidence": float, "scores": list}; index is -1
+            when there are no options.
+    """
+    scored = score_options(original_item, search_term, options, preferred_brands)
+    if not scored:
+        return {"index": -1, "confidence": 0.0, "scores": []}
+    ordered = sorted(scored, key=lambda s: s["score"], reverse=True)
+    best = ordered[0]
+    margin = best["score"] - ordered[1]["score"] if len(ordered) > 1 else 1.0
+    confidence = 0.7 * best["relevance"] + 0.3 * min(1.0, margin / 0.1)
+    return {"index": best["index"], "confidence": round(confidence, 3), "scores": scored}
+
+
+class LocalRanker:
+    """
+    Decides obvious matches locally and counts how often the LLM was needed.
+
+    Attributes:
+        preferred_brands (dict): Purchase counts keyed by normalized brand.
+        threshold (float): Minimum confidence to skip the LLM.
+        decided (int): Items chosen locally.
+        escalated (int): Items left for the LLM.
+    """
+
+    def __init__(self, preferred_brands=None, threshold=0.85):
+        """
+        Initialize the LocalRanker.
+
+        Args:
+            preferred_brands (dict): Purchase counts keyed by normalized brand.
+            threshold (float): Minimum confidence to skip the LLM.
+        """
+        self.preferred_brands = preferred_brands or {}
+        self.threshold = threshold
+        self.decided = 0
+        self.escalated = 0
+
+    @classmethod
+    def from_history(cls, purchased, threshold):
+        """
+        Build a ranker whose brand preferences come from purchase history.
+
+        Args:
+            purchased (list): (product title, count) tuples.
+            threshold (float): Minimum confidence to skip the LLM.
+
+        Returns:
+            LocalRanker: The ranker.
+        """
+        brands = {}
+        for title, count in purchased:
+            brand = brand_of(title)
+            if brand:
+                brands[brand] = brands.get(brand, 0) + (count or 1)
+        return cls(brands, threshold)
+
+    def select(self, original_item, search_term, options):
+        """
+        Return the option to buy when the local ranking is confident enough.
+
+        Args:
+            original_item (str): The item as written on the shopping list.
+            search_term (str): The optimized search query.
+            options (list): Options returned by the browser.
+
+        Returns:
+            dict: The chosen option, or None to escalate to the LLM.
+        """
+        ranking = rank_options(original_item, search_term, options, self.preferred_brands)
+        if ranking["confidence"] >= self.threshold:
+            self.decided += 1
+            return next(opt for opt in options if opt["index"] == ranking["index"])
+        self.escalated += 1
+        return None
+
+    def stats(self):
+        """Return the decided/escalated counters for run_stats."""
+        return {"decided_locally": self.decided, "escalated": self.escalated}
@@ -1,4 +1,5 @@
 import sqlite3
+import zlib
 import pandas as pd
 import os
 
@@ -25,7 +26,11 @@ def view_database():
     print("-" * 40)
     try:
         # Using pandas for a nice readable table output
-        df_history = pd.read_sql_query("SELECT * FROM purchase_history ORDER BY count DESC LIMIT 50", conn)
+        df_history = pd.read_sql_query(
+            "SELECT item_name, count, datetime(last_purchased, 'unixepoch', 'localtime') AS last_purchased "
+            "FROM purchase_history ORDER BY count DESC LIMIT 50",
+            conn,
+        )
         if not df_history.empty:
             print(df_history)
         else:
@@ -50,9 +55,16 @@ def view_database():
     print("-" * 40)
     try:
         # Select specific columns to avoid printing giant JSON blobs
-        query = "SELECT id, date, prompt, length(shopping_list) as list_size FROM meal_plans ORDER BY id DESC LIMIT 5"
+        query = (
+            "SELECT m.id, m.date, COALESCE(p.body, m.prompt) AS prompt, m.item_count AS items "
+            "FROM meal_plans m LEFT JOIN prompts p ON p.id = m.prompt_id ORDER BY m.id DESC LIMIT 5"
+        )
         df_plans = pd.read_sql_query(query, conn)
         if not df_plans.empty:
+            # Long prompts are stored zlib-compressed
+            df_plans["prompt"] = df_plans["prompt"].map(
+                lambda v: zlib.decompress(v).decode("utf-8")[:60] if isinstance(v, bytes) else v
+            )
             print(df_plans)
         else:
             print("(No meal plans saved yet)")
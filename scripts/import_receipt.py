@@ -1,6 +1,10 @@
-import sqlite3
 import re
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database import DBManager  # noqa: E402
 
 # --- PASTE YOUR NEW DATA HERE ---
 RAW_DATA = """
@@ -13,12 +17,7 @@ def import_data():
     # 1. Connect to Database
     db_path = "agent_data.db"
     # We don't check for existence because we want to create it if it's missing
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    # Ensure the table exists
-    c.execute('''CREATE TABLE IF NOT EXISTS purchase_history 
-                 (item_name TEXT PRIMARY KEY, count INTEGER DEFAULT 1)''')
+    db = DBManager(db_path)
 
     # 2. Parse the Text
     # Remove header junk and newlines to make one long string
@@ -51,23 +50,18 @@ def import_data():
 
     # 3. Insert into DB
     print(f"🔍 Found {len(items_found)} items.")
-    count_new = 0
-    
     for item in items_found:
         print(f"   -> {item}")
-        try:
-            # Upsert: Add 1 to count if exists, else insert
-            c.execute("""
-                INSERT INTO purchase_history (item_name, count) 
-                VALUES (?, 1) 
-                ON CONFLICT(item_name) DO UPDATE SET count = count + 1
-            """, (item,))
-            count_new += 1
-        except Exception as e:
-            print(f"Error saving {item}: {e}")
 
-    conn.commit()
-    conn.close()
+    # Adds 1 to each count (inserting new items) and indexes them for lookups
+    try:
+        db.record_purchases(items_found)
+        count_new = len(items_found)
+    except Exception as e:
+        print(f"Error saving items: {e}")
+        count_new = 0
+
+    db.close()
     print("-" * 30)
     print(f"✅ Successfully trained AI on {count_new} items.")
 
@@ -0,0 +1,52 @@
+"""
+Print p50/p95 time, tokens and estimated cost per operation from the telemetry table.
+
+Usage:
+    python scripts/telemetry_report.py [--thread THREAD_ID] [--days 7] [--db PATH]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+
+from config import DB_NAME  # noqa: E402
+from database import DBManager  # noqa: E402
+from telemetry import Telemetry  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--thread", help="Only this LangGraph thread_id")
+    parser.add_argument("--days", type=float, help="Only the last N days")
+    parser.add_argument("--db", default=os.path.join(ROOT, DB_NAME))
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: Database '{args.db}' not found.")
+        return
+    since = time.time() - args.days * 86400 if args.days else None
+    summary = Telemetry(DBManager(args.db)).summarize(args.thread, since)
+    if not summary:
+        print("(No telemetry recorded)")
+        return
+
+    print(
+        f"{'operation':<26} {'calls':>6} {'p50 s':>8} {'p95 s':>8} {'total s':>9} "
+        f"{'in tok':>9} {'out tok':>9} {'cost $':>9} {'cache':>6} {'retry':>6} {'err':>4}"
+    )
+    for row in summary:
+        print(
+            f"{row['operation']:<26} {row['count']:>6} {row['p50_seconds']:>8.2f} "
+            f"{row['p95_seconds']:>8.2f} {row['total_seconds']:>9.1f} {row['input_tokens']:>9,} "
+            f"{row['output_tokens']:>9,} {row['cost_usd']:>9.4f} {row['cache_hit_rate']:>6.0%} "
+            f"{row['retries']:>6} {row['errors']:>4}"
+        )
+    print(f"Estimated model cost: ${sum(row['cost_usd'] for row in summary):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Per-operation telemetry for Amazon Fresh Agent.
+
+Graph nodes, LLM calls and browser actions are timed and stored in the
+telemetry table with their model, token counts, retries and cache hits, keyed
+by the LangGraph thread_id of the run. summarize() aggregates p50/p95 time,
+tokens and estimated cost per operation for the sidebar and
+scripts/telemetry_report.py.
+"""
+
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+from config import MODEL_PRICES, TELEMETRY_ENABLED, TELEMETRY_MAX_ROWS
+from database import db
+from utils import percentile
+
+# Set by instrument_node() for everything a graph step runs, including its tasks
+current_thread_id = contextvars.ContextVar("telemetry_thread_id", default="")
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    """
+    Estimate the USD cost of a model call from MODEL_PRICES.
+
+    Args:
+        model (str): Model name.
+        input_tokens (int): Prompt tokens.
+        output_tokens (int): Response tokens.
+
+    Returns:
+        float: Cost in USD, 0.0 for unknown models.
+    """
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def usage_tokens(message):
+    """
+    Read (input_tokens, output_tokens) from a model response's usage metadata.
+
+    Args:
+        message: An AIMessage or chunk.
+
+    Returns:
+        tuple: Token counts, (0, 0) when the model reported none.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if not isinstance(usage, dict):
+        return 0, 0
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+class Telemetry:
+    """
+    Records timed operations to the database.
+
+    Attributes:
+        enabled (bool): Whether anything is written.
+        max_rows (int): Size limit of the telemetry table.
+    """
+
+    def __init__(self, database=None, enabled=None, max_rows=None):
+        """
+        Initialize the Telemetry recorder.
+
+        Args:
+            database (DBManager): Where rows are stored. Defaults to the shared db.
+            enabled (bool): Defaults to TELEMETRY_ENABLED.
+            max_rows (int): Defaults to TELEMETRY_MAX_ROWS.
+        """
+        self.db = database or db
+        self.enabled = TELEMETRY_ENABLED if enabled is None else enabled
+        self.max_rows = TELEMETRY_MAX_ROWS if max_rows is None else max_rows
+
+    def record(self, operation, seconds, model="", input_tokens=0, output_tokens=0,
+               retries=0, cache_hit=False, ok=True, details=None):
+        """
+        Store one finished operation under the current thread_id.
+
+        Args:
+            operation (str): Dotted name, e.g. "llm.selection" or "browser.search".
+            seconds (float): Wall time.
+            model (str): Model name for LLM calls.
+            input_tokens (int): Prompt tokens billed.
+            output_tokens (int): Response tokens billed.
+            retries (int): Extra attempts the operation needed.
+            cache_hit (bool): Whether a cache answered instead of the model or page.
+            ok (bool): False if the operation raised or reported failure.
+            details (dict): Extra JSON-serializable figures kept with the row.
+        """
+        if not self.enabled:
+            return
+        self.db.save_telemetry(
+            {
+                "thread_id": current_thread_id.get(),
+                "operation": operation,
+                "model": model,
+                "seconds": seconds,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "retries": retries,
+                "cache_hit": cache_hit,
+                "ok": ok,
+                "details": details,
+            },
+            self.max_rows,
+        )
+
+    @contextmanager
+    def span(self, operation, model=""):
+        """
+        Time a block and record it on exit.
+
+        The yielded dict may be updated with input_tokens, output_tokens,
+        retries, cache_hit or ok before the block ends. An exception marks
+        the operation as failed and is re-raised.
+
+        Args:
+            operation (str): Dotted operation name.
+            model (str): Model name for LLM calls.
+
+        Yields:
+            dict: Fields to record.
+        """
+        fields = {"model": model}
+        started = time.perf_counter()
+        try:
+            yield fields
+        except BaseException:
+            fields["ok"] = False
+            raise
+        finally:
+            self.record(operation, time.perf_counter() - started, **fields)
+
+    def traced(self, operation, failed=None):
+        """
+        Decorate an async function so each call is recorded.
+
+        Args:
+            operation (str): Dotted operation name.
+            failed (callable): Optional; given the return value, True marks
+                the call as failed.
+
+        Returns:
+            callable: The decorator.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(operation) as fields:
+                    result = await func(*args, **kwargs)
+                    if failed is not None and failed(result):
+                        fields["ok"] = False
+                    return result
+
+            return wrapper
+
+        return decorator
+
+    def last(self, operation):
+        """
+        Return the most recent record of an operation, e.g. a per-run baseline.
+
+        Args:
+            operation (str): Dotted operation name.
+
+        Returns:
+            dict: The row, or None if it was never recorded.
+        """
+        return self.db.get_last_telemetry(operation)
+
+    def summarize(self, thread_id=None, since=None):
+        """
+        Aggregate recorded operations.
+
+        Args:
+            thread_id (str): Only this graph thread. Defaults to all runs.
+            since (float): Only rows recorded after this Unix time.
+
+        Returns:
+            list: One dict per operation, slowest total first, with count,
+                p50/p95/total seconds, input/output tokens, cost, cache hit
+                rate, retries and errors.
+        """
+        groups = {}
+        for row in self.db.get_telemetry(thread_id, since):
+            groups.setdefault(row["operation"], []).append(row)
+
+        summary = []
+        for operation, rows in groups.items():
+            seconds = [r["seconds"] for r in rows]
+            summary.append(
+                {
+                    "operation": operation,
+                    "count": len(rows),
+                    "p50_seconds": percentile(seconds, 50),
+                    "p95_seconds": percentile(seconds, 95),
+                    "total_seconds": sum(seconds),
+                    "input_tokens": sum(r["input_tokens"] for r in rows),
+                    "output_tokens": sum(r["output_tokens"] for r in rows),
+                    "cost_usd": sum(
+                        estimate_cost(r["model"], r["input_tokens"], r["output_tokens"])
+                        for r in rows
+                    ),
+                    "cache_hit_rate": sum(r["cache_hit"] for r in rows) / len(rows),
+                    "retries": sum(r["retries"] for r in rows),
+                    "errors": sum(not r["ok"] for r in rows),
+                }
+            )
+        return sorted(summary, key=lambda s: -s["total_seconds"])
+
+
+telemetry = Telemetry()
+
+
+def instrument_node(name, node):
+    """
+    Wrap a LangGraph node so it runs under its thread_id and is timed.
+
+    Args:
+        name (str): Node name, recorded as "node.<name>".
+        node (callable): The async node function taking the state.
+
+    Returns:
+        callable: An async node taking (state, config).
+    """
+
+    async def wrapper(state, config):
+        token = current_thread_id.set(config.get("configurable", {}).get("thread_id", ""))
+        try:
+            with telemetry.span(f"node.{name}"):
+                return await node(state)
+        finally:
+            current_thread_id.reset(token)
+
+    # No functools.wraps: LangGraph reads the signature to decide whether to pass config
+    wrapper.__name__ = name
+    wrapper.__doc__ = node.__doc__
+    return wrapper
@@ -0,0 +1,4 @@
+import os
+
+# Keep test runs out of the telemetry of the real database
+os.environ.setdefault("TELEMETRY_ENABLED", "false")
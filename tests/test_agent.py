@@ -2,35 +2,60 @@
 Unit tests for agent.py
 """
 
+import asyncio
 import json
 import unittest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
-from agent import planner_node, extractor_node
+from agent import (
+    BudgetTracker,
+    ScheduleStreamParser,
+    choose_options_batched,
+    extractor_node,
+    parse_batch_choices,
+    parse_choice,
+    parse_queries,
+    planner_node,
+    preferred_products,
+    shop_batched,
+    shop_item,
+    shop_pipelined,
+    validate_day,
+)
+from llm_cache import llm_cache
+
+
+def stream_of(*pieces):
+    """Build an astream() stand-in that yields message chunks with these texts."""
+
+    async def astream(inputs):
+        for piece in pieces:
+            yield MagicMock(content=piece, usage_metadata=None)
+
+    return MagicMock(side_effect=astream)
 
 
 class TestPlannerNode(unittest.IsolatedAsyncioTestCase):
     """Test cases for planner_node."""
 
+    @patch("agent.render_schedule_tabs")
     @patch("agent.st")
-    @patch("agent.ChatGoogleGenerativeAI")
-    async def test_planner_node_valid_json(self, mock_llm_class, mock_st):
+    @patch("agent.get_llm")
+    async def test_planner_node_valid_json(self, mock_get_llm, mock_st, mock_render):
         """Test planner node with valid JSON response."""
         # Mock Streamlit status
         mock_status = MagicMock()
         mock_st.status.return_value.__enter__.return_value = mock_status
 
-        # Mock LLM response
+        # Mock LLM
         mock_llm = AsyncMock()
-        mock_response = MagicMock()
         valid_plan = {"schedule": [{"day": "Monday"}]}
-        mock_response.content = json.dumps(valid_plan)
-        mock_llm.ainvoke.return_value = mock_response
-        
-        # Mock chain
-        mock_chain = AsyncMock()
-        mock_chain.ainvoke.return_value = mock_response
-        mock_llm_class.return_value = mock_llm
+        mock_get_llm.return_value = mock_llm
+
+        # Mock chain streaming the plan in pieces
+        plan_text = json.dumps(valid_plan)
+        mock_chain = MagicMock()
+        mock_chain.astream = stream_of(plan_text[:10], plan_text[10:])
 
         # Create state
         state = {
@@ -49,9 +74,10 @@ class TestPlannerNode(unittest.IsolatedAsyncioTestCase):
         parsed = json.loads(result["meal_plan_json"])
         self.assertIn("schedule", parsed)
 
+    @patch("agent.render_schedule_tabs")
     @patch("agent.st")
-    @patch("agent.ChatGoogleGenerativeAI")
-    async def test_planner_node_invalid_json(self, mock_llm_class, mock_st):
+    @patch("agent.get_llm")
+    async def test_planner_node_invalid_json(self, mock_get_llm, mock_st, mock_render):
         """Test planner node handles invalid JSON gracefully."""
         # Mock Streamlit
         mock_status = MagicMock()
@@ -59,13 +85,9 @@ class TestPlannerNode(unittest.IsolatedAsyncioTestCase):
 
         # Mock LLM with invalid response
         mock_llm = AsyncMock()
-        mock_response = MagicMock()
-        mock_response.content = "This is not valid JSON"
-        mock_llm.ainvoke.return_value = mock_response
-        
-        mock_chain = AsyncMock()
-        mock_chain.ainvoke.return_value = mock_response
-        mock_llm_class.return_value = mock_llm
+        mock_chain = MagicMock()
+        mock_chain.astream = stream_of("This is not ", "valid JSON")
+        mock_get_llm.return_value = mock_llm
 
         state = {
             "messages": [MagicMock(content="Create a meal plan")]
@@ -79,22 +101,175 @@ class TestPlannerNode(unittest.IsolatedAsyncioTestCase):
         # Should return fallback empty schedule
         parsed = json.loads(result["meal_plan_json"])
         self.assertEqual(parsed, {"schedule": []})
+        mock_render.assert_not_called()
+
+    @patch("agent.render_schedule_tabs")
+    @patch("agent.st")
+    @patch("agent.get_llm")
+    async def test_planner_node_renders_days_as_they_stream(
+        self, mock_get_llm, mock_st, mock_render
+    ):
+        """Test that each completed day is shown and the final JSON matches the full text."""
+        mock_st.status.return_value.__enter__.return_value = MagicMock()
+        mock_get_llm.return_value = AsyncMock()
+        plan_text = "```json\n" + json.dumps(
+            {"schedule": [{"day": "Monday", "dinner": "Tacos {al pastor}"}, {"day": "Tuesday"}]},
+            indent=2,
+        ) + "\n```"
+        pieces = [plan_text[i : i + 7] for i in range(0, len(plan_text), 7)]
+        mock_chain = MagicMock()
+        mock_chain.astream = stream_of(*pieces)
+
+        with patch("agent.ChatPromptTemplate") as mock_template:
+            mock_template.from_messages.return_value.__or__ = MagicMock(return_value=mock_chain)
+            result = await planner_node({"messages": [MagicMock(content="Plan")]})
+
+        rendered = [call.args[0] for call in mock_render.call_args_list]
+        self.assertEqual([len(days) for days in rendered], [1, 2])
+        self.assertEqual(rendered[0][0]["dinner"], "Tacos {al pastor}")
+        expected = plan_text.removeprefix("```json").removesuffix("```")
+        self.assertEqual(json.loads(result["meal_plan_json"]), json.loads(expected))
+
+
+def full_day(name):
+    """Build a day object that passes validate_day()."""
+    meal = {"title": "Dish", "ingredients": "1 cup Rice", "instructions": "Cook"}
+    return {"day": name, "breakfast": meal, "lunch": meal, "dinner": meal,
+            "nutrition": {"calories": 1800}}
+
+
+class TestPlannerFanout(unittest.IsolatedAsyncioTestCase):
+    """Test cases for PLANNER_MODE "fanout"."""
+
+    @patch("agent.PLANNER_MODE", "fanout")
+    @patch("agent.render_schedule_tabs")
+    @patch("agent.st")
+    @patch("agent.get_llm")
+    async def test_days_written_concurrently_and_invalid_day_retried(
+        self, mock_get_llm, mock_st, mock_render
+    ):
+        """Test that days merge in outline order and only the bad day is re-requested."""
+        mock_st.status.return_value.__enter__.return_value = MagicMock()
+        outline = {"days": [{"day": "Monday", "dinner": "Tacos"},
+                            {"day": "Tuesday", "lunch": "Leftover tacos"}]}
+        day_requests = []
+
+        async def fake_ainvoke(node, runnable, inputs, model, temperature, template="", accept=None):
+            if node == "planner_skeleton":
+                return MagicMock(content=json.dumps(outline))
+            day_requests.append(inputs["input"])
+            if "Write Tuesday" in inputs["input"] and "rejected" not in inputs["input"]:
+                self.assertFalse(accept('{"day": "Tuesday"}'))  # Not cached for the retry
+                return MagicMock(content='{"day": "Tuesday"}')
+            name = "Monday" if "Write Monday" in inputs["input"] else "Tuesday"
+            return MagicMock(content="```json\n" + json.dumps(full_day(name)) + "\n```")
+
+        with patch.object(llm_cache, "ainvoke", side_effect=fake_ainvoke):
+            result = await planner_node({"messages": [MagicMock(content="Plan tacos")]})
+
+        schedule = json.loads(result["meal_plan_json"])["schedule"]
+        self.assertEqual([d["day"] for d in schedule], ["Monday", "Tuesday"])
+        self.assertEqual(schedule[1], full_day("Tuesday"))
+        self.assertEqual(len(day_requests), 3)
+        self.assertIn('"breakfast" needs a title', day_requests[2])
+        self.assertEqual(len(mock_render.call_args_list[-1].args[0]), 2)
+
+    @patch("agent.PLANNER_MODE", "fanout")
+    @patch("agent.render_schedule_tabs")
+    @patch("agent.st")
+    @patch("agent.get_llm")
+    async def test_unreadable_outline_falls_back_to_single_call(
+        self, mock_get_llm, mock_st, mock_render
+    ):
+        """Test that a bad outline falls back to the one-call plan."""
+        mock_st.status.return_value.__enter__.return_value = MagicMock()
+        mock_chain = MagicMock()
+        mock_chain.astream = stream_of(json.dumps({"schedule": [full_day("Monday")]}))
+
+        # Neither prose nor an outline whose days have no names can be fanned out
+        for outline in ("Sorry", json.dumps({"days": [{"dinner": "Tacos"}]})):
+            mock_chain.astream = stream_of(json.dumps({"schedule": [full_day("Monday")]}))
+            with patch.object(llm_cache, "ainvoke", AsyncMock(return_value=MagicMock(content=outline))), \
+                    patch("agent.ChatPromptTemplate") as mock_template:
+                mock_template.from_messages.return_value.__or__ = MagicMock(return_value=mock_chain)
+                result = await planner_node({"messages": [MagicMock(content="Plan")]})
+
+            self.assertEqual(json.loads(result["meal_plan_json"])["schedule"], [full_day("Monday")])
+
+    @patch("agent.PLANNER_MODE", "fanout")
+    @patch("agent.PLANNER_DAY_RETRIES", 0)
+    @patch("agent.render_schedule_tabs")
+    @patch("agent.st")
+    @patch("agent.get_llm")
+    async def test_failed_day_is_named_and_filled_from_outline(
+        self, mock_get_llm, mock_st, mock_render
+    ):
+        """Test that a day still invalid after retries gets its name and outline meals."""
+        mock_st.status.return_value.__enter__.return_value = MagicMock()
+        outline = {"days": [{"day": "Monday", "breakfast": "Oats", "dinner": "Tacos"}]}
+        bad_day = {"day": "Tuesday", "lunch": {"title": "Soup", "ingredients": "1 can soup"}}
+
+        async def fake_ainvoke(node, runnable, inputs, model, temperature, template="", accept=None):
+            return MagicMock(content=json.dumps(outline if node == "planner_skeleton" else bad_day))
+
+        with patch.object(llm_cache, "ainvoke", side_effect=fake_ainvoke):
+            result = await planner_node({"messages": [MagicMock(content="Plan")]})
+
+        day = json.loads(result["meal_plan_json"])["schedule"][0]
+        self.assertEqual(day["day"], "Monday")
+        self.assertEqual(day["breakfast"]["title"], "Oats")
+        self.assertEqual(day["lunch"], bad_day["lunch"])
+        self.assertEqual(day["dinner"]["title"], "Tacos")
+
+    def test_validate_day(self):
+        """Test that missing meals, ingredients and nutrition are reported."""
+        self.assertEqual(validate_day(full_day("Monday"), "monday"), [])
+        day = full_day("Tuesday")
+        day["dinner"] = {"title": "Soup", "ingredients": ""}
+        del day["nutrition"]
+        self.assertEqual(
+            validate_day(day, "Monday"),
+            ['"day" must be "Monday"', '"dinner" needs ingredients',
+             '"nutrition" needs numeric calories'],
+        )
+        self.assertEqual(validate_day(["not", "a", "day"], "Monday"),
+                         ["the reply was not a JSON object"])
+
+
+class TestScheduleStreamParser(unittest.TestCase):
+    """Test cases for ScheduleStreamParser."""
+
+    def test_days_complete_one_character_at_a_time(self):
+        """Test that days are emitted exactly when their object closes."""
+        text = json.dumps(
+            {"schedule": [{"day": "Mon", "note": "quote \" and } brace"}, {"day": "Tue"}],
+             "extra": {"day": "not a day"}}
+        )
+        parser = ScheduleStreamParser()
+        emitted = []
+        for ch in text:
+            emitted.extend(day["day"] for day in parser.feed(ch))
+        self.assertEqual(emitted, ["Mon", "Tue"])
+        self.assertEqual(parser.buffer, text)
+        self.assertEqual(parser.days[0]["note"], 'quote " and } brace')
 
 
 class TestExtractorNode(unittest.IsolatedAsyncioTestCase):
     """Test cases for extractor_node."""
 
+    @patch.dict(llm_cache.nodes, {"extractor": False})
+    @patch("agent.EXTRACTOR_MODE", "llm")
     @patch("agent.st")
     @patch("agent.db")
-    @patch("agent.ChatGoogleGenerativeAI")
-    async def test_extractor_node_basic(self, mock_llm_class, mock_db, mock_st):
-        """Test extractor node with basic shopping list."""
+    @patch("agent.get_llm")
+    async def test_extractor_node_basic(self, mock_get_llm, mock_db, mock_st):
+        """Test extractor node with basic shopping list from the LLM."""
         # Mock Streamlit
         mock_status = MagicMock()
         mock_st.status.return_value.__enter__.return_value = mock_status
 
         # Mock database
-        mock_db.get_all_past_items.return_value = "Eggs, Milk"
+        mock_db.get_relevant_past_items.return_value = ["Eggs", "Milk"]
 
         # Mock LLM response
         mock_llm = AsyncMock()
@@ -103,7 +278,7 @@ class TestExtractorNode(unittest.IsolatedAsyncioTestCase):
         
         mock_chain = AsyncMock()
         mock_chain.ainvoke.return_value = mock_response
-        mock_llm_class.return_value = mock_llm
+        mock_get_llm.return_value = mock_llm
 
         state = {
             "meal_plan_json": json.dumps({"schedule": []}),
@@ -122,6 +297,370 @@ class TestExtractorNode(unittest.IsolatedAsyncioTestCase):
         self.assertIn("Bread", result["shopping_list"])
         self.assertIn("Butter", result["shopping_list"])
 
+        # Only the relevant history reaches the prompt
+        self.assertEqual(mock_chain.ainvoke.call_args[0][0]["history"], "Eggs, Milk")
+        self.assertEqual(result["run_stats"]["extractor"]["history_items"], 2)
+
+    @patch.dict(llm_cache.nodes, {"extractor": False})
+    @patch("agent.EXTRACTOR_MODE", "local")
+    @patch("agent.st")
+    @patch("agent.get_llm")
+    async def test_extractor_node_local(self, mock_get_llm, mock_st):
+        """Test that the local parser sums the week and asks the LLM only about odd lines."""
+        mock_st.status.return_value.__enter__.return_value = MagicMock()
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke.return_value = MagicMock(
+            content='[{"name": "chicken thighs", "quantity": 1, "unit": "lb"}]'
+        )
+        mock_get_llm.return_value = mock_llm
+        plan = {
+            "schedule": [
+                {"day": "Monday",
+                 "breakfast": {"ingredients": "2 Eggs, 1 cup Oats"},
+                 "dinner": {"ingredients": "Chicken thighs or tofu, 1 tbsp olive oil"}},
+                {"day": "Tuesday", "breakfast": {"ingredients": "3 large eggs, Salt to taste"}},
+            ]
+        }
+        state = {"meal_plan_json": json.dumps(plan), "pantry_items": "Salt, olive oil"}
+
+        result = await extractor_node(state)
+
+        self.assertEqual(result["shopping_list"], ["Egg (5)", "Oats (1 cup)", "Chicken Thigh (1 lb)"])
+        self.assertEqual(result["shopping_items"][0]["quantities"], [{"quantity": 5, "unit": "count"}])
+        mock_llm.ainvoke.assert_awaited_once()
+        self.assertIn("Chicken thighs or tofu", mock_llm.ainvoke.await_args.args[0][0].content)
+
+    @patch("agent.db")
+    def test_preferred_products_per_item(self, mock_db):
+        """Test that products bought for several items are listed once."""
+        mock_db.get_preferred_products.side_effect = lambda item, n: {
+            "peanut butter": [("Smuckers Peanut Butter", 4)],
+            "butter": [("Kerrygold Butter", 2), ("Smuckers Peanut Butter", 4)],
+        }.get(item, [])
+
+        self.assertEqual(
+            preferred_products(["peanut butter", "butter", "saffron"]),
+            [("Smuckers Peanut Butter", 4), ("Kerrygold Butter", 2)],
+        )
+
+
+class TestShopItem(unittest.IsolatedAsyncioTestCase):
+    """Test cases for shop_item."""
+
+    def _browser(self, options):
+        browser = MagicMock()
+        browser.lease_page.return_value.__aenter__.return_value = MagicMock()
+        browser.search_and_get_options = AsyncMock(return_value=options)
+        browser.add_item_by_asin = AsyncMock(
+            return_value={"status": "CONFIRMED", "signal": "cart_count"}
+        )
+        browser.add_specific_item = AsyncMock(
+            return_value={"status": "CONFIRMED", "signal": "cart_count"}
+        )
+        return browser
+
+    async def test_shop_item_adds_and_charges_budget(self):
+        """Test that a chosen option is added and its price committed."""
+        options = [
+            {
+                "index": 0,
+                "title": "Bananas",
+                "price_str": "$0.99",
+                "price": 0.99,
+                "asin": "B07ZQ4RQ8V",
+            },
+        ]
+        browser = self._browser(options)
+        llm = AsyncMock()
+        llm.ainvoke.return_value = MagicMock(content="0")
+        budget = BudgetTracker(0.0, 50.0)
+
+        result = await shop_item(browser, llm, "Bananas", "bananas", budget)
+
+        self.assertIn("Bananas", result["cart"])
+        self.assertEqual(result["confirmation"], "CONFIRMED")
+        self.assertAlmostEqual(budget.total, 0.99)
+        browser.add_item_by_asin.assert_awaited_once()
+        self.assertEqual(browser.add_item_by_asin.await_args.args[0], "B07ZQ4RQ8V")
+        browser.search_and_get_options.assert_awaited_once()
+
+    async def test_shop_item_failed_add_does_not_search_again(self):
+        """Test that a failed add is reported missing without a re-search."""
+        options = [{"index": 0, "title": "Milk", "price_str": "$3.49", "price": 3.49, "asin": "B0MILK"}]
+        browser = self._browser(options)
+        browser.add_item_by_asin.return_value = {"status": "FAILED", "signal": None}
+        llm = AsyncMock()
+        llm.ainvoke.return_value = MagicMock(content="0")
+        budget = BudgetTracker(0.0, 50.0)
+
+        result = await shop_item(browser, llm, "Milk", "milk", budget)
+
+        self.assertEqual(result["missing"], "Milk (Add failed)")
+        self.assertEqual(budget.total, 0.0)
+        browser.search_and_get_options.assert_awaited_once()
+
+    async def test_shop_item_bulk_queues_asin(self):
+        """Test that bulk mode queues the ASIN and charges the budget."""
+        options = [{"index": 0, "title": "Eggs", "price_str": "$5.49", "price": 5.49, "asin": "B0EGGS"}]
+        browser = self._browser(options)
+        llm = AsyncMock()
+        llm.ainvoke.return_value = MagicMock(content="0")
+        budget = BudgetTracker(0.0, 50.0)
+
+        result = await shop_item(browser, llm, "Eggs", "eggs", budget, bulk=True)
+
+        self.assertEqual(result["queued"]["asin"], "B0EGGS")
+        browser.queue_item.assert_called_once_with("B0EGGS")
+        browser.add_item_by_asin.assert_not_called()
+        self.assertAlmostEqual(budget.total, 5.49)
+
+    async def test_shop_item_budget_cut(self):
+        """Test that no search happens once the budget is spent."""
+        browser = self._browser([])
+        budget = BudgetTracker(60.0, 50.0)
+
+        result = await shop_item(browser, AsyncMock(), "Milk", "milk", budget)
+
+        self.assertEqual(result, {"missing": "Milk (Budget Cut)"})
+        browser.search_and_get_options.assert_not_called()
+
+    async def test_budget_is_charged_in_list_order(self):
+        """Test that a later item finishing first waits for the earlier ones."""
+        budget = BudgetTracker(0.0, 10.0)
+        charged = []
+
+        async def charge(pos, delay, price):
+            await asyncio.sleep(delay)
+            async with budget.turn(pos):
+                if not budget.exhausted():
+                    budget.total += price
+                    charged.append(pos)
+
+        async def skipped(pos):
+            await budget.release(pos)
+
+        # Item 2 is ready first but item 0 spends the budget; item 1 is never added
+        await asyncio.gather(charge(0, 0.02, 12.0), skipped(1), charge(2, 0.0, 3.0))
+
+        self.assertEqual(charged, [0])
+
+
+class TestBatchedSelection(unittest.IsolatedAsyncioTestCase):
+    """Test cases for batched option selection."""
+
+    OPTIONS = [
+        {"index": 0, "title": "Milk", "price_str": "$3.49", "price": 3.49, "asin": "B0MILK"},
+        {"index": 2, "title": "Oat Milk", "price_str": "$4.99", "price": 4.99, "asin": "B0OAT"},
+    ]
+
+    def test_parse_batch_choices(self):
+        """Test that only offered indices (or -1) are accepted."""
+        requests = [("Milk", "milk", self.OPTIONS)] * 3
+        choices = parse_batch_choices('```json\n{"1": 2, "2": 1, "3": -1}\n```', requests)
+        self.assertEqual(choices, {0: 2, 2: -1})
+
+    def test_parse_batch_choices_rejects_non_object(self):
+        """Test that a reply that is not a JSON object raises ValueError."""
+        with self.assertRaises(ValueError):
+            parse_batch_choices("[0, 1]", [("Milk", "milk", self.OPTIONS)])
+
+    def test_parse_choice(self):
+        """Test that a single selection reply must name an offered index or -1."""
+        self.assertEqual(parse_choice("Index: 2", self.OPTIONS), 2)
+        self.assertEqual(parse_choice("-1", self.OPTIONS), -1)
+        self.assertIsNone(parse_choice("1", self.OPTIONS))
+        self.assertIsNone(parse_choice("No idea", self.OPTIONS))
+
+    def test_parse_queries(self):
+        """Test that optimizer replies need exactly one query per list item."""
+        items = ["2 cups milk", "1 lb rice"]
+        self.assertEqual(
+            parse_queries('```json\n{"queries": ["milk", "rice"]}\n```', items), ["milk", "rice"]
+        )
+        self.assertIsNone(parse_queries('{"queries": ["milk"]}', items))
+        self.assertIsNone(parse_queries("milk, rice", items))
+
+    async def test_one_call_per_chunk(self):
+        """Test that a parsable reply covers the whole chunk in one call."""
+        llm = AsyncMock()
+        llm.ainvoke.return_value = MagicMock(content='{"1": 0, "2": 2}')
+        requests = [("Milk", "milk", self.OPTIONS), ("Oat milk", "oat milk", self.OPTIONS)]
+
+        choices = await choose_options_batched(llm, requests, batch_size=10)
+
+        self.assertEqual(choices, [0, 2])
+        self.assertEqual(llm.ainvoke.await_count, 1)
+
+    async def test_unparsable_chunk_falls_back_per_item(self):
+        """Test that a garbled batch reply is retried one item at a time."""
+        llm = AsyncMock()
+        llm.ainvoke.side_effect = [
+            MagicMock(content="Sure! Here are my picks."),
+            MagicMock(content="2"),
+            MagicMock(content="0"),
+        ]
+        requests = [("Oat milk", "oat milk", self.OPTIONS), ("Milk", "milk", self.OPTIONS)]
+
+        choices = await choose_options_batched(llm, requests, batch_size=10)
+
+        self.assertEqual(choices, [2, 0])
+        self.assertEqual(llm.ainvoke.await_count, 3)
+
+    async def test_failed_chunk_call_falls_back_per_item(self):
+        """Test that an error from the batch call itself is retried one item at a time."""
+        llm = AsyncMock()
+        llm.ainvoke.side_effect = [TimeoutError("deadline exceeded"), MagicMock(content="2")]
+
+        choices = await choose_options_batched(llm, [("Oat milk", "oat milk", self.OPTIONS)], 10)
+
+        self.assertEqual(choices, [2])
+
+    async def test_shop_batched_keeps_list_order(self):
+        """Test the search, select and add phases merge results in order."""
+        browser = MagicMock()
+        browser.lease_page.return_value.__aenter__.return_value = MagicMock()
+        browser.search_and_get_options = AsyncMock(side_effect=[self.OPTIONS, [], self.OPTIONS])
+        browser.add_item_by_asin = AsyncMock(
+            return_value={"status": "CONFIRMED", "signal": "cart_count"}
+        )
+        llm = AsyncMock()
+        llm.ainvoke.return_value = MagicMock(content='{"1": 0, "2": -1}')
+        budget = BudgetTracker(0.0, 50.0)
+        items = [("Milk", "milk"), ("Saffron", "Saffron"), ("Cream", "cream")]
+
+        with patch("agent.BULK_ADD_ENABLED", False):
+            results = await shop_batched(browser, llm, items, budget)
+
+        self.assertIn("Milk", results[0]["cart"])
+        self.assertEqual(results[1]["missing"], "Saffron")
+        self.assertEqual(results[2]["missing"], "Cream (No good match)")
+        self.assertEqual(llm.ainvoke.await_count, 1)
+        self.assertAlmostEqual(budget.total, 3.49)
+
+
+class TestPipelinedShopper(unittest.IsolatedAsyncioTestCase):
+    """Test cases for shop_pipelined."""
+
+    def _browser(self, results_by_query):
+        async def search(query, page=None):
+            await asyncio.sleep(0.01)
+            return results_by_query.get(query, [])
+
+        browser = MagicMock()
+        browser.max_pages = 2
+        browser.lease_page.return_value.__aenter__.return_value = MagicMock()
+        browser.search_and_get_options = AsyncMock(side_effect=search)
+        browser.add_item_by_asin = AsyncMock(
+            return_value={"status": "CONFIRMED", "signal": "cart_count"}
+        )
+        return browser
+
+    @staticmethod
+    def _option(title, price):
+        return {"index": 0, "title": title, "price_str": f"${price}", "price": price,
+                "asin": f"B0{title.upper()}"}
+
+    @patch("agent.BULK_ADD_ENABLED", False)
+    async def test_keeps_order_and_reports_stages(self):
+        """Test that results come back in list order with per-stage timings."""
+        browser = self._browser({
+            "milk": [self._option("Milk", 3.0)],
+            "eggs": [self._option("Eggs", 5.0)],
+            "bread": [self._option("Bread", 2.5)],
+        })
+
+        async def decide(messages, accept=None):
+            await asyncio.sleep(0.01)
+            return MagicMock(content="0")
+
+        llm = AsyncMock()
+        llm.ainvoke.side_effect = decide
+        budget = BudgetTracker(0.0, 50.0)
+        stages = {}
+        items = [("Milk", "milk"), ("Saffron", "Saffron"), ("Eggs", "eggs"), ("Bread", "bread")]
+
+        results = await shop_pipelined(browser, llm, items, budget, stage_stats=stages)
+
+        self.assertIn("Milk", results[0]["cart"])
+        self.assertEqual(results[1]["missing"], "Saffron")
+        self.assertIn("Eggs", results[2]["cart"])
+        self.assertIn("Bread", results[3]["cart"])
+        self.assertAlmostEqual(budget.total, 10.5)
+        self.assertEqual(stages["search"]["items"], 4)
+        self.assertEqual(stages["select"]["items"], 3)
+        self.assertEqual(stages["add"]["items"], 3)
+        self.assertIn("utilization", stages["add"])
+
+    @patch("agent.BULK_ADD_ENABLED", False)
+    async def test_budget_cut_stops_later_items(self):
+        """Test that items reaching the add stage after the budget is spent are cut."""
+        browser = self._browser({
+            "steak": [self._option("Steak", 45.0)],
+            "salmon": [self._option("Salmon", 20.0)],
+            "tuna": [self._option("Tuna", 4.0)],
+        })
+        llm = AsyncMock()
+        llm.ainvoke.return_value = MagicMock(content="0")
+        budget = BudgetTracker(0.0, 50.0)
+
+        results = await shop_pipelined(
+            browser, llm, [("Steak", "steak"), ("Salmon", "salmon"), ("Tuna", "tuna")], budget
+        )
+
+        self.assertIn("Steak", results[0]["cart"])
+        self.assertIn("cart", results[1])  # Under the limit when it was added
+        self.assertEqual(results[2], {"missing": "Tuna (Budget Cut)", "latency": ANY})
+        self.assertAlmostEqual(budget.total, 65.0)
+
+    @patch("agent.BULK_ADD_ENABLED", False)
+    async def test_adds_follow_list_order(self):
+        """Test that a slow choice early in the list is still charged before later ones."""
+        browser = self._browser({
+            "steak": [self._option("Steak", 45.0)],
+            "tuna": [self._option("Tuna", 10.0)],
+        })
+
+        async def decide(messages, accept=None):
+            await asyncio.sleep(0.05 if "Steak" in messages[0].content else 0)
+            return MagicMock(content="0")
+
+        llm = AsyncMock()
+        llm.ainvoke.side_effect = decide
+        budget = BudgetTracker(0.0, 50.0)
+
+        with patch("agent.PIPELINE_SELECT_WORKERS", 2):
+            results = await shop_pipelined(
+                browser, llm, [("Steak", "steak"), ("Tuna", "tuna")], budget
+            )
+
+        added = [call.args[0] for call in browser.add_item_by_asin.await_args_list]
+        self.assertEqual(added, ["B0STEAK", "B0TUNA"])
+        self.assertIn("cart", results[1])
+
+    @patch("agent.BULK_ADD_ENABLED", False)
+    async def test_failed_selection_does_not_stall(self):
+        """Test that an error while choosing one item marks it missing and the run ends."""
+        browser = self._browser({
+            "milk": [self._option("Milk", 3.0)],
+            "eggs": [self._option("Eggs", 5.0)],
+        })
+        ranker = MagicMock()
+        ranker.select.side_effect = [RuntimeError("bad option"), None]
+        llm = AsyncMock()
+        llm.ainvoke.return_value = MagicMock(content="0")
+
+        with patch("agent.PIPELINE_SELECT_WORKERS", 1), patch("agent.PIPELINE_QUEUE_DEPTH", 1):
+            results = await asyncio.wait_for(
+                shop_pipelined(
+                    browser, llm, [("Milk", "milk"), ("Eggs", "eggs")],
+                    BudgetTracker(0.0, 50.0), ranker=ranker,
+                ),
+                timeout=5,
+            )
+
+        self.assertEqual(results[0]["missing"], "Milk")
+        self.assertIn("Eggs", results[1]["cart"])
+
 
 if __name__ == "__main__":
     unittest.main()
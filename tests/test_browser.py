@@ -5,10 +5,21 @@ Note: These tests focus on testable logic like price parsing.
 Full browser automation would require integration tests with Playwright.
 """
 
+import asyncio
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from browser import AmazonFreshBrowser
+from browser import (
+    FRESH_STOREFRONT_PATH,
+    AmazonFreshBrowser,
+    BlockRules,
+    build_option,
+    cart_add_url,
+    first_signal,
+    parse_price,
+    reconcile_cart,
+    search_url,
+)
 
 
 class TestAmazonFreshBrowser(unittest.IsolatedAsyncioTestCase):
@@ -22,6 +33,8 @@ class TestAmazonFreshBrowser(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(browser.page)
         self.assertIsNone(browser.playwright)
         self.assertEqual(browser.session_file, "amazon_session.json")
+        self.assertEqual(browser.navigation, "url")
+        self.assertEqual(browser.service_url, "")
 
     @patch("browser.st")
     @patch("browser.async_playwright")
@@ -54,6 +67,134 @@ class TestAmazonFreshBrowser(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(browser.browser, mock_browser)
         self.assertEqual(browser.context, mock_context)
         self.assertEqual(browser.page, mock_page)
+        mock_playwright.chromium.launch.assert_awaited_once_with(
+            headless=False, slow_mo=0
+        )
+
+        # A later step on the same loop reuses the browser; Close saves the session
+        await browser.start()
+        mock_playwright.chromium.launch.assert_awaited_once()
+        await browser.close()
+        mock_context.storage_state.assert_awaited_once_with(path=browser.session_file)
+        mock_browser.close.assert_awaited_once()
+
+    @patch("browser.st")
+    @patch("browser.async_playwright")
+    async def test_start_attaches_to_service(self, mock_playwright_func, mock_st):
+        """Test that a service URL reuses the remote context and its open tab."""
+        mock_playwright = AsyncMock()
+        mock_page = AsyncMock()
+        mock_page.url = "https://www.amazon.com/alm/storefront"
+        mock_context = AsyncMock()
+        mock_context.pages = [mock_page]
+        mock_remote = MagicMock()
+        mock_remote.contexts = [mock_context]
+        mock_playwright.chromium.connect_over_cdp.return_value = mock_remote
+        mock_playwright_func.return_value.start = AsyncMock(return_value=mock_playwright)
+
+        browser = AmazonFreshBrowser()
+        browser.service_url = "http://127.0.0.1:9222"
+        await browser.start()
+        await browser.start()  # Same loop: no second connection
+
+        mock_playwright.chromium.connect_over_cdp.assert_awaited_once_with(
+            "http://127.0.0.1:9222"
+        )
+        mock_playwright.chromium.launch.assert_not_called()
+        self.assertIs(browser.page, mock_page)
+        mock_page.goto.assert_not_called()
+
+        await browser.close()
+        mock_remote.close.assert_not_called()
+        self.assertIsNone(browser.page)
+
+    async def test_lease_page_caps_pool_size(self):
+        """Test that lease_page opens pages lazily up to max_pages."""
+        browser = AmazonFreshBrowser(max_pages=2)
+        browser.page = MagicMock()
+        browser.pages = [browser.page]
+        browser._idle_pages = asyncio.Queue()
+        browser._idle_pages.put_nowait(browser.page)
+        browser.context = AsyncMock()
+        browser.context.new_page.side_effect = lambda: AsyncMock()
+
+        async with browser.lease_page() as first, browser.lease_page() as second:
+            self.assertIsNot(first, second)
+            # A new page starts on the storefront, where the search box lives
+            second.goto.assert_awaited_once_with(browser.base_url + FRESH_STOREFRONT_PATH)
+            # Pool is full and both pages are leased, so a third caller waits
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(browser.lease_page().__aenter__(), 0.05)
+
+        self.assertEqual(len(browser.pages), 2)
+        self.assertEqual(browser._idle_pages.qsize(), 2)
+
+    async def test_first_signal_skips_failed_waiters(self):
+        """Test that a timed-out waiter doesn't hide a later success."""
+        async def fail():
+            raise TimeoutError()
+
+        async def succeed_later():
+            await asyncio.sleep(0.01)
+
+        slow = asyncio.ensure_future(asyncio.sleep(10))
+        signal = await first_signal(
+            {
+                "network": asyncio.ensure_future(fail()),
+                "cart_count": asyncio.ensure_future(succeed_later()),
+                "stepper": slow,
+            },
+            timeout=1,
+        )
+        self.assertEqual(signal, "cart_count")
+        await asyncio.sleep(0)
+        self.assertTrue(slow.cancelled())
+
+    async def test_stepper_present_before_click_does_not_confirm(self):
+        """Test that a stepper already on the card isn't taken as proof of the add."""
+        browser = AmazonFreshBrowser()
+        page = MagicMock()
+        page.locator.return_value.first.count = AsyncMock(return_value=0)
+        page.wait_for_event = AsyncMock(side_effect=TimeoutError())
+        card = MagicMock()
+        stepper = card.locator.return_value.first
+        stepper.is_visible = AsyncMock(return_value=True)
+        stepper.wait_for = AsyncMock()
+
+        result = await browser._click_and_confirm(page, AsyncMock(), card)
+
+        self.assertEqual(result, {"status": "UNCONFIRMED", "signal": None})
+        stepper.wait_for.assert_not_called()
+
+        stepper.is_visible.return_value = False
+        result = await browser._click_and_confirm(page, AsyncMock(), card)
+        self.assertEqual(result, {"status": "CONFIRMED", "signal": "stepper"})
+
+    async def test_add_via_cart_url_reconciles_cart_page(self):
+        """Test that a URL add landing on the cart page is checked against the cart before."""
+        browser = AmazonFreshBrowser()
+        page = MagicMock()
+        page.goto = AsyncMock()
+        page.locator.return_value.count = AsyncMock(return_value=0)
+        # Cart read before the add, then the cart page the add URL lands on
+        page.evaluate = AsyncMock(side_effect=[{"B0BBB": 1}, {"B0AAA": 1, "B0BBB": 1}])
+
+        results = await browser._add_via_cart_url(page, [("B0AAA", 1), ("B0BBB", 1)])
+
+        self.assertEqual(results["B0AAA"], {"status": "CONFIRMED", "signal": "cart_page"})
+        # Already in the cart and its quantity didn't change
+        self.assertEqual(results["B0BBB"]["status"], "FAILED")
+        page.goto.assert_any_await(
+            cart_add_url([("B0AAA", 1), ("B0BBB", 1)], browser.base_url),
+            wait_until="domcontentloaded",
+        )
+
+    async def test_first_signal_times_out(self):
+        """Test that no signal within the timeout returns None."""
+        signal = await first_signal(
+            {"network": asyncio.ensure_future(asyncio.sleep(10))}, timeout=0.01
+        )
+        self.assertIsNone(signal)
 
     async def test_price_parsing_logic(self):
         """Test price string parsing logic (extracted from search_and_add)."""
@@ -72,5 +213,112 @@ class TestAmazonFreshBrowser(unittest.IsolatedAsyncioTestCase):
             self.assertEqual(result, expected, f"Failed for {price_str}")
 
 
+class TestOptionExtraction(unittest.TestCase):
+    """Test cases for turning extracted card payloads into options."""
+
+    def test_parse_price(self):
+        """Test price parsing for dollar amounts and junk text."""
+        self.assertEqual(parse_price("$1,234.56"), 1234.56)
+        self.assertEqual(parse_price("0.00"), 0.0)
+        self.assertEqual(parse_price(None), 0.0)
+        self.assertEqual(parse_price("$see options"), 0.0)
+
+    def test_search_url(self):
+        """Test that queries are encoded into a Fresh results URL."""
+        self.assertEqual(
+            search_url("whole milk 1/2 gal"),
+            "https://www.amazon.com/s?k=whole+milk+1%2F2+gal&i=amazonfresh",
+        )
+
+    def test_cart_add_url(self):
+        """Test that the cart-add URL numbers each ASIN/quantity pair."""
+        self.assertEqual(
+            cart_add_url([("B0AAA", 1), ("B0BBB", 3)], "http://127.0.0.1:8765"),
+            "http://127.0.0.1:8765/gp/aws/cart/add.html"
+            "?ASIN.1=B0AAA&Quantity.1=1&ASIN.2=B0BBB&Quantity.2=3",
+        )
+
+    def test_queue_item_accumulates(self):
+        """Test that queueing the same ASIN twice adds up the quantity."""
+        browser = AmazonFreshBrowser()
+        browser.queue_item("B0AAA")
+        browser.queue_item("B0BBB", 2)
+        browser.queue_item("B0AAA")
+        self.assertEqual(browser.cart_queue, {"B0AAA": 2, "B0BBB": 2})
+
+    def test_reconcile_cart(self):
+        """Test that only ASINs whose quantity grew by the requested amount confirm."""
+        results = reconcile_cart(
+            [("B0AAA", 1), ("B0BBB", 2), ("B0CCC", 1), ("B0DDD", 1)],
+            {"B0DDD": 1},
+            {"B0AAA": 1, "B0BBB": 1, "B0DDD": 1},
+        )
+        self.assertEqual(results["B0AAA"]["status"], "CONFIRMED")
+        self.assertEqual(results["B0BBB"]["status"], "FAILED")
+        self.assertEqual(results["B0CCC"]["status"], "FAILED")
+        # Already in the cart before the run, and the add didn't change it
+        self.assertEqual(results["B0DDD"]["status"], "FAILED")
+
+    def test_reconcile_unreadable_cart(self):
+        """Test that an unreadable cart leaves adds unconfirmed rather than confirmed."""
+        self.assertEqual(reconcile_cart([("B0AAA", 1)], {}, None)["B0AAA"]["status"], "UNCONFIRMED")
+        self.assertEqual(
+            reconcile_cart([("B0AAA", 1)], None, {"B0AAA": 1})["B0AAA"]["status"], "UNCONFIRMED"
+        )
+
+    def test_build_option(self):
+        """Test that a raw card keeps the existing option-dict format."""
+        raw = {
+            "asin": "B07ZQ4RQ8V",
+            "title": "  Banana Bunch (4-5 Count) ",
+            "price": "$0.99",
+            "rating": "4.5 out of 5 stars",
+            "reviews": "48,312",
+            "can_add": True,
+        }
+        option = build_option(2, raw)
+        self.assertEqual(option["index"], 2)
+        self.assertEqual(option["title"], "Banana Bunch (4-5 Count)")
+        self.assertEqual(option["price_str"], "$0.99")
+        self.assertEqual(option["price"], 0.99)
+        self.assertEqual(option["rating"], "4.5 out of 5 stars")
+        self.assertEqual(option["reviews"], "48,312")
+        self.assertEqual(option["asin"], "B07ZQ4RQ8V")
+        self.assertTrue(option["available"])
+
+    def test_build_option_defaults(self):
+        """Test defaults for missing fields and skipping untitled cards."""
+        option = build_option(0, {"title": "Plantains"})
+        self.assertEqual(option["price_str"], "0.00")
+        self.assertEqual(option["rating"], "N/A")
+        self.assertEqual(option["reviews"], "0")
+        self.assertIsNone(build_option(1, {"title": None}))
+
+
+class TestBlockRules(unittest.TestCase):
+    """Test cases for request-blocking rules."""
+
+    def setUp(self):
+        self.rules = BlockRules(
+            {"resource_types": ["image", "font"], "url_patterns": [r"doubleclick\.net"]},
+            [r"/cart", r"[Aa]dd[-_]?[Tt]o[-_]?[Cc]art"],
+        )
+
+    def test_blocks_profile_matches(self):
+        """Test that listed resource types and URL patterns are blocked."""
+        self.assertTrue(self.rules.should_block("image", "https://m.media-amazon.com/x.jpg"))
+        self.assertTrue(self.rules.should_block("script", "https://ad.doubleclick.net/tag.js"))
+        self.assertFalse(self.rules.should_block("document", "https://www.amazon.com/s?k=milk"))
+
+    def test_allowlist_wins(self):
+        """Test that cart and add-to-cart traffic is never blocked."""
+        self.assertFalse(self.rules.should_block("image", "https://www.amazon.com/cart/icon.png"))
+        self.assertFalse(self.rules.should_block("xhr", "https://www.amazon.com/addToCart?asin=B0"))
+
+    def test_off_profile_is_falsy(self):
+        """Test that an empty profile installs no route."""
+        self.assertFalse(BlockRules({"resource_types": [], "url_patterns": []}, []))
+
+
 if __name__ == "__main__":
     unittest.main()
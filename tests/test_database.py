@@ -2,12 +2,34 @@
 Unit tests for database.py
 """
 
+import glob
 import json
 import os
+import sqlite3
 import tempfile
+import threading
+import time
 import unittest
+from unittest.mock import patch
 
-from database import DBManager
+from database import DBManager, normalize_query
+
+
+def write_legacy_db(path, *statements):
+    """Replace the file at path with an unversioned database built by (sql, rows) pairs."""
+    os.unlink(path)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE meal_plans (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, "
+        "prompt TEXT, plan_json TEXT, shopping_list TEXT)"
+    )
+    for sql, rows in statements:
+        if rows is None:
+            conn.execute(sql)
+        else:
+            conn.executemany(sql, rows)
+    conn.commit()
+    conn.close()
 
 
 class TestDBManager(unittest.TestCase):
@@ -20,9 +42,10 @@ class TestDBManager(unittest.TestCase):
         self.db = DBManager(self.temp_db.name)
 
     def tearDown(self):
-        """Clean up the temporary database."""
-        self.db.conn.close()
-        os.unlink(self.temp_db.name)
+        """Clean up the temporary database and any pre-migration backups."""
+        self.db.close()
+        for path in [self.temp_db.name, *glob.glob(f"{self.temp_db.name}.v*.bak")]:
+            os.unlink(path)
 
     def test_save_and_get_setting(self):
         """Test saving and retrieving settings."""
@@ -68,6 +91,22 @@ class TestDBManager(unittest.TestCase):
         self.db.delete_all_plans()
         plans = self.db.get_recent_plans()
         self.assertEqual(len(plans), 0)
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0], 0)
+
+    def test_delete_plan_removes_unused_prompts(self):
+        """Test that a prompt is kept while any plan uses it and removed with the last."""
+        self.db.save_plan("Shared", "{}", [])
+        self.db.save_plan("Shared", "{}", [])
+        self.db.save_plan("Own", "{}", [])
+        first, second, own = sorted(p["id"] for p in self.db.list_plans())
+
+        self.db.delete_plan(own)
+        self.db.delete_plan(first)
+        prompts = self.db.conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        self.assertEqual(prompts, 1)
+        self.assertEqual(self.db.get_plan(second)["prompt"], "Shared")
+        self.db.delete_plan(second)
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0], 0)
 
     def test_get_all_past_items(self):
         """Test retrieving all unique past items."""
@@ -80,6 +119,298 @@ class TestDBManager(unittest.TestCase):
         self.assertIn("Bread", items)
         self.assertIn("Milk", items)
 
+    def test_get_relevant_past_items(self):
+        """Test that only history matching this week's ingredients is returned."""
+        self.db.save_plan("Plan 1", "{}", ["Smuckers Peanut Butter", "Bread", "Milk"])
+        self.assertEqual(len(self.db.history_index), 3)
+        # Saved after the index was built, so it must be added incrementally
+        self.db.save_plan("Plan 2", "{}", ["Kerrygold Butter", "Milk"])
+
+        result = self.db.get_relevant_past_items(["2 tbsp peanut butter", "1 cup milk"], 2)
+        self.assertEqual(result, ["Milk", "Smuckers Peanut Butter"])
+        self.assertEqual(self.db.get_relevant_past_items(["2 eggs"], 5), [])
+
+    def test_delete_plan_updates_past_items(self):
+        """Test that deleting a plan forgets items only it contained."""
+        self.db.save_plan("Plan 1", "{}", ["Eggs", "Bread"])
+        self.db.save_plan("Plan 2", "{}", ["Eggs"])
+        self.db.delete_plan(self.db.get_recent_plans()[1]["id"])
+        self.assertEqual(self.db.get_all_past_items(), "Eggs")
+        self.assertEqual(self.db.get_relevant_past_items(["bread"], 5), [])
+
+    def test_item_frequencies_group_by_product(self):
+        """Test that differently written entries of one product count together."""
+        self.db.save_plan("Plan 1", "{}", ["Eggs", "Chicken Breast (1.5 lb)"])
+        self.db.save_plan("Plan 2", "{}", ["Egg (6)", "Bread"])
+        self.db.save_plan("Plan 3", "{}", ["2 lbs chicken breasts", "Eggs"])
+
+        self.assertEqual(
+            self.db.get_item_frequencies(2), [("egg", 3), ("chicken breast", 2)]
+        )
+        plan_ids = [p["id"] for p in self.db.get_recent_plans()]
+        self.assertEqual(self.db.get_plans_with_item("chicken breast"), [plan_ids[0], plan_ids[2]])
+        self.assertEqual(self.db.get_recent_plans()[1]["list"], ["Egg (6)", "Bread"])
+
+    def test_list_plans_pages_by_id(self):
+        """Test that plans are listed newest first, a page at a time, without contents."""
+        for n in range(5):
+            self.db.save_plan(f"Plan {n}", "{}", ["Eggs"] * n)
+
+        first = self.db.list_plans(limit=2)
+        self.assertEqual([p["item_count"] for p in first], [4, 3])
+        self.assertEqual(set(first[0]), {"id", "date", "item_count"})
+        second = self.db.list_plans(before_id=first[-1]["id"], limit=2)
+        third = self.db.list_plans(before_id=second[-1]["id"], limit=2)
+        self.assertEqual([p["item_count"] for p in second + third], [2, 1, 0])
+
+        plan = self.db.get_plan(first[0]["id"])
+        self.assertEqual((plan["prompt"], plan["list"]), ("Plan 4", ["Eggs"] * 4))
+        self.assertIsNone(self.db.get_plan(-1))
+
+    def test_legacy_shopping_lists_are_migrated_once(self):
+        """Test that JSON shopping lists from older databases move into plan_items."""
+        self.db.close()
+        write_legacy_db(
+            self.temp_db.name,
+            ("INSERT INTO meal_plans (date, prompt, plan_json, shopping_list) VALUES (?, ?, ?, ?)",
+             [("2024-01-01 10:00", "Old", "{}", json.dumps(["Milk", "Eggs"])),
+              ("2024-01-08 10:00", "Old", "{}", "not json")]),
+        )
+
+        self.db = DBManager(self.temp_db.name)
+        self.assertEqual(self.db.get_recent_plans()[1]["list"], ["Milk", "Eggs"])
+        self.assertEqual([p["item_count"] for p in self.db.list_plans()], [0, 2])
+        self.db.close()
+        self.db = DBManager(self.temp_db.name)  # A second start must not duplicate rows
+        count = self.db.conn.execute("SELECT COUNT(*) FROM plan_items").fetchone()[0]
+        self.assertEqual(count, 2)
+        # Older builds still read the legacy column, including for new plans
+        self.db.save_plan("New", "{}", ["Bread"])
+        legacy = self.db.conn.execute("SELECT shopping_list FROM meal_plans ORDER BY id").fetchall()
+        self.assertEqual([row[0] for row in legacy],
+                         [json.dumps(["Milk", "Eggs"]), "not json", json.dumps(["Bread"])])
+
+    @patch("database.DB_COMPRESS_TEXT", True)
+    def test_schema_migrations_dedupe_prompts_and_compress_plans(self):
+        """Test that an unversioned file is upgraded once and its texts read back unchanged."""
+        long_prompt = "Plan healthy dinners for two. " * 80
+        plan_json = json.dumps({"schedule": [{"day": "Monday", "notes": "Cook rice. " * 200}]})
+        self.db.close()
+        write_legacy_db(
+            self.temp_db.name,
+            ("INSERT INTO meal_plans (date, prompt, plan_json) VALUES (?, ?, ?)",
+             [("2024-01-01 10:00", long_prompt, plan_json), ("2024-01-08 10:00", long_prompt, "{}")]),
+        )
+
+        self.db = DBManager(self.temp_db.name)
+        self.db.save_plan(long_prompt, plan_json, ["Rice"])
+        self.db.save_plan("Short prompt", "{}", [])
+
+        self.assertEqual(self.db.schema_version, len(DBManager.MIGRATIONS))
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0], 2)
+        # The file as it was before migrating is kept for rollback
+        backup = sqlite3.connect(f"{self.temp_db.name}.v0.bak")
+        self.assertEqual(backup.execute("SELECT prompt FROM meal_plans").fetchall(),
+                         [(long_prompt,), (long_prompt,)])
+        backup.close()
+        stored = self.db.conn.execute("SELECT plan_json FROM meal_plans ORDER BY id").fetchall()
+        self.assertEqual([type(row[0]) for row in stored], [bytes, str, bytes, str])
+        plans = self.db.get_recent_plans(4)
+        self.assertEqual([p["prompt"] for p in plans], ["Short prompt"] + [long_prompt] * 3)
+        self.assertEqual(self.db.get_plan(plans[1]["id"])["json"], plan_json)
+
+    def test_perf_baselines_move_to_telemetry(self):
+        """Test that latency and selection baselines kept in settings become telemetry rows."""
+        self.db.close()
+        write_legacy_db(
+            self.temp_db.name,
+            ("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)", None),
+            ("INSERT INTO settings VALUES (?, ?)",
+             [("item_latency_url", "4.250"), ("daily_budget", "100"),
+              ("selection_stats_batched", json.dumps({"llm_calls": 2, "run_seconds": 9.5}))]),
+        )
+
+        self.db = DBManager(self.temp_db.name)
+        self.assertEqual(self.db.get_setting("item_latency_url", ""), "")
+        self.assertEqual(self.db.get_setting("daily_budget"), "100")
+        self.assertEqual(self.db.get_last_telemetry("shopper.item_avg.url")["seconds"], 4.25)
+        self.assertIsNone(self.db.get_last_telemetry("shopper.item_avg.searchbox"))
+        selection = self.db.get_last_telemetry("shopper.selection.batched")
+        self.assertEqual(selection["seconds"], 9.5)
+        self.assertEqual(selection["details"], {"llm_calls": 2, "run_seconds": 9.5})
+        self.assertEqual(self.db.get_setting("selection_stats_batched", ""), "")
+
+    @patch("database.DB_COMPRESS_TEXT", False)
+    def test_compression_can_be_turned_off(self):
+        """Test that plans are stored as plain text when compression is disabled."""
+        plan_json = json.dumps({"notes": "Cook rice. " * 200})
+        self.db.save_plan("Prompt", plan_json, [])
+        stored = self.db.conn.execute("SELECT plan_json FROM meal_plans").fetchone()[0]
+        self.assertEqual(stored, plan_json)
+
+    def test_get_purchase_history(self):
+        """Test that purchase history is returned most bought first."""
+        self.db.conn.executemany(
+            "INSERT INTO purchase_history (item_name, count) VALUES (?, ?)",
+            [("Banana Bunch (4-5 Count)", 1), ("Amazon Grocery, Yellow Onions, 3 Lb", 4)],
+        )
+        history = self.db.get_purchase_history()
+        self.assertEqual(history[0], ("Amazon Grocery, Yellow Onions, 3 Lb", 4))
+        self.assertEqual(len(history), 2)
+
+    def test_record_purchases_and_preferred_products(self):
+        """Test that purchases are counted, timestamped and found by their words."""
+        self.db.record_purchases(["Smucker's Natural Creamy Peanut Butter, 16 Ounces"], when=100.0)
+        self.db.record_purchases(
+            ["Smucker's Natural Creamy Peanut Butter, 16 Ounces", "Kerrygold Pure Irish Butter"],
+            when=200.0,
+        )
+        self.db.record_purchases(["Kerrygold Pure Irish Butter"], when=300.0)
+        self.db.record_purchases(["Land O Lakes Salted Butter"], when=400.0)
+
+        row = self.db.conn.execute(
+            "SELECT count, last_purchased FROM purchase_history WHERE item_name LIKE 'Smucker%'"
+        ).fetchone()
+        self.assertEqual(row, (2, 200.0))
+        self.assertEqual(
+            self.db.get_preferred_products("2 tbsp peanut butter", 1),
+            [("Smucker's Natural Creamy Peanut Butter, 16 Ounces", 2)],
+        )
+        # Same words and count: the more recent purchase wins
+        self.assertEqual(
+            [name for name, _ in self.db.get_preferred_products("Butter", 3)],
+            ["Kerrygold Pure Irish Butter", "Smucker's Natural Creamy Peanut Butter, 16 Ounces",
+             "Land O Lakes Salted Butter"],
+        )
+        self.assertEqual(self.db.get_preferred_products("saffron"), [])
+
+    def test_imported_purchases_are_indexed_on_start(self):
+        """Test that purchase_history rows from older imports become searchable."""
+        self.db.close()
+        write_legacy_db(
+            self.temp_db.name,
+            ("CREATE TABLE purchase_history (item_name TEXT PRIMARY KEY, count INTEGER DEFAULT 1)", None),
+            ("INSERT INTO purchase_history VALUES (?, ?)", [("Banana Bunch (4-5 Count)", 3)]),
+        )
+
+        self.db = DBManager(self.temp_db.name)
+        self.assertEqual(self.db.get_preferred_products("bananas"), [("Banana Bunch (4-5 Count)", 3)])
+
+    def test_purchase_terms_are_reindexed(self):
+        """Test that terms written by the old history tokenizer are rebuilt on upgrade."""
+        self.db.record_purchases(["Smucker's Peanut Butter"])
+        self.db.close()
+        # A file at migration 4, indexed by the old tokenizer that kept the apostrophe
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("UPDATE purchase_terms SET term=? WHERE term=?", ("smucker's", "smucker"))
+        conn.execute("PRAGMA user_version=4")
+        conn.commit()
+        conn.close()
+
+        self.db = DBManager(self.temp_db.name)
+        self.assertEqual(self.db.get_preferred_products("Smuckers"), [("Smucker's Peanut Butter", 1)])
+
+    def test_concurrent_sessions(self):
+        """Test that many threads reading and writing at once lose nothing."""
+        errors = []
+
+        def session(n):
+            try:
+                for i in range(10):
+                    self.db.save_setting(f"budget-{n}", str(i))
+                    self.db.save_plan(f"Plan {n}-{i}", "{}", ["Eggs", f"Item {n}"])
+                    self.db.save_telemetry(
+                        {"thread_id": str(n), "operation": "node.shopper", "model": "",
+                         "seconds": 0.1, "input_tokens": 0, "output_tokens": 0,
+                         "retries": 0, "cache_hit": False, "ok": True},
+                        max_rows=1000,
+                    )
+                    self.db.get_recent_plans()
+                    self.db.get_relevant_past_items(["2 eggs"], 5)
+            except Exception as e:  # Surfaced by the assertion below
+                errors.append(e)
+
+        threads = [threading.Thread(target=session, args=(n,)) for n in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.db.get_item_frequencies(1), [("egg", 160)])
+        self.assertEqual(self.db.get_setting("budget-15"), "9")
+        self.assertEqual(len(self.db.get_telemetry()), 160)
+        self.assertEqual(self.db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        stats = self.db.write_stats
+        self.assertLess(stats["commits"], stats["writes"])  # Concurrent writes shared commits
+
+    def test_failed_write_keeps_its_batch(self):
+        """Test that a failing write raises without undoing others."""
+        with self.assertRaises(Exception):
+            self.db._write(lambda c: c.execute("INSERT INTO no_such_table VALUES (1)"))
+        self.db.save_setting("budget", "150.0")
+        self.assertEqual(self.db.get_setting("budget"), "150.0")
+
+
+class TestSearchCache(unittest.TestCase):
+    """Test cases for the persistent search-result cache."""
+
+    OPTIONS = [{"index": 0, "title": "Banana Bunch", "price": 0.99, "asin": "B07ZQ4RQ8V"}]
+
+    def setUp(self):
+        """Set up a temporary database for testing."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.db = DBManager(self.temp_db.name)
+
+    def tearDown(self):
+        """Clean up the temporary database."""
+        self.db.close()
+        os.unlink(self.temp_db.name)
+
+    def test_normalize_query(self):
+        """Test that case, punctuation and spacing don't change the key."""
+        self.assertEqual(normalize_query("  Bananas,  Organic! "), "bananas organic")
+        self.assertEqual(normalize_query("Half-and-Half"), normalize_query("half and half"))
+
+    def test_cache_round_trip(self):
+        """Test that stored options come back for an equivalent query."""
+        self.db.save_cached_search("Bananas", self.OPTIONS, max_entries=10)
+        self.db.flush()  # Cache writes don't wait for their commit
+        cached = self.db.get_cached_search("  bananas ", ttl_seconds=60)
+        self.assertEqual(cached["options"], self.OPTIONS)
+        self.assertIsNone(cached["chosen_asin"])
+        self.assertIsNone(self.db.get_cached_search("apples", ttl_seconds=60))
+
+    def test_cache_expires(self):
+        """Test that entries older than the TTL are misses."""
+        self.db.save_cached_search("Bananas", self.OPTIONS, max_entries=10)
+        self.db.flush()
+        with patch("database.time.time", return_value=time.time() + 120):
+            self.assertIsNone(self.db.get_cached_search("bananas", ttl_seconds=60))
+
+    def test_cache_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is evicted past max_entries."""
+        with patch("database.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+            self.db.save_cached_search("apples", self.OPTIONS, max_entries=2)
+            self.db.save_cached_search("bananas", self.OPTIONS, max_entries=2)
+            self.db.flush()
+            self.db.get_cached_search("apples", ttl_seconds=1e12)  # touch apples
+            self.db.save_cached_search("cherries", self.OPTIONS, max_entries=2)
+        self.db.flush()
+
+        self.assertIsNotNone(self.db.get_cached_search("apples", ttl_seconds=1e12))
+        self.assertIsNone(self.db.get_cached_search("bananas", ttl_seconds=1e12))
+        self.assertIsNotNone(self.db.get_cached_search("cherries", ttl_seconds=1e12))
+
+    def test_save_search_choice(self):
+        """Test that the chosen ASIN is remembered for the query."""
+        self.db.save_cached_search("Bananas", self.OPTIONS, max_entries=10)
+        self.db.save_search_choice("bananas", "B07ZQ4RQ8V")
+        self.db.flush()
+        cached = self.db.get_cached_search("BANANAS", ttl_seconds=60)
+        self.assertEqual(cached["chosen_asin"], "B07ZQ4RQ8V")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,82 @@
+"""
+Unit tests for benchmarks/fake_fresh_server.py
+"""
+
+import json
+import unittest
+import urllib.error
+import urllib.request
+
+from benchmarks.fake_fresh_server import product_for, start_in_thread
+
+
+class TestFakeFreshServer(unittest.TestCase):
+    """Test cases for the offline Amazon Fresh stand-in."""
+
+    def setUp(self):
+        """Start a stand-in server on a free port."""
+        self.server, self.base_url = start_in_thread()
+
+    def tearDown(self):
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, path, method="GET"):
+        request = urllib.request.Request(self.base_url + path, method=method)
+        with urllib.request.urlopen(request) as response:
+            return response.read().decode("utf-8")
+
+    def test_search_page_uses_browser_selectors(self):
+        """Test that search results carry the selectors browser.py reads."""
+        page = self._get("/s?k=bananas&i=amazonfresh")
+        self.assertIn('id="twotabsearchtextbox"', page)
+        self.assertEqual(page.count('data-component-type="s-search-result"'), 8)
+        self.assertIn("name=\"submit.addToCart\"", page)
+        self.assertIn('class="a-offscreen"', page)
+        self.assertIn(product_for("bananas", 0)["asin"], page)
+
+    def test_products_are_deterministic(self):
+        """Test that the same query always yields the same products."""
+        self.assertEqual(product_for("Milk", 2), product_for("milk", 2))
+        self.assertNotEqual(product_for("milk", 0)["asin"], product_for("milk", 1)["asin"])
+
+    def test_add_to_cart_updates_cart_page(self):
+        """Test that adds show up in the cart badge and cart page."""
+        asin = product_for("eggs", 0)["asin"]
+        self._get("/s?k=eggs")
+        reply = json.loads(self._get(f"/cart/add-to-cart?asin={asin}&qty=2", "POST"))
+        self.assertEqual(reply["count"], 2)
+
+        cart = self._get("/gp/cart/view.html")
+        self.assertIn(f'data-asin="{asin}" data-quantity="2"', cart)
+        self.assertIn('<span id="nav-cart-count">2</span>', cart)
+        self.assertIn("proceedToALMCheckout-QW1hem9uIEZyZXNo", cart)
+
+    def test_cart_add_url_needs_confirmation(self):
+        """Test that URL adds show a Continue form and add only on POST."""
+        query = "ASIN.1=B0AAA&Quantity.1=1&ASIN.2=B0BBB&Quantity.2=2"
+        confirm = self._get(f"/gp/aws/cart/add.html?{query}")
+        self.assertIn('name="add"', confirm)
+        self.assertEqual(self.server.state.cart_count(), 0)
+
+        cart = self._get(f"/gp/aws/cart/add.html?{query}", "POST")
+        self.assertIn('data-asin="B0AAA" data-quantity="1"', cart)
+        self.assertIn('data-asin="B0BBB" data-quantity="2"', cart)
+
+    def test_failure_injection(self):
+        """Test that fail_rate=1 answers every request with a 503."""
+        self.server.state.fail_rate = 1.0
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self._get("/s?k=bananas")
+        self.assertEqual(ctx.exception.code, 503)
+
+    def test_empty_results_injection(self):
+        """Test that empty_rate=1 returns a results page with no cards."""
+        self.server.state.empty_rate = 1.0
+        page = self._get("/s?k=bananas")
+        self.assertNotIn("s-search-result", page)
+
+
+if __name__ == "__main__":
+    unittest.main()
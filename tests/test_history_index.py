@@ -0,0 +1,31 @@
+"""
+Unit tests for history_index.py
+"""
+
+import unittest
+
+from history_index import HistoryIndex
+
+
+class TestHistoryIndex(unittest.TestCase):
+    """Test cases for HistoryIndex."""
+
+    def test_search_prefers_rare_matching_words(self):
+        """Test that a distinctive word outweighs a common one."""
+        index = HistoryIndex(
+            [("Smuckers Peanut Butter", 1), ("Kerrygold Butter", 3), ("Butter Lettuce", 1)]
+        )
+        self.assertEqual(index.search(["peanut butter"], 1), ["Smuckers Peanut Butter"])
+        self.assertEqual(index.search(["peanut butter", "eggs"], 10)[0], "Smuckers Peanut Butter")
+        self.assertEqual(index.search(["eggs"], 10), [])
+
+    def test_ties_go_to_more_bought_item(self):
+        """Test that equal scores are broken by purchase count."""
+        index = HistoryIndex([("Oat Milk", 1), ("Whole Milk", 1)])
+        index.add("Whole Milk", 2)
+        self.assertEqual(index.search(["milk"], 2), ["Whole Milk", "Oat Milk"])
+        self.assertEqual(len(index), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Unit tests for ingredients.py
+"""
+
+import json
+import unittest
+
+from ingredients import (
+    consolidate,
+    parse_line,
+    parse_llm_items,
+    parse_number,
+    parse_plan,
+    split_ingredients,
+    subtract_pantry,
+)
+
+
+class TestIngredients(unittest.TestCase):
+    """Test cases for the local ingredient parser."""
+
+    def test_parse_number(self):
+        """Test mixed numbers, fractions, unicode fractions and ranges."""
+        self.assertEqual(parse_number("1 1/2"), 1.5)
+        self.assertEqual(parse_number("3/4"), 0.75)
+        self.assertEqual(parse_number("2½"), 2.5)
+        self.assertEqual(parse_number("2-3"), 3.0)
+        self.assertEqual(parse_number("a"), 1.0)
+        self.assertIsNone(parse_number(None))
+
+    def test_split_keeps_parentheses_together(self):
+        """Test that commas inside parentheses don't split a line."""
+        self.assertEqual(
+            split_ingredients("2 Eggs, 1 lb chicken (boneless, skinless); salt"),
+            ["2 Eggs", "1 lb chicken (boneless, skinless)", "salt"],
+        )
+
+    def test_parse_line_normalizes_units(self):
+        """Test that weights become oz, volumes cups and counts items."""
+        self.assertEqual(parse_line("4oz Chicken breast")["amount"], 4.0)
+        beef = parse_line("1 lb. ground beef")
+        self.assertEqual((beef["name"], beef["amount"], beef["family"]), ("ground beef", 16.0, "weight"))
+        oil = parse_line("2 tbsp olive oil")
+        self.assertEqual((oil["amount"], oil["family"]), (0.125, "volume"))
+        eggs = parse_line("3 large eggs")
+        self.assertEqual((eggs["name"], eggs["amount"], eggs["family"]), ("egg", 3.0, "count"))
+        beans = parse_line("1 can (15 oz) black beans")
+        self.assertEqual((beans["name"], beans["family"]), ("black bean", "can"))
+
+    def test_parse_line_handles_package_sizes_articles_and_leaves(self):
+        """Test sizes before the unit, "half an", and leaves as a unit."""
+        beans = parse_line("1 (15 oz) can black beans")
+        self.assertEqual((beans["name"], beans["amount"], beans["family"]), ("black bean", 1.0, "can"))
+        avocado = parse_line("Half an avocado")
+        self.assertEqual((avocado["name"], avocado["amount"]), ("avocado", 0.5))
+        milk = parse_line("Half a cup of milk")
+        self.assertEqual((milk["name"], milk["amount"], milk["family"]), ("milk", 0.5, "volume"))
+        basil = parse_line("4 leaves basil")
+        self.assertEqual((basil["name"], basil["amount"], basil["family"]), ("basil", 4.0, "leaf"))
+
+    def test_parse_line_rejects_ambiguous_lines(self):
+        """Test that alternatives are left for the LLM."""
+        self.assertIsNone(parse_line("Chicken or tofu"))
+        self.assertIsNone(parse_line("1/2 cup"))
+
+    def test_consolidate_sums_across_units(self):
+        """Test that the same product is summed and shown in a friendly unit."""
+        items = consolidate(
+            [parse_line(line) for line in
+             ("1 lb chicken breast", "8 oz chicken breasts", "2 Eggs", "1/2 avocado", "Salt")]
+        )
+        self.assertEqual(
+            [item["display"] for item in items],
+            ["Chicken Breast (1.5 lb)", "Egg (2)", "Avocado (1)", "Salt"],
+        )
+        self.assertEqual(len(items[0]["sources"]), 2)
+
+    def test_subtract_pantry(self):
+        """Test that pantry staples go but different products stay."""
+        items = consolidate(
+            [parse_line(line) for line in
+             ("kosher salt", "salt and pepper", "1 red bell pepper", "extra virgin olive oil", "olives")]
+        )
+        kept = subtract_pantry(items, "Salt, Pepper, Olive oil")
+        self.assertEqual([item["name"] for item in kept], ["red bell pepper", "olive"])
+
+    def test_parse_plan_skips_leftovers_and_prep_notes(self):
+        """Test that leftovers and split-off prep notes add nothing."""
+        plan = {
+            "schedule": [
+                {"day": "Monday",
+                 "lunch": {"ingredients": "Leftover chicken from Sunday"},
+                 "dinner": {"ingredients": "1 yellow onion, diced, Beans or lentils"}},
+            ]
+        }
+        parsed, unparsed = parse_plan(json.dumps(plan))
+        self.assertEqual([p["name"] for p in parsed], ["yellow onion"])
+        self.assertEqual(unparsed, ["Beans or lentils"])
+
+    def test_parse_llm_items(self):
+        """Test that fallback answers become parsed lines in base units."""
+        parsed = parse_llm_items(
+            '```json\n[{"name": "Lentils", "quantity": 2, "unit": "cup"}, {"name": ""}]\n```',
+            ["Beans or lentils", "???"],
+        )
+        self.assertEqual(
+            parsed, [{"name": "lentil", "amount": 2.0, "family": "volume", "raw": "Beans or lentils"}]
+        )
+        with self.assertRaises(ValueError):
+            parse_llm_items('{"name": "x"}', ["x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Unit tests for llm_cache.py
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from langchain_core.messages import HumanMessage
+
+from database import DBManager
+from llm_cache import LLMCache, fingerprint
+from telemetry import current_thread_id
+
+
+class TestLLMCache(unittest.IsolatedAsyncioTestCase):
+    """Test cases for LLMCache."""
+
+    def setUp(self):
+        """Set up a temporary database for the cache."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.db = DBManager(self.temp_db.name)
+        self.cache = LLMCache(self.db, nodes={"extractor": True, "planner": False})
+
+    def tearDown(self):
+        """Clean up the temporary database."""
+        self.db.close()
+        os.unlink(self.temp_db.name)
+
+    def _runnable(self, text="Eggs, Milk", usage=None):
+        runnable = AsyncMock()
+        runnable.ainvoke.return_value = MagicMock(content=text, usage_metadata=usage)
+        return runnable
+
+    def test_fingerprint_ignores_key_order(self):
+        """Test that dict inputs hash the same regardless of key order."""
+        self.assertEqual(fingerprint({"a": 1, "b": 2}), fingerprint({"b": 2, "a": 1}))
+
+    async def test_identical_inputs_hit(self):
+        """Test that the second identical call is served from the cache."""
+        runnable = self._runnable(usage={"total_tokens": 1200})
+        inputs = {"input": "plan", "pantry": ""}
+
+        first = await self.cache.ainvoke("extractor", runnable, inputs, "gemini", 1.0, "t1")
+        second = await self.cache.ainvoke("extractor", runnable, inputs, "gemini", 1.0, "t1")
+
+        self.assertEqual(first.content, "Eggs, Milk")
+        self.assertEqual(second.content, "Eggs, Milk")
+        runnable.ainvoke.assert_awaited_once()
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["tokens_saved"], 1200)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    async def test_key_covers_model_temperature_and_template(self):
+        """Test that changing any key component misses."""
+        runnable = self._runnable()
+        inputs = {"input": "plan"}
+        await self.cache.ainvoke("extractor", runnable, inputs, "gemini", 1.0, "t1")
+        await self.cache.ainvoke("extractor", runnable, inputs, "other", 1.0, "t1")
+        await self.cache.ainvoke("extractor", runnable, inputs, "gemini", 0.0, "t1")
+        await self.cache.ainvoke("extractor", runnable, inputs, "gemini", 1.0, "t2")
+        self.assertEqual(runnable.ainvoke.await_count, 4)
+
+    async def test_disabled_node_always_calls(self):
+        """Test that nodes without opt-in bypass the cache entirely."""
+        runnable = self._runnable()
+        for _ in range(2):
+            await self.cache.ainvoke("planner", runnable, {"input": "x"}, "gemini", 1.0)
+        self.assertEqual(runnable.ainvoke.await_count, 2)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    async def test_expired_entries_miss(self):
+        """Test that entries older than the TTL are not served."""
+        self.cache.ttl_seconds = -1
+        runnable = self._runnable()
+        for _ in range(2):
+            await self.cache.ainvoke("extractor", runnable, {"input": "x"}, "gemini", 1.0)
+        self.assertEqual(runnable.ainvoke.await_count, 2)
+
+    async def test_size_eviction(self):
+        """Test that the cache keeps at most max_entries responses."""
+        self.cache.max_entries = 2
+        runnable = self._runnable()
+        for text in ("a", "b", "c"):
+            await self.cache.ainvoke("extractor", runnable, {"input": text}, "gemini", 1.0)
+        count = self.db.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        self.assertEqual(count, 2)
+
+    async def test_rejected_reply_is_not_cached(self):
+        """Test that a reply the caller's accept check refuses is asked for again."""
+        runnable = self._runnable("not json")
+        for _ in range(2):
+            await self.cache.ainvoke(
+                "extractor", runnable, {"input": "x"}, "gemini", 1.0,
+                accept=lambda text: text.startswith("["),
+            )
+        self.assertEqual(runnable.ainvoke.await_count, 2)
+        count = self.db.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        self.assertEqual(count, 0)
+
+    async def test_stats_are_kept_per_thread(self):
+        """Test that resetting one run's counters leaves another run's alone."""
+        runnable = self._runnable()
+        token = current_thread_id.set("session-a")
+        try:
+            await self.cache.ainvoke("extractor", runnable, {"input": "x"}, "gemini", 1.0)
+            current_thread_id.set("session-b")
+            self.cache.reset_stats()
+            await self.cache.ainvoke("extractor", runnable, {"input": "x"}, "gemini", 1.0)
+            self.assertEqual((self.cache.stats()["hits"], self.cache.stats()["misses"]), (1, 0))
+            current_thread_id.set("session-a")
+            self.assertEqual((self.cache.stats()["hits"], self.cache.stats()["misses"]), (0, 1))
+        finally:
+            current_thread_id.reset(token)
+
+    async def test_wrapped_chat_model(self):
+        """Test that wrap() caches on the rendered message text."""
+        self.cache.nodes["selection"] = True
+        llm = self._runnable("2")
+        wrapped = self.cache.wrap(llm, "selection", "gemini", 1.0)
+
+        for _ in range(2):
+            reply = await wrapped.ainvoke([HumanMessage(content="User wants: 'Milk'")])
+        self.assertEqual(reply.content, "2")
+        llm.ainvoke.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
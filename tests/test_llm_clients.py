@@ -0,0 +1,78 @@
+"""
+Unit tests for llm_clients.py
+"""
+
+import asyncio
+import gc
+import unittest
+import weakref
+from unittest.mock import MagicMock
+
+from llm_clients import LLMClientPool, close_client, gemini_factory
+
+
+class TestLLMClientPool(unittest.TestCase):
+    """Test cases for LLMClientPool."""
+
+    def test_reuses_client_per_settings(self):
+        """Test that the same settings share one client and others get their own."""
+        factory = MagicMock(side_effect=lambda *args: MagicMock(args=args))
+        pool = LLMClientPool(factory)
+
+        flash = pool.get("flash", 1.0, api_key="key")
+        self.assertIs(pool.get("flash", 1.0, api_key="key"), flash)
+        self.assertIsNot(pool.get("pro", 1.0, api_key="key"), flash)
+        self.assertIsNot(pool.get("flash", 1.0, api_key="other"), flash)
+        self.assertEqual(factory.call_count, 3)
+        self.assertEqual(pool.stats, {"created": 3, "reused": 1, "evicted": 0})
+
+    def test_set_factory_drops_old_clients(self):
+        """Test that swapping the factory builds new clients from it."""
+        pool = LLMClientPool(lambda *args: "real")
+        self.assertEqual(pool.get("flash", api_key="key"), "real")
+        pool.set_factory(lambda *args: "fake")
+        self.assertEqual(pool.get("flash", api_key="key"), "fake")
+
+    def test_clients_are_kept_per_event_loop(self):
+        """Test that a new loop gets its own client and the closed loop's is evicted."""
+        pool = LLMClientPool(lambda *args: MagicMock(args=args))
+
+        async def get():
+            llm = pool.get("flash", 1.0, api_key="key")
+            self.assertIs(pool.get("flash", 1.0, api_key="key"), llm)
+            return llm
+
+        first = asyncio.run(get())
+        second = asyncio.run(get())
+
+        self.assertIsNot(second, first)
+        first.client.close.assert_called_once()
+        second.client.close.assert_not_called()
+        self.assertEqual(pool.stats, {"created": 2, "reused": 2, "evicted": 1})
+
+    def test_clients_of_collected_loops_are_evicted(self):
+        """Test that the pool doesn't keep a loop alive that was never closed."""
+        pool = LLMClientPool(lambda *args: MagicMock(args=args))
+
+        async def get():
+            return pool.get("flash", 1.0, api_key="key")
+
+        loop = asyncio.new_event_loop()
+        first = loop.run_until_complete(get())
+        loop_ref = weakref.ref(loop)
+        del loop  # A Streamlit session ending without closing its loop
+        gc.collect()
+
+        self.assertIsNone(loop_ref())
+        asyncio.run(get())
+        first.client.close.assert_called_once()
+        self.assertEqual(pool.stats["evicted"], 1)
+
+    def test_close_client_ignores_clients_without_transport(self):
+        """Test that fakes are left alone and Gemini clients close cleanly."""
+        close_client(object())
+        close_client(gemini_factory("gemini-2.5-flash", 1.0, "test-key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
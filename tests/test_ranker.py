@@ -0,0 +1,113 @@
+"""
+Unit tests for ranker.py
+"""
+
+import unittest
+
+from ranker import (
+    LocalRanker,
+    brand_of,
+    parse_unit_price,
+    rank_options,
+)
+
+
+def option(index, title, price, rating="4.5 out of 5 stars", reviews="1,000"):
+    """Build an option dict shaped like browser.build_option() output."""
+    return {
+        "index": index,
+        "title": title,
+        "price_str": f"${price:.2f}",
+        "price": price,
+        "rating": rating,
+        "reviews": reviews,
+        "asin": f"B0{index:08d}",
+    }
+
+
+class TestRanker(unittest.TestCase):
+    """Test cases for the local ranker."""
+
+    def test_parse_unit_price(self):
+        """Test that sizes in titles convert to a common base unit."""
+        family, per_oz = parse_unit_price("Yellow Onions, 3 Lb", 4.8)
+        self.assertEqual(family, "weight")
+        self.assertAlmostEqual(per_oz, 0.1)
+        family, per_cup = parse_unit_price("Milk 2%, 64 Fl Oz", 3.2)
+        self.assertEqual(family, "volume")
+        self.assertAlmostEqual(per_cup, 0.4)
+        self.assertIsNone(parse_unit_price("Banana Bunch", 0.99))
+
+    def test_brand_of(self):
+        """Test that the brand is the first words before the first comma."""
+        self.assertEqual(brand_of("Perdue, Chicken Thighs"), "perdue")
+        self.assertEqual(brand_of("Amazon Grocery, Large White Eggs, 12 Count"), "amazon grocery")
+        self.assertEqual(brand_of("Swanson Chicken Broth, 32 oz"), "swanson chicken")
+        self.assertEqual(brand_of("Banana Bunch (4-5 Count)"), "")
+
+    def test_obvious_match_is_confident(self):
+        """Test that the only option naming the item wins with high confidence."""
+        options = [
+            option(0, "Banana Bunch (4-5 Count)", 0.99),
+            option(1, "Happy Belly, Dried Mango Slices, 16 Oz", 5.49),
+            option(2, "Organic Valley, Whole Milk, 64 Fl Oz", 4.99),
+        ]
+        ranking = rank_options("Bananas", "bananas", options)
+        self.assertEqual(ranking["index"], 0)
+        self.assertGreaterEqual(ranking["confidence"], 0.85)
+
+    def test_no_match_is_not_confident(self):
+        """Test that options missing the requested words stay low confidence."""
+        options = [
+            option(0, "Happy Belly, Dried Mango Slices, 16 Oz", 5.49),
+            option(1, "Organic Valley, Whole Milk, 64 Fl Oz", 4.99),
+        ]
+        ranking = rank_options("Saffron threads", "saffron", options)
+        self.assertLess(ranking["confidence"], 0.85)
+
+    def test_extra_title_words_lower_relevance(self):
+        """Test that "Chicken" prefers plain chicken and isn't sure about the broth."""
+        broth = [option(0, "Swanson, Chicken Broth", 2.99)]
+        self.assertLess(rank_options("Chicken", "chicken", broth)["confidence"], 0.85)
+
+        options = broth + [option(1, "Perdue, Chicken", 8.99)]
+        self.assertEqual(rank_options("Chicken", "chicken", options)["index"], 1)
+
+    def test_product_words_before_comma_lower_relevance(self):
+        """Test that a title leading with the product isn't all exempt as brand."""
+        options = [
+            option(0, "Swanson Chicken Broth, 32 oz", 2.99),
+            option(1, "Boneless Skinless Chicken Thighs Family Pack", 8.99),
+        ]
+        self.assertLess(rank_options("Chicken", "chicken", options)["confidence"], 0.85)
+
+    def test_history_brand_breaks_ties(self):
+        """Test that a previously bought brand is preferred among equal matches."""
+        options = [
+            option(0, "Store Brand, Large White Eggs, 12 Count", 4.99),
+            option(1, "Amazon Grocery, Large White Eggs, 12 Count", 4.99),
+        ]
+        preferred = {"amazon grocery": 3}
+        self.assertEqual(rank_options("Eggs", "eggs", options, preferred)["index"], 1)
+
+    def test_cheaper_unit_price_wins(self):
+        """Test that value breaks ties between otherwise equal products."""
+        options = [
+            option(0, "Store Brand, Jasmine Rice, 2 Lb", 4.00),
+            option(1, "Happy Belly, Jasmine Rice, 5 Lb", 6.00),
+        ]
+        self.assertEqual(rank_options("jasmine rice", "jasmine rice", options)["index"], 1)
+
+    def test_local_ranker_counts_decisions(self):
+        """Test that LocalRanker returns confident picks and counts escalations."""
+        ranker = LocalRanker.from_history([("Amazon Grocery, Yellow Onions, 3 Lb", 2)], 0.85)
+        self.assertEqual(ranker.preferred_brands, {"amazon grocery": 2})
+
+        bananas = [option(0, "Banana Bunch (4-5 Count)", 0.99)]
+        self.assertEqual(ranker.select("Bananas", "bananas", bananas)["index"], 0)
+        self.assertIsNone(ranker.select("Saffron", "saffron", bananas))
+        self.assertEqual(ranker.stats(), {"decided_locally": 1, "escalated": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
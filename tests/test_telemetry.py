@@ -0,0 +1,114 @@
+"""
+Unit tests for telemetry.py
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from database import DBManager
+from telemetry import Telemetry, current_thread_id, estimate_cost, instrument_node
+
+
+class TestTelemetry(unittest.TestCase):
+    """Test cases for the telemetry recorder."""
+
+    def setUp(self):
+        """Set up a temporary database for telemetry rows."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.db = DBManager(self.temp_db.name)
+        self.telemetry = Telemetry(self.db, enabled=True)
+
+    def tearDown(self):
+        """Clean up the temporary database."""
+        self.db.close()
+        os.unlink(self.temp_db.name)
+
+    def test_span_records_fields_and_failures(self):
+        """Test that spans store their fields and mark exceptions as failures."""
+        with self.telemetry.span("llm.selection", "gemini-2.5-flash") as span:
+            span.update(input_tokens=1000, output_tokens=200, cache_hit=True)
+        with self.assertRaises(RuntimeError):
+            with self.telemetry.span("browser.add"):
+                raise RuntimeError("page closed")
+
+        rows = self.db.get_telemetry()
+        self.assertEqual(
+            [(r["operation"], r["model"], r["input_tokens"], r["cache_hit"], r["ok"]) for r in rows],
+            [("llm.selection", "gemini-2.5-flash", 1000, 1, 1), ("browser.add", "", 0, 0, 0)],
+        )
+
+    def test_traced_uses_thread_id_and_failed_check(self):
+        """Test that decorated calls are keyed by thread and can be marked failed."""
+
+        @self.telemetry.traced("browser.checkout", failed=lambda started: not started)
+        async def checkout():
+            return False
+
+        token = current_thread_id.set("run-1")
+        try:
+            asyncio.run(checkout())
+        finally:
+            current_thread_id.reset(token)
+
+        (row,) = self.db.get_telemetry(thread_id="run-1")
+        self.assertEqual((row["operation"], row["ok"]), ("browser.checkout", 0))
+        self.assertEqual(self.db.get_telemetry(thread_id="other"), [])
+
+    def test_summarize(self):
+        """Test percentiles, token totals, cost and cache rate per operation."""
+        for seconds, hit in ((1.0, False), (2.0, False), (3.0, True), (10.0, False)):
+            self.telemetry.record(
+                "llm.extractor", seconds, model="gemini-2.5-pro",
+                input_tokens=0 if hit else 1_000_000, cache_hit=hit,
+            )
+        self.telemetry.record("browser.search", 0.5, retries=1, ok=False)
+
+        summary = self.telemetry.summarize()
+        extractor = summary[0]
+        self.assertEqual(extractor["operation"], "llm.extractor")
+        self.assertEqual((extractor["p50_seconds"], extractor["p95_seconds"]), (2.0, 10.0))
+        self.assertEqual(extractor["input_tokens"], 3_000_000)
+        self.assertAlmostEqual(extractor["cost_usd"], 3 * 1.25)
+        self.assertEqual(extractor["cache_hit_rate"], 0.25)
+        self.assertEqual((summary[1]["retries"], summary[1]["errors"]), (1, 1))
+        self.assertEqual(estimate_cost("unknown-model", 10, 10), 0.0)
+
+    def test_last_returns_newest_record_with_details(self):
+        """Test that last() reads back the newest row of an operation and its details."""
+        self.assertIsNone(self.telemetry.last("shopper.selection.batched"))
+        self.telemetry.record("shopper.selection.batched", 9.0, details={"llm_calls": 4})
+        self.telemetry.record("shopper.selection.batched", 7.0, details={"llm_calls": 3})
+
+        last = self.telemetry.last("shopper.selection.batched")
+        self.assertEqual((last["seconds"], last["details"]), (7.0, {"llm_calls": 3}))
+
+    def test_instrument_node_sets_thread_id(self):
+        """Test that wrapped nodes run under the config's thread_id."""
+        seen = []
+
+        async def node(state):
+            seen.append(current_thread_id.get())
+            return {"ok": True}
+
+        with patch("telemetry.telemetry", self.telemetry):
+            wrapped = instrument_node("planner", node)
+            result = asyncio.run(wrapped({}, {"configurable": {"thread_id": "run-2"}}))
+
+        self.assertEqual((result, seen), ({"ok": True}, ["run-2"]))
+        self.assertEqual(current_thread_id.get(), "")
+        (row,) = self.db.get_telemetry(thread_id="run-2")
+        self.assertEqual(row["operation"], "node.planner")
+
+    def test_disabled_records_nothing(self):
+        """Test that a disabled recorder leaves the table empty."""
+        database = MagicMock()
+        Telemetry(database, enabled=False).record("browser.search", 1.0)
+        database.save_telemetry.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
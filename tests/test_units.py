@@ -0,0 +1,43 @@
+"""
+Unit tests for units.py
+"""
+
+import unittest
+
+from units import SIZE_PATTERN, singularize, tokenize, unit_factor
+
+
+class TestUnits(unittest.TestCase):
+    """Test cases for the shared units and tokenizer."""
+
+    def test_unit_factor(self):
+        """Test that aliases map to one base unit per family."""
+        self.assertEqual(unit_factor("Lbs"), ("weight", 16.0))
+        self.assertAlmostEqual(unit_factor("kg")[1], 1000 * unit_factor("g")[1])
+        self.assertEqual(unit_factor("fl  oz"), ("volume", 1 / 8))
+        self.assertEqual(unit_factor("cloves"), ("clove", 1.0))
+        self.assertIsNone(unit_factor("handfuls of"))
+
+    def test_size_pattern_reads_title_sizes(self):
+        """Test that the longest unit wins and case is ignored."""
+        self.assertEqual(SIZE_PATTERN.search("Milk 2%, 64 Fl Oz").groups(), ("64", "Fl Oz"))
+        self.assertEqual(SIZE_PATTERN.search("Yellow Onions, 3 Lbs").groups(), ("3", "Lbs"))
+
+    def test_singularize(self):
+        """Test the plural rules and their exceptions."""
+        self.assertEqual(singularize("tomatoes"), "tomato")
+        self.assertEqual(singularize("leaves"), "leaf")
+        self.assertEqual(singularize("olives"), "olive")
+        self.assertEqual(singularize("oats"), "oats")
+        self.assertEqual(singularize("hummus"), "hummus")
+
+    def test_tokenize_drops_noise_and_plurals(self):
+        """Test that sizes, units, stopwords and plural endings are ignored."""
+        self.assertEqual(tokenize("Bananas"), ["banana"])
+        self.assertEqual(tokenize("Cherry Tomatoes, 12 oz"), ["cherry", "tomato"])
+        self.assertEqual(tokenize("Fresh Strawberries 1 lb"), ["strawberry"])
+        self.assertEqual(tokenize("2 cups Smucker's Peanut Butter"), ["smucker", "peanut", "butter"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,8 @@ import json
 import pandas as pd
 import streamlit as st
 
+from utils import percentile
+
 STREAMLIT_STYLE = """
 <style>
     .meal-card {
@@ -59,31 +61,169 @@ def render_plan_ui(plan_json):
                     st.bar_chart(df_nutri.set_index("Day")[["Protein", "Carbs", "Fat"]])
 
             st.subheader("📅 Weekly Plan")
-            tabs = st.tabs([day["day"] for day in schedule])
-            for tab, day_info in zip(tabs, schedule):
-                with tab:
-                    col1, col2, col3 = st.columns(3)
-
-                    def get_title(m):
-                        return m.get("title", str(m)) if isinstance(m, dict) else str(m)
-
-                    with col1:
-                        st.markdown(
-                            f"""<div class="meal-card"><div class="meal-header"><span class="icon">🥞</span> Breakfast</div><div class="meal-body">{get_title(day_info.get('breakfast'))}</div></div>""",
-                            unsafe_allow_html=True,
-                        )
-                    with col2:
-                        st.markdown(
-                            f"""<div class="meal-card"><div class="meal-header"><span class="icon">🥗</span> Lunch</div><div class="meal-body">{get_title(day_info.get('lunch'))}</div></div>""",
-                            unsafe_allow_html=True,
-                        )
-                    with col3:
-                        st.markdown(
-                            f"""<div class="meal-card"><div class="meal-header"><span class="icon">🍳</span> Dinner</div><div class="meal-body">{get_title(day_info.get('dinner'))}</div></div>""",
-                            unsafe_allow_html=True,
-                        )
-
-                    with st.expander("👨‍🍳 View Cooking Instructions"):
-                        st.json(day_info)
+            render_schedule_tabs(schedule)
     except Exception as e:
         st.error(f"Error rendering plan: {e}")
+
+
+def render_schedule_tabs(schedule):
+    """
+    Render one tab of meal cards per day.
+
+    Also used by the planner to show days while the plan is still streaming.
+
+    Args:
+        schedule (list): Day objects from the plan's "schedule" array.
+    """
+    tabs = st.tabs([day.get("day", f"Day {i + 1}") for i, day in enumerate(schedule)])
+    for tab, day_info in zip(tabs, schedule):
+        with tab:
+            col1, col2, col3 = st.columns(3)
+
+            def get_title(m):
+                return m.get("title", str(m)) if isinstance(m, dict) else str(m)
+
+            with col1:
+                st.markdown(
+                    f"""<div class="meal-card"><div class="meal-header"><span class="icon">🥞</span> Breakfast</div><div class="meal-body">{get_title(day_info.get('breakfast'))}</div></div>""",
+                    unsafe_allow_html=True,
+                )
+            with col2:
+                st.markdown(
+                    f"""<div class="meal-card"><div class="meal-header"><span class="icon">🥗</span> Lunch</div><div class="meal-body">{get_title(day_info.get('lunch'))}</div></div>""",
+                    unsafe_allow_html=True,
+                )
+            with col3:
+                st.markdown(
+                    f"""<div class="meal-card"><div class="meal-header"><span class="icon">🍳</span> Dinner</div><div class="meal-body">{get_title(day_info.get('dinner'))}</div></div>""",
+                    unsafe_allow_html=True,
+                )
+
+            with st.expander("👨‍🍳 View Cooking Instructions"):
+                st.json(day_info)
+
+
+def render_telemetry(summary):
+    """
+    Render per-operation telemetry as a table.
+
+    Args:
+        summary (list): Rows from Telemetry.summarize().
+    """
+    if not summary:
+        st.caption("No telemetry recorded yet.")
+        return
+    df = pd.DataFrame(summary)[
+        ["operation", "count", "p50_seconds", "p95_seconds", "input_tokens",
+         "output_tokens", "cost_usd", "cache_hit_rate", "retries", "errors"]
+    ]
+    df.columns = ["Operation", "Calls", "p50 s", "p95 s", "In tok", "Out tok", "Cost $",
+                  "Cache", "Retries", "Errors"]
+    st.dataframe(
+        df.style.format(
+            {"p50 s": "{:.2f}", "p95 s": "{:.2f}", "Cost $": "{:.4f}", "Cache": "{:.0%}"}
+        ),
+        hide_index=True,
+        use_container_width=True,
+    )
+    st.caption(f"Estimated model cost: ${df['Cost $'].sum():.4f}")
+
+
+def render_run_stats(run_stats, baselines=None, selection_baselines=None):
+    """
+    Render performance counters collected during the shopping run.
+
+    Args:
+        run_stats (dict): The run_stats value from the agent state.
+        baselines (dict): Average per-item seconds keyed by navigation mode,
+            from earlier runs, for before/after comparison; None if never run.
+        selection_baselines (dict): Last run's selection stats keyed by
+            selection mode; None if never run.
+    """
+    if not run_stats:
+        return
+    with st.expander("⏱️ Run Stats"):
+        latencies = run_stats.get("item_latencies", [])
+        if latencies:
+            mode = run_stats.get("search_navigation", "")
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Avg / Item", f"{sum(latencies) / len(latencies):.1f}s")
+            c2.metric("p95 / Item", f"{percentile(latencies, 95):.1f}s")
+            c3.metric("Navigation", mode)
+            for other_mode, avg in (baselines or {}).items():
+                if other_mode != mode and avg:
+                    st.caption(f"Last '{other_mode}' run averaged {float(avg):.1f}s per item.")
+
+        selection = run_stats.get("selection", {})
+        if selection:
+            st.caption(
+                f"🤖 Selection ({selection['mode']}): {selection['llm_calls']} LLM calls, "
+                f"{selection['llm_seconds']:.1f}s in the model, {selection['run_seconds']:.1f}s total"
+            )
+            if "decided_locally" in selection:
+                st.caption(
+                    f"🎯 Local ranker: {selection['decided_locally']} items decided locally, "
+                    f"{selection['escalated']} sent to the LLM"
+                )
+            for other_mode, other in (selection_baselines or {}).items():
+                if other_mode != selection["mode"] and other:
+                    st.caption(
+                        f"Last '{other_mode}' run: {other['llm_calls']} LLM calls, "
+                        f"{other['llm_seconds']:.1f}s in the model, {other['run_seconds']:.1f}s total"
+                    )
+
+        pipeline = run_stats.get("pipeline", {})
+        if pipeline:
+            stages = {name: s for name, s in pipeline.items() if isinstance(s, dict)}
+            bottleneck = max(stages, key=lambda name: stages[name]["utilization"])
+            busy = " · ".join(
+                f"{name} {s['utilization']:.0%} busy ({s['busy_seconds']:.1f}s, {s['workers']} worker(s))"
+                for name, s in stages.items()
+            )
+            st.caption(f"🧵 Pipeline: {busy} — bottleneck: {bottleneck}")
+
+        extractor = run_stats.get("extractor", {})
+        if "prompt_tokens" in extractor:
+            st.caption(
+                f"📑 Extractor prompt: ~{extractor['prompt_tokens']:,} tokens with "
+                f"{extractor['history_items']} of {extractor['history_total']} past items"
+            )
+
+        llm = run_stats.get("llm_cache", {})
+        if llm.get("hits", 0) + llm.get("misses", 0):
+            per_node = ", ".join(
+                f"{node} {s['hits']}/{s['hits'] + s['misses']}" for node, s in llm["nodes"].items()
+            )
+            st.caption(
+                f"💾 LLM cache: {llm['hit_rate']:.0%} hit rate, ~{llm['tokens_saved']:,} tokens saved "
+                f"({per_node})"
+            )
+
+        cache = run_stats.get("search_cache", {})
+        lookups = cache.get("hits", 0) + cache.get("misses", 0)
+        if lookups:
+            st.caption(
+                f"🗄️ Search cache: {cache['hits']} hits / {cache['misses']} misses "
+                f"({cache['hits'] / lookups:.0%} hit rate)"
+            )
+
+        adds = run_stats.get("add_confirmation", {})
+        if any(adds.values()):
+            st.caption(
+                f"🛒 Adds: {adds.get('CONFIRMED', 0)} confirmed, "
+                f"{adds.get('UNCONFIRMED', 0)} unconfirmed, {adds.get('FAILED', 0)} failed"
+            )
+
+        bulk = run_stats.get("bulk_add", {})
+        if bulk.get("queued"):
+            st.caption(
+                f"📦 Bulk add: {bulk['confirmed']}/{bulk['queued']} products confirmed "
+                f"in {bulk['requests']} request(s)"
+            )
+
+        network = run_stats.get("network", {})
+        if network.get("blocked_requests"):
+            st.caption(
+                f"🚫 Blocked {network['blocked_requests']} requests "
+                f"(~{network['bytes_saved_estimate'] / 1_000_000:.1f} MB saved, estimated)"
+            )
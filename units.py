@@ -0,0 +1,111 @@
+"""
+Shared units and product words for Amazon Fresh Agent.
+
+The ingredient parser, the local ranker and the history index all read sizes
+such as "1.5 lb" and reduce names such as "Cherry Tomatoes" to comparable
+words. Keeping the unit table, the plural rules and the tokenizer in one place
+means an item normalizes the same way for parsing, ranking and history lookup.
+"""
+
+import re
+
+OZ_PER_GRAM = 0.035274
+CUPS_PER_ML = 1 / 236.588
+
+# unit alias -> (family, factor to the family's base unit)
+# Base units: weight in oz, volume in cups, count in items.
+UNITS = {
+    "oz": ("weight", 1.0), "ounce": ("weight", 1.0), "ounces": ("weight", 1.0),
+    "lb": ("weight", 16.0), "lbs": ("weight", 16.0), "pound": ("weight", 16.0),
+    "pounds": ("weight", 16.0), "g": ("weight", OZ_PER_GRAM), "gram": ("weight", OZ_PER_GRAM),
+    "grams": ("weight", OZ_PER_GRAM), "kg": ("weight", 1000 * OZ_PER_GRAM),
+    "cup": ("volume", 1.0), "cups": ("volume", 1.0),
+    "tbsp": ("volume", 1 / 16), "tablespoon": ("volume", 1 / 16), "tablespoons": ("volume", 1 / 16),
+    "tsp": ("volume", 1 / 48), "teaspoon": ("volume", 1 / 48), "teaspoons": ("volume", 1 / 48),
+    "fl oz": ("volume", 1 / 8), "ml": ("volume", CUPS_PER_ML), "l": ("volume", 1000 * CUPS_PER_ML),
+    "liter": ("volume", 1000 * CUPS_PER_ML), "liters": ("volume", 1000 * CUPS_PER_ML),
+    "pint": ("volume", 2.0), "pints": ("volume", 2.0), "quart": ("volume", 4.0),
+    "quarts": ("volume", 4.0), "gallon": ("volume", 16.0), "count": ("count", 1.0),
+    "ct": ("count", 1.0), "piece": ("count", 1.0), "pieces": ("count", 1.0),
+    "dozen": ("count", 12.0),
+}
+# Package-style units are their own family, so they only add to themselves
+PACKAGE_UNITS = {
+    "can": "can", "cans": "can", "clove": "clove", "cloves": "clove", "slice": "slice",
+    "slices": "slice", "bunch": "bunch", "bunches": "bunch", "head": "head", "heads": "head",
+    "stalk": "stalk", "stalks": "stalk", "sprig": "sprig", "sprigs": "sprig", "jar": "jar",
+    "jars": "jar", "package": "package", "packages": "package", "pkg": "package",
+    "packet": "package", "packets": "package", "pack": "package", "packs": "package",
+    "loaf": "loaf", "loaves": "loaf", "bag": "bag", "bags": "bag", "bottle": "bottle",
+    "bottles": "bottle", "box": "box", "boxes": "box", "pinch": "pinch", "dash": "dash",
+    "handful": "handful", "fillet": "fillet", "fillets": "fillet", "leaf": "leaf",
+    "leaves": "leaf",
+}
+
+# Every unit alias as a regex alternation, longest first so "lbs" wins over "l"
+UNIT_ALTERNATION = "|".join(
+    re.escape(u).replace(r"\ ", r"\s*")
+    for u in sorted([*UNITS, *PACKAGE_UNITS], key=len, reverse=True)
+)
+# A size such as "64 Fl Oz" or "12 Count" in a product title
+SIZE_PATTERN = re.compile(rf"(\d+(?:\.\d+)?)\s*({UNIT_ALTERNATION})\b", re.IGNORECASE)
+
+# Words that say nothing about which product is wanted: function words,
+# measurements, packaging and Amazon title boilerplate
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "for", "with", "in", "by", "to", "or",
+    "fresh", "organic", "natural", "large", "medium", "small", "grade",
+    "amazon", "brand", "each", "previously", "packaging", "may", "vary",
+    "fl", "pack", "package", "bag", "can", "jar", "bunch",
+    *(alias for alias in UNITS if " " not in alias),
+}
+NO_SINGULAR = {"oats", "hummus", "asparagus", "couscous", "molasses", "greens", "grits", "brussels"}
+
+
+def unit_factor(unit):
+    """
+    Look up a unit alias.
+
+    Args:
+        unit (str): e.g. "Lbs", "fl  oz" or "cloves".
+
+    Returns:
+        tuple: (family, factor to the family's base unit), or None for an
+            unknown unit.
+    """
+    unit = re.sub(r"\s+", " ", (unit or "").lower().strip().rstrip("."))
+    if unit in UNITS:
+        return UNITS[unit]
+    if unit in PACKAGE_UNITS:
+        return PACKAGE_UNITS[unit], 1.0
+    return None
+
+
+def singularize(word):
+    """Return a naive singular form of an English word."""
+    if word in NO_SINGULAR or len(word) <= 3 or word.endswith(("ss", "us")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes") or word.endswith(("ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("ves") and word not in ("olives", "chives", "cloves"):
+        return word[:-3] + "f"
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """
+    Split text into comparable product words.
+
+    Args:
+        text (str): An item name, ingredient line, query or product title.
+
+    Returns:
+        list: Lowercase singular words in order, with numbers, units and
+            stopwords removed.
+    """
+    words = re.findall(r"[a-z]+", (text or "").lower().replace("'", ""))
+    return [w for w in map(singularize, words) if w not in STOPWORDS]
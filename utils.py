@@ -2,7 +2,11 @@
 Utility functions for the Amazon Fresh Fetch Agent.
 """
 
+import json
+import math
 import os
+import re
+
 import streamlit as st
 
 def get_api_key():
@@ -26,3 +30,53 @@ def get_api_key():
             else:
                 st.stop() # Stop execution until key is provided
     return api_key
+
+
+def percentile(values, pct):
+    """
+    Return the pct-th percentile of values using the nearest-rank method.
+
+    Args:
+        values (list): Numbers to summarize.
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def get_text_content(content) -> str:
+    """
+    Extract text from LLM response content.
+    
+    Some models return a list of content blocks instead of a string.
+    This helper safely extracts the text in either case.
+    """
+    if isinstance(content, str):
+        return content
+    elif isinstance(content, list):
+        # Extract text from list of content blocks
+        text_parts = []
+        for block in content:
+            if isinstance(block, str):
+                text_parts.append(block)
+            elif hasattr(block, 'text'):
+                text_parts.append(block.text)
+            elif isinstance(block, dict) and 'text' in block:
+                text_parts.append(block['text'])
+        return ''.join(text_parts)
+    return str(content)
+
+
+def parse_json_reply(raw: str):
+    """Parse a model reply that may be wrapped in a ```json fence; None if invalid."""
+    content = re.sub(r"^```json|```$", "", (raw or "").strip(), flags=re.MULTILINE).strip()
+    try:
+        return json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return None
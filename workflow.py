@@ -2,6 +2,8 @@
 LangGraph workflow definition for Amazon Fresh Fetch Agent.
 """
 
+import asyncio
+
 import streamlit as st
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
@@ -15,6 +17,7 @@ from agent import (
     shopper_node,
 )
 from browser import AmazonFreshBrowser
+from telemetry import instrument_node
 
 
 def create_workflow():
@@ -25,11 +28,11 @@ def create_workflow():
         CompiledGraph: The compiled state graph.
     """
     workflow = StateGraph(AgentState)
-    workflow.add_node("planner", planner_node)
-    workflow.add_node("extractor", extractor_node)
-    workflow.add_node("shopper", shopper_node)
-    workflow.add_node("human_review", human_review_node)
-    workflow.add_node("checkout", checkout_node)
+    workflow.add_node("planner", instrument_node("planner", planner_node))
+    workflow.add_node("extractor", instrument_node("extractor", extractor_node))
+    workflow.add_node("shopper", instrument_node("shopper", shopper_node))
+    workflow.add_node("human_review", instrument_node("human_review", human_review_node))
+    workflow.add_node("checkout", instrument_node("checkout", checkout_node))
     workflow.set_entry_point("planner")
     workflow.add_edge("planner", "extractor")
     workflow.add_edge("extractor", "shopper")
@@ -43,7 +46,26 @@ def create_workflow():
 
 
 def init_session_state():
-    """Initialize the session state with the workflow and browser tool."""
+    """Initialize the session state with the workflow, browser tool and event loop."""
     if "graph_app" not in st.session_state:
         st.session_state.graph_app = create_workflow()
         st.session_state.browser_tool = AmazonFreshBrowser()
+    if "event_loop" not in st.session_state or st.session_state.event_loop.is_closed():
+        st.session_state.event_loop = asyncio.new_event_loop()
+
+
+def run_async(coro):
+    """
+    Run a coroutine to completion on the session's event loop.
+
+    Playwright objects belong to the loop that created them, so every graph
+    step and the Close button share one loop instead of a new asyncio.run()
+    loop per rerun; the browser started on the first step stays usable.
+
+    Args:
+        coro (Coroutine): The coroutine to run.
+
+    Returns:
+        Any: The coroutine's result.
+    """
+    return st.session_state.event_loop.run_until_complete(coro)